@@ -0,0 +1,265 @@
+"""
+API benchmark
+- Times the hot paths of the API one request after the other through the Flask test client: listing items (several
+  page sizes, by category, by cursor), getting an item, creating and updating items, deleting a category with its
+  items, registering and logging in, and reports for each the throughput and the p50/p99 latency
+- The app is created with the benchmark config (production bcrypt rounds, password hasher pool, connection pool and
+  caches, jobs run in the request) against a seeded throwaway SQLite database, or the database given by
+  --database-url (e.g a local MySQL, it is emptied and seeded), so it measures the app, not a web server
+- Each scenario is timed --repeats times, the reported numbers are the medians of the repeats
+- Results are written as JSON with --output, and compared with a stored baseline with --compare: a scenario whose
+  p50 or p99 latency grew, or whose throughput dropped, by more than --threshold in every repeat compared with every
+  repeat of the baseline is flagged and the exit status is 1. A baseline measured with another config, dataset,
+  request count, database or Python version is refused
+- Usage (from server/): JWT_SECRET_KEY=x python -m benchmarks.api_benchmark [--items 5000] [--requests 200]
+  [--repeats 5] [--output results.json] [--compare baseline.json] [--threshold 0.1] [--only list_items_50,get_item]
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from flask_jwt_extended import create_access_token
+
+from main.app import create_app
+from main.db import db
+from main.utils.password_hasher import password_hasher
+from tests.helpers import create_test_db, create_items
+
+# Items of each category deleted by the cascade delete scenario
+CASCADE_ITEMS = 50
+# Untimed requests of the slow scenarios (bcrypt at production rounds), enough to start the password hasher pool
+SLOW_WARMUP = 2
+METRICS = ('requests_per_second', 'p50_ms', 'p99_ms')
+# Metadata of a baseline which must match the run compared with it
+COMPARABLE_META = ('config', 'python', 'database', 'items', 'requests', 'slow_requests')
+
+
+class Scenario:
+    """
+    A request timed again and again
+    - run(i) sends the i-th request and returns the response, prepare(i) runs untimed before it (e.g creating what
+      the request deletes)
+    - Slow scenarios (hashing a password) are timed with --slow-requests requests instead of --requests
+    """
+
+    def __init__(self, name, run, expected_status, prepare=None, slow=False):
+        self.name = name
+        self.run = run
+        self.expected_status = expected_status
+        self.prepare = prepare
+        self.slow = slow
+
+
+def build_scenarios(client, item_count):
+    def get(url):
+        return lambda i: client.get(url)
+
+    def create_category_with_items(i):
+        response = client.post('/categories', json={'title': 'Cascade {}'.format(i), 'description': 'Cascade'})
+        category_id = response.get_json()['data']['id']
+        items = [{'title': 'Cascade {} item {}'.format(i, j), 'description': 'Cascade', 'category_id': category_id}
+                 for j in range(CASCADE_ITEMS)]
+        client.post('/items/bulk', json={'items': items})
+        pending_categories[i] = category_id
+
+    pending_categories = {}
+    # Items created by the create_item scenario, update_item updates them since only their creator can
+    own_item_ids = []
+
+    def create_item(i):
+        response = client.post('/items', json={'title': 'Benchmark item {}'.format(i), 'description': 'Benchmark',
+                                               'category_id': 1})
+        own_item_ids.append(response.get_json()['data']['id'])
+        return response
+
+    def update_item(i):
+        if not own_item_ids:
+            create_item('to update')
+        item_id = own_item_ids[i % len(own_item_ids)]
+        return client.put('/items/{}'.format(item_id), json={'description': 'Updated {}'.format(i)})
+
+    return [
+        Scenario('list_items_5', get('/items?per_page=5'), 200),
+        Scenario('list_items_50', get('/items?per_page=50'), 200),
+        Scenario('list_items_100', get('/items?per_page=100'), 200),
+        Scenario('list_items_50_exact_total', get('/items?per_page=50&total=exact'), 200),
+        Scenario('list_items_50_category', get('/items?per_page=50&category_id=1'), 200),
+        Scenario('list_items_50_cursor', get('/items?limit=50'), 200),
+        Scenario('list_items_50_sparse', get('/items?per_page=50&fields=title'), 200),
+        Scenario('get_item', lambda i: client.get('/items/{}'.format(1 + i % item_count)), 200),
+        Scenario('create_item', create_item, 200),
+        Scenario('update_item', update_item, 200),
+        Scenario('delete_category_cascade',
+                 lambda i: client.delete('/categories/{}'.format(pending_categories.pop(i))), 202,
+                 prepare=create_category_with_items),
+        Scenario('register', lambda i: client.post('/users', json={'email': 'bench{}@gmail.com'.format(i),
+                                                                   'password': '123456'}), 200, slow=True),
+        Scenario('login',
+                 lambda i: client.post('/auth', json={'email': 'admin@gmail.com', 'password': '123456'}), 200,
+                 slow=True),
+    ]
+
+
+def time_requests(scenario, indexes):
+    latencies = []
+    for i in indexes:
+        if scenario.prepare is not None:
+            scenario.prepare(i)
+        start = time.perf_counter()
+        response = scenario.run(i)
+        latencies.append(time.perf_counter() - start)
+        assert response.status_code == scenario.expected_status, (scenario.name, response.get_json())
+    return latencies
+
+
+def measure(scenario, requests, warmup, repeats):
+    """
+    :param scenario: Scenario
+    :param requests: timed requests per repeat
+    :param warmup: untimed requests sent first
+    :param repeats: times the requests are timed
+    :return: medians of the metrics of the repeats, and the repeats
+    """
+    time_requests(scenario, range(warmup))
+    runs = []
+    for repeat in range(repeats):
+        # Indexes go on across the repeats, e.g the registered emails stay unique
+        first = warmup + repeat * requests
+        latencies = sorted(time_requests(scenario, range(first, first + requests)))
+        total = sum(latencies)
+        runs.append({
+            'requests_per_second': requests / total,
+            'mean_ms': total / requests * 1000,
+            'p50_ms': statistics.median(latencies) * 1000,
+            'p99_ms': latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000,
+        })
+
+    result = {metric: statistics.median(run[metric] for run in runs) for metric in runs[0]}
+    result['requests'] = requests
+    result['runs'] = runs
+    return result
+
+
+def run(database_url, item_count, requests, slow_requests, warmup, repeats, only):
+    app = create_app('benchmark')
+    app.config.update(SQLALCHEMY_DATABASE_URI=database_url)
+    with app.app_context():
+        db.init_app(app)
+        db.drop_all()
+        db.create_all()
+        user_id = create_test_db()
+        create_items([{'title': 'Seeded item {}'.format(i), 'description': 'Seeded item number {}'.format(i),
+                       'category_id': 1 + i % 2, 'creator_id': 1 + i % 2} for i in range(item_count)])
+        access_token = create_access_token(identity=user_id)
+
+    client = app.test_client()
+    client.environ_base['HTTP_AUTHORIZATION'] = 'Bearer ' + access_token
+    results = {}
+    for scenario in build_scenarios(client, item_count):
+        if only and scenario.name not in only:
+            continue
+        if scenario.slow:
+            results[scenario.name] = measure(scenario, slow_requests, SLOW_WARMUP, repeats)
+        else:
+            results[scenario.name] = measure(scenario, requests, warmup, repeats)
+        print('{:<28} {requests_per_second:9.1f} req/s   p50 {p50_ms:7.2f}ms   p99 {p99_ms:7.2f}ms'
+              .format(scenario.name, **results[scenario.name]))
+    password_hasher.shutdown()
+    return results
+
+
+def best_and_worst(result, metric):
+    values = sorted(run[metric] for run in result['runs'])
+    return (values[-1], values[0]) if metric == 'requests_per_second' else (values[0], values[-1])
+
+
+def compare(results, baseline, threshold):
+    """
+    :param results: results of this run
+    :param baseline: results of the baseline run
+    :param threshold: relative change tolerated, e.g 0.1
+    :return: names of the scenarios which regressed
+    """
+    regressions = []
+    print('\n{:<28} {:>12} {:>12} {:>12}'.format('vs baseline', 'req/s', 'p50', 'p99'))
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        changes = {metric: result[metric] / base[metric] - 1 for metric in METRICS}
+        # Noise spreads the repeats: a regression makes the best repeat of this run worse than the worst repeat of the
+        # baseline
+        gaps = {metric: best_and_worst(result, metric)[0] / best_and_worst(base, metric)[1] - 1 for metric in METRICS}
+        regressed = gaps['requests_per_second'] < -threshold or gaps['p50_ms'] > threshold \
+            or gaps['p99_ms'] > threshold
+        if regressed:
+            regressions.append(name)
+        print('{:<28} {requests_per_second:>+11.1%} {p50_ms:>+11.1%} {p99_ms:>+11.1%}{}'.format(
+            name, '   REGRESSION' if regressed else '', **changes))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database-url', help='database emptied and seeded, a throwaway SQLite file by default')
+    parser.add_argument('--items', type=int, default=5000, help='items seeded')
+    parser.add_argument('--requests', type=int, default=200, help='timed requests per scenario and repeat')
+    parser.add_argument('--slow-requests', type=int, default=20,
+                        help='timed requests per repeat of the scenarios hashing a password')
+    parser.add_argument('--warmup', type=int, default=20, help='untimed requests per scenario')
+    parser.add_argument('--repeats', type=int, default=5, help='times each scenario is timed')
+    parser.add_argument('--only', help='comma separated scenarios to run')
+    parser.add_argument('--output', help='write the results to this JSON file')
+    parser.add_argument('--compare', help='JSON file of baseline results to compare with')
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help='relative gap between the repeats of the two runs flagged as a regression')
+    args = parser.parse_args()
+
+    meta = {
+        'date': datetime.now().isoformat(),
+        'config': 'benchmark',
+        'python': platform.python_version(),
+        'database': args.database_url.split(':', 1)[0] if args.database_url else 'sqlite',
+        'items': args.items,
+        'requests': args.requests,
+        'slow_requests': args.slow_requests,
+        'repeats': args.repeats,
+    }
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)
+        mismatches = ['{} {!r} != {!r}'.format(key, baseline['meta'].get(key), meta[key]) for key in COMPARABLE_META
+                      if baseline['meta'].get(key) != meta[key]]
+        if mismatches:
+            parser.error('the baseline was measured differently: ' + ', '.join(mismatches))
+
+    database = None
+    database_url = args.database_url
+    if database_url is None:
+        database = tempfile.NamedTemporaryFile(suffix='.db', delete=False)
+        database_url = 'sqlite:///' + database.name
+    try:
+        only = set(args.only.split(',')) if args.only else None
+        results = run(database_url, args.items, args.requests, args.slow_requests, args.warmup, args.repeats, only)
+    finally:
+        if database is not None:
+            os.unlink(database.name)
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump({'meta': meta, 'results': results}, file, indent=2)
+
+    if baseline is not None and compare(results, baseline['results'], args.threshold):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+"""
+Login benchmark
+- Fires concurrent logins at POST /auth while a client keeps reading GET /items, once with bcrypt in the request
+  threads (PASSWORD_HASHER_WORKERS=0) and once with the process pool, and prints the login throughput and the
+  latency of GET /items
+- Runs with the benchmark config (production bcrypt rounds unless --rounds) against a throwaway SQLite database
+  through the Flask test client, so it measures the app, not a web server
+- Usage (from server/): JWT_SECRET_KEY=x python -m benchmarks.login_benchmark [--logins 40] [--threads 8]
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import threading
+import time
+
+from main.app import create_app
+from main.db import db
+from main.utils.password_hasher import password_hasher
+from tests.helpers import create_test_db
+
+
+def run(workers, logins, threads, rounds):
+    database = tempfile.NamedTemporaryFile(suffix='.db', delete=False)
+    app = create_app('benchmark')
+    app.config.update(SQLALCHEMY_DATABASE_URI='sqlite:///' + database.name, PASSWORD_HASHER_WORKERS=workers,
+                      PASSWORD_HASHER_MAX_PENDING=logins)
+    if rounds is not None:
+        app.config['BCRYPT_ROUNDS'] = rounds
+    password_hasher.init_app(app)
+    with app.app_context():
+        db.init_app(app)
+        db.create_all()
+        create_test_db()
+    # Start the pool before measuring
+    password_hasher.verify('123456', password_hasher.hash('123456'))
+
+    pending = list(range(logins))
+    lock = threading.Lock()
+    done = threading.Event()
+    read_latencies = []
+
+    def login():
+        client = app.test_client()
+        while True:
+            with lock:
+                if not pending:
+                    return
+                pending.pop()
+            response = client.post('/auth', json={'email': 'admin@gmail.com', 'password': '123456'})
+            assert response.status_code == 200, response.get_json()
+
+    def read_items():
+        client = app.test_client()
+        while not done.is_set():
+            start = time.perf_counter()
+            client.get('/items')
+            read_latencies.append(time.perf_counter() - start)
+
+    reader = threading.Thread(target=read_items)
+    login_threads = [threading.Thread(target=login) for _ in range(threads)]
+    start = time.perf_counter()
+    reader.start()
+    for thread in login_threads:
+        thread.start()
+    for thread in login_threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    done.set()
+    reader.join()
+
+    password_hasher.shutdown()
+    os.unlink(database.name)
+
+    read_latencies.sort()
+    return {
+        'logins_per_second': logins / elapsed,
+        'items_p50_ms': statistics.median(read_latencies) * 1000,
+        'items_p95_ms': read_latencies[int(len(read_latencies) * 0.95)] * 1000,
+        'items_requests': len(read_latencies),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--logins', type=int, default=40)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--rounds', type=int, help='bcrypt rounds, those of the benchmark config by default')
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    for label, workers in (('request threads', 0), ('process pool ({})'.format(args.workers), args.workers)):
+        result = run(workers, args.logins, args.threads, args.rounds)
+        print('{:<20} {logins_per_second:8.1f} logins/s   GET /items p50 {items_p50_ms:7.1f}ms '
+              'p95 {items_p95_ms:7.1f}ms ({items_requests} requests)'.format(label, **result))
+
+
+if __name__ == '__main__':
+    main()
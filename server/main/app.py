@@ -2,21 +2,52 @@ from flask import Flask
 from flask_cors import CORS
 from flask_jwt_extended import JWTManager
 
+from main.commands import commands
 from main.controllers.auth import auth_api
+from main.controllers.autocomplete import autocomplete_api
 from main.controllers.category import category_api
 from main.controllers.item import item_api
+from main.controllers.job import job_api
+from main.controllers.metrics import metrics_api
+from main.controllers.stats import stats_api
 from main.controllers.user import user_api
 from main.errors import error_handlers
+from main.schemas.registry import schema_registry
+from main.utils.autocomplete import autocomplete
 from main.utils.config_helpers import choose_config
+from main.utils.entity_cache import entity_cache
+from main.utils.fragment_cache import fragment_cache
+from main.utils.jobs import job_runner
+from main.utils.metrics import metrics
+from main.utils.pagination import count_cache
+from main.utils.pool_metrics import pool_metrics
+from main.utils.query_tracker import query_tracker
+from main.utils.replica_router import replica_router
+from main.utils.token_denylist import token_denylist
+from main.utils.password_hasher import password_hasher
 
 
 def create_app(app_type):
     app = Flask(__name__)
 
     app.config.from_object(choose_config(app_type))
+    app.logger.setLevel(app.config['LOG_LEVEL'])
 
-    JWTManager(app)
+    jwt = JWTManager(app)
+    jwt.token_in_blacklist_loader(token_denylist.is_token_revoked)
     CORS(app)
+    pool_metrics.init_app(app)
+    metrics.init_app(app)
+    query_tracker.init_app(app)
+    replica_router.init_app(app)
+    count_cache.init_app(app)
+    entity_cache.init_app(app)
+    fragment_cache.init_app(app)
+    schema_registry.init_app(app)
+    autocomplete.init_app(app)
+    password_hasher.init_app(app)
+    token_denylist.init_app(app)
+    job_runner.init_app(app)
 
     app.register_blueprint(error_handlers)
 
@@ -24,5 +55,12 @@ def create_app(app_type):
     app.register_blueprint(category_api)
     app.register_blueprint(item_api)
     app.register_blueprint(auth_api)
+    app.register_blueprint(stats_api)
+    app.register_blueprint(autocomplete_api)
+    app.register_blueprint(job_api)
+    app.register_blueprint(metrics_api)
+
+    for command in commands:
+        app.cli.add_command(command)
 
     return app
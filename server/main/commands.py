@@ -0,0 +1,77 @@
+from datetime import datetime
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+
+from main.models.category import CategoryModel
+from main.models.item_term import ItemTermModel
+from main.models.revoked_token import RevokedTokenModel
+from main.utils.jobs import job_runner
+from main.utils.token_denylist import token_denylist
+
+
+@click.command('reconcile-item-counts')
+@with_appcontext
+def reconcile_item_counts_command():
+    """
+    Repair the denormalized item counters of categories
+    Usage: FLASK_APP=run.py flask reconcile-item-counts
+    """
+    repaired = CategoryModel.reconcile_item_counts()
+    click.echo('Repaired the item count of {} categories.'.format(repaired))
+
+
+@click.command('rebuild-search-index')
+@click.option('--chunk-size', default=1000, show_default=True, help='Number of items indexed per transaction.')
+@with_appcontext
+def rebuild_search_index_command(chunk_size):
+    """
+    Rebuild the full-text search index of items from scratch
+    Usage: FLASK_APP=run.py flask rebuild-search-index
+    """
+    indexed = ItemTermModel.rebuild(chunk_size=chunk_size)
+    click.echo('Indexed {} items.'.format(indexed))
+
+
+@click.command('revoke-token')
+@click.argument('jti')
+@with_appcontext
+def revoke_token_command(jti):
+    """
+    Revoke an access token by its jti, it's kept in the denylist until every token issued now would have expired
+    Usage: FLASK_APP=run.py flask revoke-token <jti>
+    """
+    if RevokedTokenModel.is_revoked(jti):
+        click.echo('Token {} is already revoked.'.format(jti))
+        return
+    lifetime = current_app.config['JWT_ACCESS_TOKEN_EXPIRES']
+    token_denylist.revoke(jti, datetime.utcnow() + lifetime if lifetime else None)
+    click.echo('Revoked token {}.'.format(jti))
+
+
+@click.command('purge-revoked-tokens')
+@with_appcontext
+def purge_revoked_tokens_command():
+    """
+    Delete the revoked tokens which have expired (also done by every worker every TOKEN_DENYLIST_REBUILD_INTERVAL)
+    Usage: FLASK_APP=run.py flask purge-revoked-tokens
+    """
+    purged = RevokedTokenModel.purge_expired()
+    click.echo('Purged {} expired tokens.'.format(purged))
+
+
+@click.command('recover-jobs')
+@with_appcontext
+def recover_jobs_command():
+    """
+    Run again the background jobs left pending or running by stopped workers (also done by every worker every
+    JOB_LEASE_SECONDS when JOB_WORKERS > 0)
+    Usage: FLASK_APP=run.py flask recover-jobs
+    """
+    recovered = job_runner.recover()
+    click.echo('Recovered {} jobs.'.format(recovered))
+
+
+commands = [reconcile_item_counts_command, rebuild_search_index_command, revoke_token_command,
+            purge_revoked_tokens_command, recover_jobs_command]
@@ -7,7 +7,99 @@ class BaseConfig:
 
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL')
+    # Connection pool of each worker, the queue settings are ignored for SQLite which has no queue
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        'pool_size': int(os.environ.get('DB_POOL_SIZE', 10)),
+        'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', 10)),  # connections opened beyond pool_size under load
+        'pool_timeout': 5,  # seconds a request waits for a connection before failing with 503
+        'pool_recycle': 1800,  # seconds, below MySQL's wait_timeout so we never use a connection the server closed
+        'pool_pre_ping': True,  # checks the connection on checkout, reconnects after a failover or a restart
+    }
+    # Checkouts waiting this long are logged, with the state of the pool
+    DB_POOL_SLOW_CHECKOUT = 0.1  # seconds
+
+    # Read replicas (comma separated urls) serving the read-only views, writes and flushes go to SQLALCHEMY_DATABASE_URI
+    SQLALCHEMY_BINDS = {'replica_{}'.format(index): url for index, url
+                        in enumerate(filter(None, os.environ.get('DATABASE_REPLICA_URLS', '').split(',')))}
+    DATABASE_REPLICA_SELECTION = 'round_robin'  # or 'least_loaded'
+    # Seconds during which a client who wrote reads from the primary, longer than the replication lag
+    READ_YOUR_WRITES_WINDOW = 5
+
+    # Monitoring endpoints (GET /metrics, GET /stats/*): open to anyone with MONITORING_OPEN, otherwise to requests
+    # sending `Authorization: Bearer <MONITORING_TOKEN>` only, and hidden without a token
+    MONITORING_OPEN = False
+    MONITORING_TOKEN = os.environ.get('MONITORING_TOKEN')
+
+    # Directory shared by the worker processes to aggregate GET /metrics, None when the server has a single process
+    METRICS_MULTIPROCESS_DIR = os.environ.get('METRICS_MULTIPROCESS_DIR')
+    METRICS_FLUSH_INTERVAL = 5  # seconds between two writes of the counters of a worker
+
+    # Level of the app logger (e.g the JSON line of each request logged by the query tracker at INFO), its records go
+    # to the handlers of the root logger, or to stderr when there is none
+    LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
+
+    # SQL statements of each request: X-Query-* response headers (never in production), N+1 warning threshold
+    QUERY_STATS_HEADERS = False
+    QUERY_REPEAT_WARNING = 5  # executions of the same statement in one request
     JWT_SECRET_KEY = os.environ.get('JWT_SECRET_KEY')
     JWT_ERROR_MESSAGE_KEY = 'error_message'
+    # Access tokens are checked against the denylist of revoked tokens (logout, revoke-token command)
+    JWT_BLACKLIST_ENABLED = True
+    JWT_BLACKLIST_TOKEN_CHECKS = ['access']
 
     SECRET_KEY = os.environ.get('APP_SECRET_KEY')
+
+    # How list endpoints compute total_items when client doesn't send ?total=: none, approx, cached or exact
+    PAGINATION_TOTAL_MODE = 'cached'
+    PAGINATION_COUNT_CACHE_TTL = 30  # seconds
+
+    # Number of rows per multi-row INSERT statement of the bulk endpoints
+    BULK_INSERT_CHUNK_SIZE = 500
+    # Number of rows per UPDATE/DELETE transaction of the bulk endpoints and of the category deletion job, keeps row
+    # locks short
+    BULK_WRITE_CHUNK_SIZE = 500
+
+    # Number of rows fetched from the server-side cursor and sent per chunk by the export endpoint
+    EXPORT_BATCH_SIZE = 1000
+
+    # Number of rows validated and committed together by the import endpoint
+    IMPORT_CHUNK_SIZE = 1000
+    # Lines of the body reported by the import endpoint for each kind of skipped row (duplicates, invalid rows), the
+    # others are only counted
+    IMPORT_REPORT_LIMIT = 100
+
+    # Postings of the rarest term of a search which are ranked, bounding the cost of searches for common terms
+    SEARCH_CANDIDATE_LIMIT = 1000
+
+    # Threads running background jobs (e.g category deletion), 0 runs them in the request
+    JOB_WORKERS = 2
+    # Seconds a worker holds a job without progress, after which another worker takes it over (the first one died)
+    JOB_LEASE_SECONDS = 60
+    # Times a job is taken over before being marked failed
+    JOB_MAX_ATTEMPTS = 3
+
+    # Seconds after which a worker reloads its autocomplete index, catching up with the writes of other workers
+    AUTOCOMPLETE_REFRESH_TTL = 300
+
+    # bcrypt work factor, hashes made with another one are upgraded at the next login of the user
+    BCRYPT_ROUNDS = 12
+    # Processes hashing/verifying passwords, 0 runs bcrypt in the request thread
+    PASSWORD_HASHER_WORKERS = 2
+    # Hash/verify calls queued or running at once, further logins are rejected with 503
+    PASSWORD_HASHER_MAX_PENDING = 16
+    PASSWORD_HASHER_TIMEOUT = 5  # seconds
+
+    # In-memory Bloom filter in front of the revoked_tokens table
+    TOKEN_DENYLIST_SYNC_INTERVAL = 5  # seconds before a worker sees the tokens revoked by the others
+    TOKEN_DENYLIST_REBUILD_INTERVAL = 3600  # seconds between rebuilds dropping the expired tokens
+    TOKEN_DENYLIST_CAPACITY = 100000  # revoked tokens alive at once the filter is sized for
+    TOKEN_DENYLIST_ERROR_RATE = 0.001  # share of valid tokens checked against the database
+
+    # Cache of rows read by id: 'memory' (per worker LRU), 'shared' (store at ENTITY_CACHE_STORE_URL) or None
+    ENTITY_CACHE_BACKEND = 'memory'
+    ENTITY_CACHE_MAX_SIZE = 10000  # entries, memory backend only
+    ENTITY_CACHE_TTL = 30  # seconds
+    ENTITY_CACHE_STORE_URL = os.environ.get('ENTITY_CACHE_STORE_URL')  # e.g redis://localhost:6379/0 or local://
+
+    # Per worker LRU of the JSON of items/categories keyed by (id, updated), 0 serializes every row of every response
+    FRAGMENT_CACHE_MAX_SIZE = 10000  # entries
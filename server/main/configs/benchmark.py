@@ -0,0 +1,10 @@
+from main.configs.base import BaseConfig
+
+
+class BenchmarkConfig(BaseConfig):
+    # Production settings (bcrypt rounds and password hasher pool, connection pool, caches), so the benchmarks
+    # measure what the servers run. The database is given by the benchmarks
+
+    # Jobs run in the request: the cascade delete scenario times the deletion itself, and no background writer
+    # competes with the next timed requests
+    JOB_WORKERS = 0
@@ -2,4 +2,9 @@ from main.configs.base import BaseConfig
 
 
 class DevelopmentConfig(BaseConfig):
-    pass
+    # A single developer doesn't need a big pool, a restarted local database is reconnected by pre-ping
+    SQLALCHEMY_ENGINE_OPTIONS = dict(BaseConfig.SQLALCHEMY_ENGINE_OPTIONS, pool_size=2, max_overflow=3)
+
+    # X-Query-* headers to spot N+1 queries while developing
+    QUERY_STATS_HEADERS = True
+    MONITORING_OPEN = True
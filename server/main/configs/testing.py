@@ -6,3 +6,16 @@ from main.configs.base import BaseConfig
 class TestingConfig(BaseConfig):
     TESTING = True
     SQLALCHEMY_DATABASE_URI = os.environ.get('TESTING_DATABASE_URL')
+    # Tests share one local database, they neither wait for connections nor lose them
+    SQLALCHEMY_ENGINE_OPTIONS = dict(BaseConfig.SQLALCHEMY_ENGINE_OPTIONS, pool_size=5, pool_pre_ping=False)
+
+    # Cheapest bcrypt, in the request thread
+    BCRYPT_ROUNDS = 4
+    PASSWORD_HASHER_WORKERS = 0
+    JOB_WORKERS = 0
+
+    # X-Query-* headers, asserted by the query budgets of the tests
+    QUERY_STATS_HEADERS = True
+    # The per request lines would flood the output of the tests
+    LOG_LEVEL = 'WARNING'
+    MONITORING_OPEN = True
@@ -1,15 +1,22 @@
-from flask import Blueprint
-from flask_jwt_extended import create_access_token
-from passlib.hash import bcrypt
+from datetime import datetime
 
-from main.errors import FalseAuthentication
+from flask import Blueprint, Response
+from flask_jwt_extended import create_access_token, jwt_required, get_raw_jwt
+
+from main.errors import FalseAuthentication, StatusCodeEnum
 from main.models.user import UserModel
+from main.schemas.registry import schema_registry
 from main.schemas.response import AuthResponseSchema
 from main.schemas.user import UserRegisterSchema
 from main.utils.decorators.request_parser import request_parser
+from main.utils.password_hasher import password_hasher
+from main.utils.replica_router import replica_router
+from main.utils.token_denylist import token_denylist
 
 auth_api = Blueprint('auth', __name__)
 
+auth_response_schema = schema_registry.get(AuthResponseSchema)
+
 
 @auth_api.route('/auth', methods=['POST'])
 @request_parser(body_schema=UserRegisterSchema())
@@ -22,16 +29,38 @@ def login(body_params):
 
     :raise ValidationError 400: If body of request is messed up
     :raise BadRequest 400: if the body mimetype is not JSON
+    :raise ServiceUnavailable 503: if too many passwords are being checked, client should retry later
     :return: access_token and {id, email} of the newly created user
     """
     email = body_params.get('email')
     password = body_params.get('password')
 
-    user = UserModel.query.filter_by(email=email).first()
-    if user is None or not bcrypt.verify(password, user.hashed_password):
+    with replica_router.reading():
+        user = UserModel.query.filter_by(email=email).first()
+    if user is None or not password_hasher.verify(password, user.hashed_password):
         raise FalseAuthentication('Cant login with the provided information.')
+    # BCRYPT_ROUNDS changed since the password was hashed, it's the only time we know the plain password
+    if password_hasher.needs_rehash(user.hashed_password):
+        user.hashed_password = password_hasher.hash(password)
+        user.save()
 
     access_token = create_access_token(identity=user.id)
     raw_data = {'access_token': access_token, 'user': user}
 
-    return AuthResponseSchema().dump(raw_data)
+    return auth_response_schema.dump(raw_data)
+
+
+@auth_api.route('/auth', methods=['DELETE'])
+@jwt_required
+def logout():
+    """
+    DELETE Revoke the access token of the request
+
+    :raise Unauthorized 401: If not login
+    :return: 204 response
+    """
+    claims = get_raw_jwt()
+    expires = datetime.utcfromtimestamp(claims['exp']) if 'exp' in claims else None
+    token_denylist.revoke(claims['jti'], expires)
+
+    return Response(status=StatusCodeEnum.NO_CONTENT)
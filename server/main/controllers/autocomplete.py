@@ -0,0 +1,31 @@
+from flask import Blueprint
+
+from main.db import db
+from main.models.category import CategoryModel
+from main.models.item import ItemModel
+from main.schemas.request import AutocompleteQuerySchema
+from main.utils.autocomplete import autocomplete
+from main.utils.decorators.request_parser import request_parser
+from main.utils.response_helpers import create_data_response
+
+autocomplete_api = Blueprint('autocomplete', __name__)
+
+autocomplete.register('item', lambda: db.session.query(ItemModel.id, ItemModel.title))
+autocomplete.register('category', lambda: db.session.query(CategoryModel.id, CategoryModel.title))
+
+
+@autocomplete_api.route('/autocomplete', methods=['GET'])
+@request_parser(query_schema=AutocompleteQuerySchema())
+def get_completions(query_params):
+    """
+    Complete the beginning of an item or category title, served from the in-memory prefix index of this worker
+    :param query_params:
+    :queryparam prefix: beginning of the title, case insensitive
+    :queryparam type: item (default) or category
+    :queryparam limit: maximum number of completions, default = 10
+
+    :raise ValidationError 400: When client passes invalid value for prefix, type, limit
+    :return: list of {id, title} in alphabetical order
+    """
+    completions = autocomplete.complete(query_params['type'], query_params['prefix'], query_params['limit'])
+    return create_data_response(completions)
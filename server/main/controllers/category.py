@@ -1,54 +1,124 @@
-from flask import Blueprint, Response
+from flask import Blueprint, current_app, url_for
 from flask_jwt_extended import jwt_required, get_jwt_identity
 
 from main.db import db
-from main.errors import NotFound, DuplicatedEntity, Forbidden, StatusCodeEnum
+from main.errors import NotFound, Forbidden, StatusCodeEnum
 from main.models.category import CategoryModel
 from main.models.item import ItemModel
+from main.models.item_term import ItemTermModel
 from main.schemas.category import CategorySchema
-from main.schemas.request import BasePaginationQuerySchema
-from main.schemas.response import create_pagination_response_schema
+from main.schemas.job import JobSchema
+from main.schemas.request import CategoryPaginationQuerySchema, CategoryQuerySchema
+from main.schemas.registry import schema_registry
+from main.utils.autocomplete import autocomplete
 from main.utils.decorators.request_parser import request_parser
-from main.utils.response_helpers import create_data_response
+from main.utils.eager_loading import column_load_options
+from main.utils.entity_cache import entity_cache
+from main.utils.fragment_cache import fragment_cache, make_fragment_response
+from main.utils.jobs import job_runner
+from main.utils.replica_router import replica_router
+from main.utils.pagination import is_keyset_request, keyset_paginate, offset_paginate, get_total_mode, count_cache, \
+    get_page_validators
+from main.utils.response_helpers import create_data_response, make_conditional_response, make_etag
+from main.utils.unique_constraints import raise_duplicated_entity
 
 category_api = Blueprint('category', __name__)
 
-category_schema = CategorySchema()
-categories_schema = CategorySchema(many=True)
+category_schema = schema_registry.get(CategorySchema)
+categories_schema = schema_registry.get(CategorySchema, many=True)
+# Serializers of the hot paths, same output as category_schema.dump and the pagination schema of categories
+dump_category = schema_registry.get_dump(category_schema)
+dump_categories_page = schema_registry.get_dump(schema_registry.get_pagination_response(categories_schema))
+job_schema = schema_registry.get(JobSchema)
+
+
+def _get_category_serializers(field_names):
+    """
+    :param field_names: fields selected by ?fields=, None for every field
+    :return: (schema of the categories, dump of a category, dump of a page of categories), shared by the requests
+    selecting the same fields
+    """
+    if field_names is None:
+        return categories_schema, dump_category, dump_categories_page
+    schema = schema_registry.get(CategorySchema, many=True, only=field_names)
+    return schema, schema_registry.get_dump(schema_registry.get(CategorySchema, only=field_names)), \
+        schema_registry.get_dump(schema_registry.get_pagination_response(schema))
+
+
+def _category_version(field_names, row):
+    return 'category', field_names, row.id, row.updated
 
 
 @category_api.route('/categories', methods=['GET'])
-@request_parser(query_schema=BasePaginationQuerySchema())
+@replica_router.read_only
+@request_parser(query_schema=CategoryPaginationQuerySchema())
 def get_categories(query_params):
     """
     Get all categories with pagination
     :param query_params:
     :queryparam page: page that client wants to get, default = 1
     :queryparam per_page: 'items' per page that client wants to get, default = 5
+    :queryparam after: cursor returned as next_cursor by the previous page, switches to cursor pagination
+    :queryparam limit: 'items' per page for cursor pagination, default = 5
+    :queryparam total: how total_items is computed: none, approx, cached or exact, default = app config
+    :queryparam fields: comma separated fields of the categories to return (id is always returned), default = all
 
-    :raise ValidationError 400: When client passes invalid value for page, per_page
-    :return: List of categories, current_page, per_page, total.
+    :raise ValidationError 400: When client passes invalid value for page, per_page, after, limit, fields
+    :raise BadRequest 400: When the cursor doesn't belong to this kind of request
+    :return: List of categories, current_page, per_page, total (or per_page, next_cursor for cursor pagination).
+    304 Not Modified if the client sends the ETag of the current page.
     """
-    paginator = CategoryModel.query.paginate(page=query_params['page'],
-                                             per_page=query_params['per_page'], error_out=False)
+    field_names = query_params['fields']
+    schema, dump, dump_page = _get_category_serializers(field_names)
+    # Only the selected columns are loaded
+    query = CategoryModel.query if field_names is None \
+        else CategoryModel.query.options(*column_load_options(CategoryModel, schema))
+
+    # Paginate ids and timestamps first, it's all a conditional request needs, full rows are only loaded for a 200
+    versions_query = db.session.query(CategoryModel.id, CategoryModel.updated)
+    if is_keyset_request(query_params):
+        paginator = keyset_paginate(versions_query, keys=(CategoryModel.id,),
+                                    after=query_params['after'], limit=query_params['limit'])
+    else:
+        paginator = offset_paginate(versions_query.order_by(CategoryModel.id), table_name=CategoryModel.__tablename__,
+                                    page=query_params['page'], per_page=query_params['per_page'],
+                                    total_mode=get_total_mode(query_params), count_query=CategoryModel.query)
+    etag = get_page_validators(paginator, variant=field_names)
+
+    def build_body():
+        # Rows whose version was already serialized are served from the fragment cache, the others loaded at once
+        fragments = fragment_cache.get_fragments(
+            paginator.items, version=lambda row: _category_version(field_names, row),
+            load=lambda ids: query.filter(CategoryModel.id.in_(ids)), dump=dump)
+        paginator.items = []
+        return make_fragment_response(dict(dump_page(paginator), data=fragments))
 
-    return create_pagination_response_schema(data_schema=categories_schema).dump(paginator)
+    return make_conditional_response(etag, None, build_body)
 
 
 @category_api.route('/categories/<int:category_id>', methods=['GET'])
-def get_category(category_id):
+@replica_router.read_only
+@request_parser(query_schema=CategoryQuerySchema())
+def get_category(category_id, query_params):
     """
     Get the category by id
     :param category_id: id of the category want to get
+    :param query_params:
+    :queryparam fields: comma separated fields of the category to return (id is always returned), default = all
 
+    :raise ValidationError 400: When client passes invalid value for fields
     :raise Not Found 404: If category with that id doesn't exist
-    :return: Category with that id
+    :return: Category with that id, 304 Not Modified if the client sends its current ETag or Last-Modified
     """
     category = CategoryModel.find_by_id(category_id)
     if category is None:
         raise NotFound(error_message='Category with this id doesn\'t exist.')
+    field_names = query_params['fields']
+    _, dump, _ = _get_category_serializers(field_names)
 
-    return create_data_response(category_schema.dump(category))
+    return make_conditional_response(make_etag(category.id, category.updated, field_names), category.updated,
+                                     lambda: make_fragment_response(create_data_response(fragment_cache.get_fragment(
+                                         _category_version(field_names, category), lambda: dump(category)))))
 
 
 @category_api.route('/categories', methods=['POST'])
@@ -67,14 +137,14 @@ def create_category(body_params):
     :raise Unauthorized 401: If user is not login-ed
     :return: the created category
     """
-    if CategoryModel.query.filter_by(title=body_params['title']).first():
-        raise DuplicatedEntity(error_message='Category with this title has already existed.')
-
     body_params['creator_id'] = get_jwt_identity()
     category = CategoryModel(**body_params)
-    category.save()
+    with raise_duplicated_entity('Category with this title has already existed.'):
+        category.save()
+    count_cache.invalidate(CategoryModel.__tablename__)
+    autocomplete.add('category', category.id, category.title)
 
-    return create_data_response(category_schema.dump(category))
+    return create_data_response(dump_category(category))
 
 
 @category_api.route('/categories/<int:category_id>', methods=['PUT'])
@@ -96,7 +166,7 @@ def update_category(category_id, body_params):
     :raise Not Found 404: If category with that id doesn't exist
     :return: the updated category
     """
-    category = CategoryModel.find_by_id(category_id)
+    category = CategoryModel.find_by_id(category_id, for_update=True)
     if category is None:
         raise NotFound(error_message='Category with this id doesn\'t exist.')
 
@@ -107,29 +177,30 @@ def update_category(category_id, body_params):
     title = body_params.get('title')
     description = body_params.get('description')
     if title:
-        if CategoryModel.query.filter_by(title=title).first():
-            raise DuplicatedEntity(error_message='There is already a category with this title.')
         category.title = title
     if description:
         category.description = description
-    category.save()
+    with raise_duplicated_entity('There is already a category with this title.'):
+        category.save()
+    if title:
+        autocomplete.add('category', category.id, category.title)
 
-    return create_data_response(category_schema.dump(category))
+    return create_data_response(dump_category(category))
 
 
 @category_api.route('/categories/<int:category_id>', methods=['DELETE'])
 @jwt_required
 def delete_category(category_id):
     """
-    Delete the category with id
+    Delete the category with id and all its items, in a background job since a category can have many items
     :param category_id: ID of the category we want to delete
 
     :raise Unauthorized 401: If user is not login-ed
     :raise Forbidden 403: if user try to update other user's category
     :raise Not Found 404: If category with that id doesn't exist
-    :return: 204 response
+    :return: 202 response with the job deleting the category, its status is at the Location header (GET /jobs/<id>)
     """
-    category = CategoryModel.find_by_id(category_id)
+    category = CategoryModel.find_by_id(category_id, for_update=True)
     if category is None:
         raise NotFound(error_message='Category with this id doesn\'t exist.')
 
@@ -137,8 +208,56 @@ def delete_category(category_id):
     if creator_id != category.creator_id:
         raise Forbidden(error_message='You can\'t delete other users\'s category')
 
-    db.session.query(ItemModel).filter(
-            ItemModel.category_id == category_id).delete()  # delete all items in this category
-    category.delete()
+    # A second DELETE while the category is being deleted gets the running job (the category row is locked above)
+    job = job_runner.submit('delete_category', {'category_id': category_id}, creator_id=creator_id,
+                            key='delete_category:{}'.format(category_id))
+
+    return create_data_response(job_schema.dump(job)), StatusCodeEnum.ACCEPTED, \
+        {'Location': url_for('job.get_job', job_id=job.id)}
+
+
+@job_runner.handler('delete_category')
+def run_delete_category_job(job):
+    """
+    Delete the items of the category by chunks of BULK_WRITE_CHUNK_SIZE, one short transaction per chunk so reads and
+    writes of other categories aren't blocked, then delete the category
+    - The item counter of the category is decremented with each chunk, so it stays right while the job runs
+    - Safe to run again after a worker died halfway, the items left are deleted
+    :param job: JobModel, params: {category_id}
+    """
+    category_id = job.params['category_id']
+    chunk_size = current_app.config['BULK_WRITE_CHUNK_SIZE']
+    # A job taken over from a dead worker resumes, its progress is kept
+    job.total = job.progress + CategoryModel.get_item_count(category_id)
+    job.save()
+
+    ids_query = db.session.query(ItemModel.id).filter(ItemModel.category_id == category_id).order_by(ItemModel.id)
+    while True:
+        ids = [_id for _id, in ids_query.limit(chunk_size).with_for_update()]
+        if not ids:
+            # Lock the category so no item can be added to it between our last check and its deletion
+            category = CategoryModel.query.filter_by(id=category_id).with_for_update().first()
+            if ids_query.first() is not None:
+                db.session.rollback()
+                continue
+            if category is not None:
+                category.delete(commit=False)
+
+        try:
+            if ids:
+                ItemTermModel.remove_items(ids)
+                db.session.query(ItemModel).filter(ItemModel.id.in_(ids)).delete(synchronize_session=False)
+                CategoryModel.adjust_item_count(category_id, -len(ids))
+                for _id in ids:
+                    entity_cache.invalidate_on_commit(ItemModel, _id)
+                job.add_progress(len(ids))
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        count_cache.invalidate(CategoryModel.__tablename__, ItemModel.__tablename__)
 
-    return Response(status=StatusCodeEnum.NO_CONTENT)
+        if not ids:
+            autocomplete.remove('category', category_id)
+            return
+        autocomplete.remove('item', *ids)
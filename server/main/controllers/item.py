@@ -1,22 +1,70 @@
-from flask import Blueprint, Response
+import bisect
+import csv
+import io
+import json
+from collections import Counter
+
+from flask import Blueprint, Response, current_app, stream_with_context, request
 from flask_jwt_extended import jwt_required, get_jwt_identity
+from marshmallow import ValidationError
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm.attributes import set_committed_value
 
-from main.errors import NotFound, DuplicatedEntity, Forbidden, StatusCodeEnum
+from main.db import db
+from main.errors import NotFound, DuplicatedEntity, Forbidden, StatusCodeEnum, ErrorCodeEnum, BadRequest
 from main.models.category import CategoryModel
 from main.models.item import ItemModel
+from main.models.item_term import ItemTermModel
 from main.schemas.item import ItemSchema
-from main.schemas.request import ItemPaginationQuerySchema
-from main.schemas.response import create_pagination_response_schema
+from main.schemas.request import ItemPaginationQuerySchema, ItemQuerySchema, ItemBulkCreateSchema, \
+    ItemBulkUpdateSchema, ItemBulkSelectionSchema, ItemExportQuerySchema, ItemImportQuerySchema, ItemSearchQuerySchema
+from main.schemas.registry import schema_registry
+from main.utils.autocomplete import autocomplete
 from main.utils.decorators.request_parser import request_parser
-from main.utils.response_helpers import create_data_response
+from main.utils.eager_loading import eager_load_options, column_load_options
+from main.utils.entity_cache import entity_cache
+from main.utils.fragment_cache import fragment_cache, make_fragment_response
+from main.utils.replica_router import replica_router
+from main.utils.pagination import is_keyset_request, keyset_paginate, offset_paginate, get_total_mode, count_cache, \
+    get_page_validators, fill_page_items, KeysetPage
+from main.utils.response_helpers import create_data_response, make_conditional_response, make_etag
+from main.utils.unique_constraints import raise_duplicated_entity, is_unique_violation
 
 item_api = Blueprint('item', __name__)
 
-item_schema = ItemSchema()
-items_schema = ItemSchema(many=True)
+item_schema = schema_registry.get(ItemSchema)
+items_schema = schema_registry.get(ItemSchema, many=True)
+# Serializers of the hot paths, same output as item_schema.dump and the pagination schema of items
+dump_item = schema_registry.get_dump(item_schema)
+dump_items_page = schema_registry.get_dump(schema_registry.get_pagination_response(items_schema))
+# The nested category of listed items is loaded in the same query as the items
+items_load_options = eager_load_options(ItemModel, items_schema)
+bulk_create_items_schema = schema_registry.get(ItemSchema, many=True, exclude=['creator_id'])
+export_columns = (ItemModel.id, ItemModel.title, ItemModel.description, ItemModel.category_id, ItemModel.creator_id,
+                  ItemModel.created, ItemModel.updated)
+
+
+def _get_item_serializers(field_names):
+    """
+    :param field_names: fields selected by ?fields=, None for every field
+    :return: (schema of the items, dump of an item, dump of a page of items), shared by the requests selecting the
+    same fields
+    """
+    if field_names is None:
+        return items_schema, dump_item, dump_items_page
+    schema = schema_registry.get(ItemSchema, many=True, only=field_names)
+    return schema, schema_registry.get_dump(schema_registry.get(ItemSchema, only=field_names)), \
+        schema_registry.get_dump(schema_registry.get_pagination_response(schema))
+
+
+def _item_version(field_names, item_id, updated, category=None):
+    # The serialized fields of the nested category (id, title) are part of the representation when it is selected.
+    # Not its `updated`, which every item write in the category moves through its item_count
+    return 'item', field_names, item_id, updated, category
 
 
 @item_api.route('/items', methods=['GET'])
+@replica_router.read_only
 @request_parser(query_schema=ItemPaginationQuerySchema())
 def get_items(query_params):
     """
@@ -25,35 +73,180 @@ def get_items(query_params):
     :queryparam page: page that client wants to get, default = 1
     :queryparam per_page: items per page that client wants to get, default = 5
     :queryparam category_id: Identifier or the category to which the items belong
+    :queryparam after: cursor returned as next_cursor by the previous page, switches to cursor pagination
+    :queryparam limit: items per page for cursor pagination, default = 5
+    :queryparam total: how total_items is computed: none, approx, cached or exact, default = app config
+    :queryparam fields: comma separated fields of the items to return (id is always returned), default = all
 
-    :raise ValidationError 400: When client passes invalid value for page, per_page
-    :return: List of items, current_page, per_page, total.
+    :raise ValidationError 400: When client passes invalid value for page, per_page, after, limit, fields
+    :raise BadRequest 400: When the cursor doesn't belong to this kind of request
+    :return: List of items, current_page, per_page, total (or per_page, next_cursor for cursor pagination).
+    304 Not Modified if the client sends the ETag of the current page.
     """
     query = {}
     # Schema will automatically set category_id to None if client doesn't send a body consisting category_id
     if query_params['category_id'] is not None:
         query['category_id'] = query_params['category_id']
+    filters = [ItemModel.category_id == query['category_id']] if query else []
+
+    field_names = query_params['fields']
+    schema, dump, dump_page = _get_item_serializers(field_names)
+    # Only the selected columns are loaded, and the category only joined when it is selected
+    with_category = field_names is None or 'category' in field_names
+    load_options = items_load_options if field_names is None else column_load_options(ItemModel, schema)
+
+    # Paginate ids and timestamps first, it's all a conditional request needs, full rows are only loaded for a 200
+    if with_category:
+        versions_query = db.session.query(ItemModel.id, ItemModel.category_id, ItemModel.updated,
+                                          CategoryModel.title.label('category_title')) \
+            .join(CategoryModel, ItemModel.category_id == CategoryModel.id)
+    else:
+        versions_query = db.session.query(ItemModel.id, ItemModel.category_id, ItemModel.updated)
+    versions_query = versions_query.filter(*filters)
+    if is_keyset_request(query_params):
+        # Walk the (category_id, id) index when filtering by category, the primary key otherwise
+        keys = (ItemModel.category_id, ItemModel.id) if query else (ItemModel.id,)
+        paginator = keyset_paginate(versions_query, keys=keys, after=query_params['after'],
+                                    limit=query_params['limit'])
+    else:
+        # Items of a category are counted by the category's item counter when an approximation is fine
+        counter = (lambda: CategoryModel.get_item_count(query['category_id'])) if query else None
+        paginator = offset_paginate(versions_query.order_by(ItemModel.id), table_name=ItemModel.__tablename__,
+                                    page=query_params['page'], per_page=query_params['per_page'],
+                                    total_mode=get_total_mode(query_params), filters=query, counter=counter,
+                                    count_query=ItemModel.query.filter(*filters))
+    etag = get_page_validators(paginator, variant=field_names)
+
+    def build_body():
+        # Rows whose version was already serialized are served from the fragment cache, the others loaded at once
+        fragments = fragment_cache.get_fragments(
+            paginator.items,
+            version=lambda row: _item_version(field_names, row.id, row.updated,
+                                              (row.category_id, row.category_title) if with_category else None),
+            load=lambda ids: ItemModel.query.options(*load_options).filter(ItemModel.id.in_(ids)),
+            dump=dump)
+        paginator.items = []
+        return make_fragment_response(dict(dump_page(paginator), data=fragments))
+
+    return make_conditional_response(etag, None, build_body)
+
+
+@item_api.route('/items/search', methods=['GET'])
+@request_parser(query_schema=ItemSearchQuerySchema())
+def search_items(query_params):
+    """
+    Full-text search of items by title and description, backed by the item_terms inverted index
+    :param query_params:
+    :queryparam q: words which must all be in the title or description of the items (case insensitive)
+    :queryparam after: cursor returned as next_cursor by the previous page
+    :queryparam limit: items per page, default = 5
+
+    :raise ValidationError 400: When client passes invalid value for q, after, limit
+    :raise BadRequest 400: When the cursor doesn't belong to this kind of request
+    :return: List of items, the most relevant first (words of the title weigh more), per_page, next_cursor
+    """
+    ranked_query, keys = ItemTermModel.search_query(query_params['q'],
+                                                    candidate_limit=current_app.config['SEARCH_CANDIDATE_LIMIT'])
+    if ranked_query is None:
+        paginator = KeysetPage(items=[], per_page=query_params['limit'] or 5, next_cursor=None)
+    else:
+        paginator = keyset_paginate(ranked_query, keys=keys, after=query_params['after'], limit=query_params['limit'])
+        fill_page_items(paginator, ItemModel.query.options(*items_load_options), ItemModel.id)
+
+    return dump_items_page(paginator)
+
+
+def _format_export_row(row):
+    return [value.isoformat() if hasattr(value, 'isoformat') else value for value in row]
+
+
+@item_api.route('/items/export', methods=['GET'])
+@request_parser(query_schema=ItemExportQuerySchema())
+def export_items(query_params):
+    """
+    Stream the whole item catalog
+    - Rows are read from a server-side cursor (one SELECT, so one consistent snapshot) and sent in chunks of
+      EXPORT_BATCH_SIZE rows, memory stays flat whatever the size of the catalog
+    :param query_params:
+    :queryparam format: ndjson (default, one JSON object per line) or csv (with a header line)
+    :queryparam category_id: Identifier or the category to which the items belong
+
+    :raise ValidationError 400: When client passes invalid value for format, category_id
+    :return: streamed items ordered by id: id, title, description, category_id, creator_id, created, updated
+    """
+    export_format = query_params['format']
+    category_id = query_params['category_id']
+    batch_size = current_app.config['EXPORT_BATCH_SIZE']
+    names = [column.key for column in export_columns]
+
+    def format_rows(rows):
+        if export_format == 'csv':
+            buffer = io.StringIO()
+            csv.writer(buffer).writerows(_format_export_row(row) for row in rows)
+            return buffer.getvalue()
+        return ''.join(json.dumps(dict(zip(names, _format_export_row(row)))) + '\n' for row in rows)
 
-    paginator = ItemModel.query.filter_by(**query) \
-        .paginate(page=query_params['page'], per_page=query_params['per_page'], error_out=False)
+    def generate():
+        if export_format == 'csv':
+            yield format_rows([names])
 
-    return create_pagination_response_schema(data_schema=items_schema).dump(paginator)
+        query = db.session.query(*export_columns).order_by(ItemModel.id)
+        if category_id is not None:
+            query = query.filter(ItemModel.category_id == category_id)
+        # stream_results asks the driver for an unbuffered cursor, yield_per fetches it batch by batch
+        query = query.execution_options(stream_results=True).yield_per(batch_size)
+
+        batch = []
+        for row in query:
+            batch.append(row)
+            if len(batch) == batch_size:
+                yield format_rows(batch)
+                batch = []
+        if batch:
+            yield format_rows(batch)
+
+    mimetype = 'text/csv' if export_format == 'csv' else 'application/x-ndjson'
+    return Response(stream_with_context(generate()), mimetype=mimetype,
+                    headers={'Content-Disposition': 'attachment; filename=items.' + export_format})
 
 
 @item_api.route('/items/<int:item_id>', methods=['GET'])
-def get_item(item_id):
+@replica_router.read_only
+@request_parser(query_schema=ItemQuerySchema())
+def get_item(item_id, query_params):
     """
     Get the item with id
     :param item_id: id of the category
+    :param query_params:
+    :queryparam fields: comma separated fields of the item to return (id is always returned), default = all
 
+    :raise ValidationError 400: When client passes invalid value for fields
     :raise Not Found 404: If item with that id doesn't exist
-    :return: Item with that id
+    :return: Item with that id, 304 Not Modified if the client sends its current ETag, or its current Last-Modified
+    when the category isn't selected
     """
     item = ItemModel.find_by_id(item_id)
     if item is None:
         raise NotFound(error_message='Item with this id doesn\'t exist.')
+    field_names = query_params['fields']
+    _, dump, _ = _get_item_serializers(field_names)
+
+    # The nested category is part of the representation, when it is selected
+    nested_category = None
+    last_modified = item.updated
+    if field_names is None or 'category' in field_names:
+        # Read the nested category through the cache too, rather than letting dump lazy-load it from the database
+        category = CategoryModel.find_by_id(item.category_id)
+        set_committed_value(item, 'category', category)
+        nested_category = (category.id, category.title)
+        # No timestamp tells when the title of the category changed, only the ETag validates the item then
+        last_modified = None
 
-    return create_data_response(item_schema.dump(item))
+    version = _item_version(field_names, item.id, item.updated, nested_category)
+    etag = make_etag(*version)
+    return make_conditional_response(etag, last_modified,
+                                     lambda: make_fragment_response(create_data_response(
+                                         fragment_cache.get_fragment(version, lambda: dump(item)))))
 
 
 @item_api.route('/items', methods=['POST'])
@@ -74,16 +267,216 @@ def create_item(body_params):
     :raise NotFound 404: If category_id is not valid
     :return: the created item
     """
-    if CategoryModel.find_by_id(body_params['category_id']) is None:
+    if CategoryModel.find_by_id(body_params['category_id'], for_update=True) is None:
         raise NotFound(error_message='Category with this id doesn\'t exist.')
-    if ItemModel.query.filter_by(title=body_params['title']).first():
-        raise DuplicatedEntity(error_message='Item with this title exists.')
 
     body_params['creator_id'] = get_jwt_identity()
     item = ItemModel(**body_params)
-    item.save()
+    CategoryModel.adjust_item_count(item.category_id, 1)
+    with raise_duplicated_entity('Item with this title exists.'):
+        db.session.add(item)
+        db.session.flush()  # Generate the id referred to by the search index
+        ItemTermModel.index_items([(item.id, item.title, item.description)])
+        item.save()
+    count_cache.invalidate(ItemModel.__tablename__)
+    autocomplete.add('item', item.id, item.title)
+
+    return create_data_response(dump_item(item))
+
+
+def _create_item_rows(rows, creator_id, atomic=True, retries=2):
+    """
+    Validate and insert a batch of raw items with set-based checks: 1 query for the categories, 1 for the titles and
+    multi-row INSERTs of BULK_INSERT_CHUNK_SIZE rows, all in one transaction
+    :param rows: list of raw items (dict)
+    :param creator_id: id of the user creating the items
+    :param atomic: if True, nothing is inserted when a row fails, the valid rows are then 'skipped'
+    :param retries: times the batch is checked again when a concurrent request wins the race on a title
+    :raise DuplicatedEntity 400: if concurrent requests keep creating the same titles after the retries
+    :return: list of result per row, in the order of rows: {index, status='created', id},
+    {index, status='failed', error_code, error_message} or {index, status='skipped'}
+    """
+    try:
+        loaded_rows, errors = bulk_create_items_schema.load(rows), {}
+    except ValidationError as error:
+        loaded_rows, errors = error.valid_data, error.messages
+
+    def fail(index, error_code, error_message):
+        results[index] = {'index': index, 'status': 'failed', 'error_code': error_code, 'error_message': error_message}
+
+    results = [None] * len(rows)
+    for index, messages in errors.items():
+        fail(index, ErrorCodeEnum.VALIDATION_ERROR, messages)
+
+    candidates = [(index, row) for index, row in enumerate(loaded_rows) if results[index] is None]
+    existing_category_ids = CategoryModel.find_existing_ids(row['category_id'] for _, row in candidates)
+    existing_titles = ItemModel.find_ids_by_titles(row['title'] for _, row in candidates)
+
+    new_rows = {}  # title -> (index, row), also catches duplicates inside the batch
+    for index, row in candidates:
+        if row['category_id'] not in existing_category_ids:
+            fail(index, ErrorCodeEnum.NORMAL_NOT_FOUND, 'Category with this id doesn\'t exist.')
+        elif row['title'] in existing_titles or row['title'] in new_rows:
+            fail(index, ErrorCodeEnum.DUPLICATED_ENTITY, 'Item with this title exists.')
+        else:
+            new_rows[row['title']] = (index, dict(row, creator_id=creator_id))
+
+    if atomic and len(new_rows) < len(rows):
+        for index, _ in new_rows.values():
+            results[index] = {'index': index, 'status': 'skipped'}
+        return results
+    if not new_rows:
+        return results
+
+    try:
+        ItemModel.bulk_insert([row for _, row in new_rows.values()],
+                              chunk_size=current_app.config['BULK_INSERT_CHUNK_SIZE'], commit=False)
+        CategoryModel.adjust_item_counts(Counter(row['category_id'] for _, row in new_rows.values()))
+        # Multi-row INSERTs don't return the generated ids, titles are unique so read them back
+        ids_by_title = ItemModel.find_ids_by_titles(new_rows)
+        ItemTermModel.index_items((ids_by_title[title], title, row['description'])
+                                  for title, (_, row) in new_rows.items())
+        db.session.commit()
+    except IntegrityError as error:
+        db.session.rollback()
+        if not is_unique_violation(error):
+            raise
+        if not retries:
+            raise DuplicatedEntity(error_message='Items with these titles are being created by another request.')
+        # A concurrent request created some of the titles since we checked them, check again to report them
+        return _create_item_rows(rows, creator_id, atomic=atomic, retries=retries - 1)
+    except Exception:
+        db.session.rollback()
+        raise
+    count_cache.invalidate(ItemModel.__tablename__)
+
+    for title, (index, _) in new_rows.items():
+        results[index] = {'index': index, 'status': 'created', 'id': ids_by_title[title]}
+        autocomplete.add('item', ids_by_title[title], title)
+    return results
+
+
+@item_api.route('/items/bulk', methods=['POST'])
+@jwt_required
+@request_parser(body_schema=ItemBulkCreateSchema())
+def create_items_bulk(body_params):
+    """
+    Create many items at once
+    :param body_params:
+    :bodyparam items: list of items {title, description, category_id}, up to 5000
+    :bodyparam atomic: if true (default), nothing is created when an item can't be, else the valid items are created
+
+    :raise ValidationError 400: if the envelope (items, atomic) is messed up
+    :raise BadRequest 400: if the body mimetype is not JSON, or in atomic mode if an item can't be created, the
+    error_message then lists the failed items
+    :raise DuplicatedEntity 400: if concurrent requests keep creating the same titles
+    :raise Unauthorized 401: If not login
+    :return: status of every item in the order of the request: {index, status='created', id} or
+    {index, status='failed', error_code, error_message}
+    """
+    atomic = body_params['atomic']
+    results = _create_item_rows(body_params['items'], creator_id=get_jwt_identity(), atomic=atomic)
+
+    failed_results = [result for result in results if result['status'] == 'failed']
+    if atomic and failed_results:
+        raise BadRequest(error_message=failed_results)
+
+    return create_data_response(results)
+
 
-    return create_data_response(item_schema.dump(item))
+def _read_import_rows(stream, import_format):
+    """
+    Parse the body line by line, never holding more than a line (a record for CSV) in memory
+    :param stream: binary stream of the request body
+    :param import_format: 'ndjson' or 'csv' (the first line holds the column names)
+    :return: generator of (line_number, raw item or None, error_message or None), blank lines are ignored
+    """
+    lines = (line.decode('utf-8', errors='replace') for line in stream)
+
+    if import_format == 'csv':
+        reader = csv.DictReader(lines)
+        for row in reader:
+            if None in row:
+                yield reader.line_num, None, 'Too many columns.'
+            else:
+                yield reader.line_num, row, None
+        return
+
+    for line_number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            yield line_number, None, 'Invalid JSON.'
+            continue
+        if not isinstance(row, dict):
+            yield line_number, None, 'Invalid input type.'
+        else:
+            yield line_number, row, None
+
+
+@item_api.route('/items/import', methods=['POST'])
+@jwt_required
+@request_parser(query_schema=ItemImportQuerySchema())
+def import_items(query_params):
+    """
+    Create items from a NDJSON or CSV body of any size
+    - The body is parsed incrementally, rows are validated and committed by chunks of chunk_size rows so memory is
+      bounded by the chunk size. A chunk committed stays committed if a later one fails.
+    - Skipped rows are counted, only the first IMPORT_REPORT_LIMIT of each kind are reported
+    :param query_params:
+    :queryparam format: ndjson (default, one item per line) or csv (header line: title,description,category_id)
+    :queryparam chunk_size: rows validated and committed together, IMPORT_CHUNK_SIZE by default
+
+    :raise ValidationError 400: When client passes invalid value for format, chunk_size
+    :raise Unauthorized 401: If not login
+    :return: {inserted: number of created items, skipped_duplicate_count, skipped_duplicate: line numbers of the
+    first items whose title exists, invalid_count, invalid: list of {line, error_code, error_message} of the first
+    invalid rows}
+    """
+    chunk_size = query_params['chunk_size'] or current_app.config['IMPORT_CHUNK_SIZE']
+    report_limit = current_app.config['IMPORT_REPORT_LIMIT']
+    creator_id = get_jwt_identity()
+    summary = {'inserted': 0, 'skipped_duplicate_count': 0, 'invalid_count': 0}
+    # (line number, report) of the first lines of each kind, invalid rows of a chunk are known after later lines
+    reports = {'skipped_duplicate': [], 'invalid': []}
+
+    def report(kind, line_number, value):
+        summary[kind + '_count'] += 1
+        lines = reports[kind]
+        if len(lines) < report_limit or line_number < lines[-1][0]:
+            bisect.insort(lines, (line_number, value))
+            del lines[report_limit:]
+
+    def import_chunk(chunk):
+        results = _create_item_rows([row for _, row in chunk], creator_id=creator_id, atomic=False)
+        for (line_number, _), result in zip(chunk, results):
+            if result['status'] == 'created':
+                summary['inserted'] += 1
+            elif result['error_code'] == ErrorCodeEnum.DUPLICATED_ENTITY:
+                report('skipped_duplicate', line_number, line_number)
+            else:
+                report('invalid', line_number, {'line': line_number, 'error_code': result['error_code'],
+                                                'error_message': result['error_message']})
+
+    chunk = []
+    for line_number, row, error_message in _read_import_rows(request.stream, query_params['format']):
+        if error_message is not None:
+            report('invalid', line_number, {'line': line_number, 'error_code': ErrorCodeEnum.VALIDATION_ERROR,
+                                            'error_message': error_message})
+            continue
+        chunk.append((line_number, row))
+        if len(chunk) == chunk_size:
+            import_chunk(chunk)
+            chunk = []
+    if chunk:
+        import_chunk(chunk)
+
+    # Rows are reported in the order of the body
+    for kind, lines in reports.items():
+        summary[kind] = [value for _, value in lines]
+    return create_data_response(summary)
 
 
 @item_api.route('/items/<int:item_id>', methods=['PUT'])
@@ -107,10 +500,10 @@ def update_item(item_id, body_params):
     """
     category_id = body_params.get('category_id')
     # After SchemaValidation, category_id is either None or a number, None will pass through this test
-    if category_id and CategoryModel.find_by_id(category_id) is None:
+    if category_id and CategoryModel.find_by_id(category_id, for_update=True) is None:
         raise NotFound(error_message='Category with this id doesn\'t exist.')
 
-    item = ItemModel.find_by_id(item_id)
+    item = ItemModel.find_by_id(item_id, for_update=True)
     if item is None:
         raise NotFound(error_message='Item with this id doesn\'t exist.')
     if item.creator_id != get_jwt_identity():
@@ -119,16 +512,24 @@ def update_item(item_id, body_params):
     title = body_params.get('title')
     description = body_params.get('description')
     if title:
-        if ItemModel.query.filter_by(title=title).first():
-            raise DuplicatedEntity(error_message='Item with this title has already existed.')
         item.title = title
     if description:
         item.description = description
-    if category_id:
+    moved = category_id and category_id != item.category_id
+    if moved:
+        CategoryModel.adjust_item_counts({item.category_id: -1, category_id: 1})
         item.category_id = category_id
-    item.save()
+    with raise_duplicated_entity('Item with this title has already existed.'):
+        if title or description:
+            db.session.flush()
+            ItemTermModel.reindex_items([item.id])
+        item.save()
+    if moved:
+        count_cache.invalidate(ItemModel.__tablename__)  # counts per category changed
+    if title:
+        autocomplete.add('item', item.id, item.title)
 
-    return create_data_response(item_schema.dump(item))
+    return create_data_response(dump_item(item))
 
 
 @item_api.route('/items/<int:item_id>', methods=['DELETE'])
@@ -143,11 +544,135 @@ def delete_item(item_id):
     :raise Not Found 404: If item with that id doesn't exist
     :return: 204 response
     """
-    item = ItemModel.find_by_id(item_id)
+    item = ItemModel.find_by_id(item_id, for_update=True)
     if item is None:
         raise NotFound(error_message='Item with this id doesn\'t exist.')
     if item.creator_id != get_jwt_identity():
         raise Forbidden(error_message='You can\'t delete other users\'s item')
+    CategoryModel.adjust_item_count(item.category_id, -1)
+    ItemTermModel.remove_items([item.id])
     item.delete()
+    count_cache.invalidate(ItemModel.__tablename__)
+    autocomplete.remove('item', item_id)
 
     return Response(status=StatusCodeEnum.NO_CONTENT)
+
+
+def _write_owned_items_in_chunks(selection, creator_id, write_chunk, after_commit=None):
+    """
+    Walk the selected items of the user by primary key in chunks of BULK_WRITE_CHUNK_SIZE, one transaction per chunk
+    so row locks are held shortly. Ownership is part of every statement, other users' items are never touched.
+    :param selection: dict having either ids or category_id
+    :param creator_id: id of the current user
+    :param write_chunk: function(rows) running the UPDATE/DELETE of a chunk of (id, category_id) rows in the current
+    transaction and returning the number of affected rows
+    :param after_commit: function(rows) called once the write of a chunk is committed
+    :return: total number of affected rows
+    """
+    query = db.session.query(ItemModel.id, ItemModel.category_id).filter(ItemModel.creator_id == creator_id)
+    if 'ids' in selection:
+        query = query.filter(ItemModel.id.in_(selection['ids']))
+    else:
+        query = query.filter(ItemModel.category_id == selection['category_id'])
+
+    chunk_size = current_app.config['BULK_WRITE_CHUNK_SIZE']
+    affected_rows = last_id = 0
+    while True:
+        # Lock the rows of the chunk so their category can't change between this SELECT and the write
+        rows = query.filter(ItemModel.id > last_id).order_by(ItemModel.id).limit(chunk_size).with_for_update().all()
+        if not rows:
+            break
+        last_id = rows[-1].id
+
+        try:
+            affected_rows += write_chunk(rows)
+            for row in rows:
+                entity_cache.invalidate_on_commit(ItemModel, row.id)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        if after_commit is not None:
+            after_commit(rows)
+
+    count_cache.invalidate(ItemModel.__tablename__)
+    return affected_rows
+
+
+def _owned_items_of_chunk(rows, creator_id):
+    return db.session.query(ItemModel).filter(ItemModel.id.in_([row.id for row in rows]),
+                                              ItemModel.creator_id == creator_id)
+
+
+@item_api.route('/items/bulk', methods=['PATCH'])
+@jwt_required
+@request_parser(body_schema=ItemBulkUpdateSchema())
+def update_items_bulk(body_params):
+    """
+    Update many items of the current user at once, items of other users in the selection are left untouched
+    :param body_params:
+    :bodyparam ids: ids of the items to update (or category_id)
+    :bodyparam category_id: update all items of this category (or ids)
+    :bodyparam changes: {description, category_id} new values of the items
+
+    :raise ValidationError 400: if form is messed up
+    :raise BadRequest 400: if the body mimetype is not JSON
+    :raise Unauthorized 401: If not login
+    :raise NotFound 404: If the new category_id is not valid
+    :return: number of updated items
+    """
+    changes = body_params['changes']
+    new_category_id = changes.get('category_id')
+    if new_category_id and CategoryModel.find_by_id(new_category_id, for_update=True) is None:
+        raise NotFound(error_message='Category with this id doesn\'t exist.')
+    creator_id = get_jwt_identity()
+
+    def update_chunk(rows):
+        if new_category_id:
+            deltas = Counter()
+            for row in rows:
+                if row.category_id != new_category_id:
+                    deltas[row.category_id] -= 1
+                    deltas[new_category_id] += 1
+            CategoryModel.adjust_item_counts(deltas)
+        affected_rows = _owned_items_of_chunk(rows, creator_id).update(changes, synchronize_session=False)
+        if 'description' in changes:
+            ItemTermModel.reindex_items([row.id for row in rows])
+        return affected_rows
+
+    affected_rows = _write_owned_items_in_chunks(body_params, creator_id, update_chunk)
+
+    return create_data_response({'affected_rows': affected_rows})
+
+
+@item_api.route('/items/bulk', methods=['DELETE'])
+@jwt_required
+@request_parser(body_schema=ItemBulkSelectionSchema())
+def delete_items_bulk(body_params):
+    """
+    Delete many items of the current user at once, items of other users in the selection are left untouched
+    :param body_params:
+    :bodyparam ids: ids of the items to delete (or category_id)
+    :bodyparam category_id: delete all items of this category (or ids)
+
+    :raise ValidationError 400: if form is messed up
+    :raise BadRequest 400: if the body mimetype is not JSON
+    :raise Unauthorized 401: If not login
+    :return: number of deleted items
+    """
+    creator_id = get_jwt_identity()
+
+    def delete_chunk(rows):
+        deltas = Counter()
+        for row in rows:
+            deltas[row.category_id] -= 1
+        CategoryModel.adjust_item_counts(deltas)
+        # Rows of the chunk are all owned by the user, _write_owned_items_in_chunks filters them on creator_id
+        ItemTermModel.remove_items([row.id for row in rows])
+        return _owned_items_of_chunk(rows, creator_id).delete(synchronize_session=False)
+
+    affected_rows = _write_owned_items_in_chunks(body_params, creator_id, delete_chunk,
+                                                 after_commit=lambda rows: autocomplete.remove(
+                                                     'item', *[row.id for row in rows]))
+
+    return create_data_response({'affected_rows': affected_rows})
@@ -0,0 +1,34 @@
+from flask import Blueprint
+from flask_jwt_extended import jwt_required, get_jwt_identity
+
+from main.errors import NotFound, Forbidden
+from main.models.job import JobModel
+from main.schemas.job import JobSchema
+from main.schemas.registry import schema_registry
+from main.utils.response_helpers import create_data_response
+
+job_api = Blueprint('job', __name__)
+
+job_schema = schema_registry.get(JobSchema)
+
+
+@job_api.route('/jobs/<int:job_id>', methods=['GET'])
+@jwt_required
+def get_job(job_id):
+    """
+    Get the status of a background job
+    :param job_id: ID of the job returned by the request which started it
+
+    :raise Unauthorized 401: If not login
+    :raise Forbidden 403: If user tries to see other user's job
+    :raise Not Found 404: If job with that id doesn't exist
+    :return: the job: type, status (pending, running, succeeded, failed), progress, total, error
+    """
+    # Not through find_by_id: the job is updated by a worker thread, maybe of another process, the cache would lag
+    job = JobModel.query.get(job_id)
+    if job is None:
+        raise NotFound(error_message='Job with this id doesn\'t exist.')
+    if job.creator_id != get_jwt_identity():
+        raise Forbidden(error_message='You can\'t see other users\'s job')
+
+    return create_data_response(job_schema.dump(job))
@@ -0,0 +1,37 @@
+import time
+
+from flask import Blueprint, Response, g, request
+
+from main.utils.decorators.monitoring import require_monitoring_access
+from main.utils.metrics import metrics
+
+metrics_api = Blueprint('metrics', __name__)
+# Only GET /metrics, the hooks below run for every request of the app
+metrics_api.before_request(require_monitoring_access)
+
+
+@metrics_api.before_app_request
+def start_timer():
+    g.request_start = time.perf_counter()
+
+
+@metrics_api.after_app_request
+def record_request(response):
+    start = g.pop('request_start', None)
+    if start is not None:
+        # Our error responses all carry an error_code, only read the body of those
+        error_code = None
+        if response.status_code >= 400 and response.is_json:
+            error_code = (response.get_json(silent=True) or {}).get('error_code')
+        metrics.record(request.blueprint, request.endpoint, request.method, response.status_code,
+                       time.perf_counter() - start, error_code=error_code)
+    return response
+
+
+@metrics_api.route('/metrics', methods=['GET'])
+def get_metrics():
+    """
+    Get the request metrics of every worker of the server
+    :return: request counts, latency histograms and error counts in the Prometheus text format
+    """
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
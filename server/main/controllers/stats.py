@@ -0,0 +1,59 @@
+from flask import Blueprint
+
+from main.db import db
+from main.schemas.registry import schema_registry
+from main.utils.entity_cache import entity_cache
+from main.utils.fragment_cache import fragment_cache
+from main.utils.pool_metrics import pool_metrics
+from main.utils.decorators.monitoring import require_monitoring_access
+from main.utils.token_denylist import token_denylist
+from main.utils.response_helpers import create_data_response
+
+stats_api = Blueprint('stats', __name__)
+stats_api.before_request(require_monitoring_access)
+
+
+@stats_api.route('/stats/cache', methods=['GET'])
+def get_cache_stats():
+    """
+    Get the counters of the entity cache of this worker
+    :return: backend, hits, misses, hit_ratio and size of the cache
+    """
+    return create_data_response(entity_cache.stats())
+
+
+@stats_api.route('/stats/fragments', methods=['GET'])
+def get_fragment_stats():
+    """
+    Get the counters of the serialized fragment cache of this worker
+    :return: hits, misses, hit_ratio and size of the cache
+    """
+    return create_data_response(fragment_cache.stats())
+
+
+@stats_api.route('/stats/schemas', methods=['GET'])
+def get_schema_stats():
+    """
+    Get the construction cost of the shared response schemas of this worker
+    :return: schemas (number built) and build_ms (time spent building them)
+    """
+    return create_data_response(schema_registry.stats())
+
+
+@stats_api.route('/stats/pool', methods=['GET'])
+def get_pool_stats():
+    """
+    Get the counters of the database connection pool of this worker
+    :return: pool class, checkouts, wait_avg_ms, wait_max_ms, slow_checkouts, timeouts, connects, invalidations, and
+    for a queue pool: size, checked_in, checked_out, overflow
+    """
+    return create_data_response(pool_metrics.stats(db.engine))
+
+
+@stats_api.route('/stats/denylist', methods=['GET'])
+def get_denylist_stats():
+    """
+    Get the counters of the revoked token filter of this worker
+    :return: filter_entries, memory_checks (tokens accepted without querying the database), database_checks
+    """
+    return create_data_response(token_denylist.stats())
@@ -1,14 +1,17 @@
 from flask import Blueprint
 from flask_jwt_extended import create_access_token
 
-from main.errors import DuplicatedEntity
 from main.models.user import UserModel
+from main.schemas.registry import schema_registry
 from main.schemas.response import AuthResponseSchema
 from main.schemas.user import UserRegisterSchema
 from main.utils.decorators.request_parser import request_parser
+from main.utils.unique_constraints import raise_duplicated_entity
 
 user_api = Blueprint('users', __name__)
 
+auth_response_schema = schema_registry.get(AuthResponseSchema)
+
 
 @user_api.route('/users', methods=['POST'])
 @request_parser(body_schema=UserRegisterSchema())
@@ -23,14 +26,12 @@ def register(body_params):
     :raise ValidationError 400: If body of request is messed up
     :raise DuplicatedEntity 400: If try to create an existed object
     :raise BadRequest 400: if the body mimetype is not JSON
+    :raise ServiceUnavailable 503: if too many passwords are being hashed, client should retry later
     :return: access_token and {id, email} of the newly created user
     """
-    email = body_params.get('email')
-    if UserModel.query.filter_by(email=email).first():
-        raise DuplicatedEntity(error_message='User with this email exists.')
-
     user = UserModel(**body_params)
-    user.save()
+    with raise_duplicated_entity('User with this email exists.'):
+        user.save()
 
     access_token = create_access_token(identity=user.id)
     raw_data = {
@@ -38,4 +39,4 @@ def register(body_params):
         'user': user
     }
 
-    return AuthResponseSchema().dump(raw_data)
+    return auth_response_schema.dump(raw_data)
@@ -1,3 +1,43 @@
-from flask_sqlalchemy import SQLAlchemy
+from flask_sqlalchemy import SQLAlchemy as BaseSQLAlchemy, SignallingSession, get_state
+from sqlalchemy import orm
+from sqlalchemy.pool import QueuePool
+
+from main.utils.pool_metrics import instrumented_pool_class, pool_metrics
+from main.utils.replica_router import replica_router
+
+# Settings of a queue of connections, SQLite gets no queue (NullPool for a file, StaticPool in memory)
+QUEUE_POOL_OPTIONS = ('pool_size', 'max_overflow', 'pool_timeout')
+
+
+class RoutingSession(SignallingSession):
+    """
+    Session sending the reads of replica_router.reading() blocks to a replica, flushes always go to the primary
+    """
+
+    def get_bind(self, mapper=None, clause=None):
+        bind = replica_router.current_bind()
+        if bind is not None and not self._flushing:
+            return get_state(self.app).db.get_engine(self.app, bind=bind)
+        return super().get_bind(mapper, clause)
+
+
+class SQLAlchemy(BaseSQLAlchemy):
+    """
+    Flask-SQLAlchemy whose engines are created with the pool settings of SQLALCHEMY_ENGINE_OPTIONS where the database
+    has a connection queue, and report to pool_metrics; sessions route reads to the replicas (see replica_router)
+    """
+
+    def create_session(self, options):
+        return orm.sessionmaker(class_=RoutingSession, db=self, **options)
+
+    def create_engine(self, sa_url, engine_opts):
+        if sa_url.drivername.startswith('sqlite'):
+            for name in QUEUE_POOL_OPTIONS:
+                engine_opts.pop(name, None)
+        engine_opts['poolclass'] = instrumented_pool_class(engine_opts.get('poolclass', QueuePool))
+        engine = super().create_engine(sa_url, engine_opts)
+        pool_metrics.instrument(engine)
+        return engine
+
 
 db = SQLAlchemy()
@@ -8,12 +8,15 @@ from sqlalchemy import exc
 
 class StatusCodeEnum(IntEnum):
     OK = 200
+    ACCEPTED = 202
     NO_CONTENT = 204
+    NOT_MODIFIED = 304
     BAD_REQUEST = 400
     UNAUTHORIZED = 401
     FORBIDDEN = 403
     NOT_FOUND = 404
     INTERNAL_SERVER_ERROR = 500
+    SERVICE_UNAVAILABLE = 503
 
 
 class ErrorCodeEnum(IntEnum):
@@ -25,6 +28,7 @@ class ErrorCodeEnum(IntEnum):
     NORMAL_NOT_FOUND = 404001
     INTERNAL_SERVER_ERROR = 500001
     INTERNAL_DATABASE_ERROR = 500002
+    SERVICE_UNAVAILABLE = 503001
 
 
 class AppBaseException(Exception):
@@ -110,6 +114,16 @@ class NotFound(AppBaseException):
         super().__init__(error_message, error_code, status_code=StatusCodeEnum.NOT_FOUND)
 
 
+class ServiceUnavailable(AppBaseException):
+    """
+    Service Unavailable Exception
+    - Will be raised when the server is too busy to take the request now, client should retry later
+    """
+
+    def __init__(self, error_message='Service Unavailable', error_code=ErrorCodeEnum.SERVICE_UNAVAILABLE):
+        super().__init__(error_message, error_code, status_code=StatusCodeEnum.SERVICE_UNAVAILABLE)
+
+
 error_handlers = Blueprint('error_handlers', __name__)
 
 
@@ -128,6 +142,12 @@ def handle_invalid_form(error):
     return response, StatusCodeEnum.BAD_REQUEST
 
 
+@error_handlers.app_errorhandler(exc.TimeoutError)
+def handle_pool_timeout(error):
+    # Every connection of the pool stayed checked out for pool_timeout seconds, the server is overloaded
+    return ServiceUnavailable(error_message='The server is busy, please retry later.').to_response()
+
+
 @error_handlers.app_errorhandler(exc.IntegrityError)
 def handle_database_error(error):
     error_info = error.orig.args
@@ -1,13 +1,19 @@
 from datetime import datetime
 
+from sqlalchemy.dialects import mysql
+
 from main.db import db
+from main.utils.entity_cache import entity_cache
+from main.utils.replica_router import replica_router
 
 
 class BaseModel:
     """
     Base Model Mixin
-    - Provide CRD operation (Update and bulk_insert have been removed since we dont use those in this project)
+    - Provide CRD operation and bulk_insert (Update has been removed since we dont use it in this project)
     - Add timestamps (created, updated)
+    - find_by_id reads through the entity cache (bypassed with for_update=True on the write paths), save/delete
+      invalidate it once committed
     - Usage: Class AModel(ModelMixin, db.Model)
     - Why add rollback: Since we give user permission to set commit=False, there would be cases session commit a lot
       of transactions in one session, so we should rollback to the start rather than keep the successful transactions
@@ -18,17 +24,58 @@ class BaseModel:
     # MetaData: A collection of Table objects and their associated schema constructs.
     __table_args__ = {'extend_existing': True}
 
-    created = db.Column(db.DateTime, default=datetime.now)
-    updated = db.Column(db.DateTime, default=datetime.now, onupdate=datetime.now)
+    # MySQL DATETIME is truncated to the second by default, keep microseconds since `updated` backs our ETags
+    created = db.Column(db.DateTime().with_variant(mysql.DATETIME(fsp=6), 'mysql'), default=datetime.now)
+    updated = db.Column(db.DateTime().with_variant(mysql.DATETIME(fsp=6), 'mysql'), default=datetime.now,
+                        onupdate=datetime.now)
 
     @classmethod
-    def find_by_id(cls, _id):
+    def find_by_id(cls, _id, for_update=False):
         """
         Find the object by its id
         :param _id: id of the object you want to find
+        :param for_update: read the row from the database, not the cache, and lock it until the commit. The cache of
+        a worker may still hold a row another worker changed or deleted, the write paths must use this.
         :return: The object that match that id, None if not found.
         """
-        return cls.query.get(_id)
+        if for_update:
+            return cls.query.with_for_update().get(_id)
+
+        # An instance already in the session may hold changes that aren't in the cache
+        instance = db.session.identity_map.get(db.session.identity_key(cls, _id))
+        if instance is not None:
+            return instance
+
+        instance = entity_cache.get(cls, _id)
+        if instance is None and entity_cache.backend is not None:
+            # A replica may lag behind the invalidations of the cache, the cache is filled from the primary
+            with replica_router.primary():
+                instance = cls.query.get(_id)
+            if instance is not None:
+                entity_cache.set(instance)
+        elif instance is None:
+            instance = cls.query.get(_id)
+        return instance
+
+    @classmethod
+    def bulk_insert(cls, rows, chunk_size=500, commit=True):
+        """
+        Insert many rows with multi-row INSERT statements, skipping the ORM unit of work
+        :param rows: list of dict of column values
+        :param chunk_size: number of rows per INSERT statement
+        :param commit: If you want to commit to the database immediately, default = True
+        :raise Exception: many exception can be raised, seek help(sqlalchemy.exc)
+        """
+        now = datetime.now()
+        try:
+            for start in range(0, len(rows), chunk_size):
+                values = [dict(row, created=now, updated=now) for row in rows[start:start + chunk_size]]
+                db.session.execute(cls.__table__.insert().values(values))
+            if commit:
+                db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
 
     def save(self, commit=True):
         """
@@ -38,6 +85,8 @@ class BaseModel:
         :return: the object itself
         """
         db.session.add(self)
+        if self.id is not None:
+            entity_cache.invalidate_on_commit(type(self), self.id)
         if commit:
             try:
                 db.session.commit()
@@ -53,6 +102,7 @@ class BaseModel:
         :raise Exception: many exception can be raised, seek help(sqlalchemy.exc)
         """
         db.session.delete(self)
+        entity_cache.invalidate_on_commit(type(self), self.id)
         if commit:
             try:
                 db.session.commit()
@@ -1,5 +1,9 @@
+from sqlalchemy import func
+
 from main.db import db
 from main.models.base import BaseModel
+from main.models.item import ItemModel
+from main.utils.entity_cache import entity_cache
 
 
 class CategoryModel(BaseModel, db.Model):
@@ -8,6 +12,75 @@ class CategoryModel(BaseModel, db.Model):
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(100), unique=True, nullable=False)
     description = db.Column(db.String(1000), nullable=False)
+    # Denormalized number of items in this category, maintained by adjust_item_count(s) in the same transaction as the
+    # item writes, so listing categories with their counts doesn't need a COUNT(*) per category
+    item_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
 
     creator_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     items = db.relationship('ItemModel', backref='category', lazy='dynamic')
+
+    @classmethod
+    def adjust_item_count(cls, category_id, delta):
+        """
+        Add delta to the item counter of a category, the change is only added to the session so it is committed (or
+        rolled back) together with the item write
+        :param category_id: id of the category
+        :param delta: number of items added (positive) or removed (negative)
+        """
+        cls.adjust_item_counts({category_id: delta})
+
+    @classmethod
+    def adjust_item_counts(cls, deltas):
+        """
+        Same as adjust_item_count for many categories
+        :param deltas: dict of category_id -> delta
+        """
+        for category_id, delta in deltas.items():
+            if delta:
+                # Relative update so concurrent writers don't overwrite each other's changes
+                db.session.query(cls).filter(cls.id == category_id) \
+                    .update({cls.item_count: cls.item_count + delta}, synchronize_session=False)
+                entity_cache.invalidate_on_commit(cls, category_id)
+
+    @classmethod
+    def find_existing_ids(cls, ids, chunk_size=1000):
+        """
+        Set-based existence check of categories
+        :param ids: iterable of category ids
+        :param chunk_size: number of ids per IN list
+        :return: set of the ids that exist
+        """
+        ids = list(set(ids))
+        existing_ids = set()
+        for start in range(0, len(ids), chunk_size):
+            query = db.session.query(cls.id).filter(cls.id.in_(ids[start:start + chunk_size]))
+            existing_ids.update(_id for _id, in query)
+        return existing_ids
+
+    @classmethod
+    def get_item_count(cls, category_id):
+        """
+        :param category_id: id of the category
+        :return: the item counter of the category, 0 if the category doesn't exist
+        """
+        return db.session.query(cls.item_count).filter(cls.id == category_id).scalar() or 0
+
+    @classmethod
+    def reconcile_item_counts(cls, commit=True):
+        """
+        Repair the item counters that drifted from the actual number of items (e.g after manual database operations)
+        :param commit: If you want to commit to the database immediately, default = True
+        :return: number of categories whose counter has been repaired
+        """
+        actual_count = db.session.query(func.count(ItemModel.id)) \
+            .filter(ItemModel.category_id == cls.id).correlate(cls).as_scalar()
+        repaired = db.session.query(cls).filter(cls.item_count != actual_count) \
+            .update({cls.item_count: actual_count}, synchronize_session=False)
+        entity_cache.invalidate_on_commit(cls)
+        if commit:
+            try:
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                raise
+        return repaired
@@ -4,6 +4,8 @@ from main.models.base import BaseModel
 
 class ItemModel(BaseModel, db.Model):
     __tablename__ = 'items'
+    # Backs cursor pagination of the items of a category, ordered on (category_id, id)
+    __table_args__ = (db.Index('ix_items_category_id_id', 'category_id', 'id'), BaseModel.__table_args__)
 
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(100), unique=True, nullable=False)
@@ -11,3 +13,18 @@ class ItemModel(BaseModel, db.Model):
 
     category_id = db.Column(db.Integer, db.ForeignKey('categories.id'), nullable=False)
     creator_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+
+    @classmethod
+    def find_ids_by_titles(cls, titles, chunk_size=1000):
+        """
+        Set-based lookup of items by title
+        :param titles: iterable of titles
+        :param chunk_size: number of titles per IN list
+        :return: dict of title -> id of the existing items
+        """
+        titles = list(titles)
+        ids_by_title = {}
+        for start in range(0, len(titles), chunk_size):
+            query = db.session.query(cls.title, cls.id).filter(cls.title.in_(titles[start:start + chunk_size]))
+            ids_by_title.update(query)
+        return ids_by_title
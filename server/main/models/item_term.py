@@ -0,0 +1,156 @@
+import re
+from collections import Counter
+
+from sqlalchemy import and_, func
+from sqlalchemy.orm import aliased
+
+from main.db import db
+from main.models.item import ItemModel
+
+TERM_MAX_LENGTH = 50
+# A word of the title weighs more in the ranking than a word of the description
+TITLE_WEIGHT = 3
+DESCRIPTION_WEIGHT = 1
+
+_WORD_PATTERN = re.compile(r'\w+')
+
+
+def tokenize(text):
+    """
+    :param text: free text
+    :return: list of lowercased terms of the text, in order
+    """
+    return [word[:TERM_MAX_LENGTH] for word in _WORD_PATTERN.findall(text.lower())]
+
+
+class ItemTermModel(db.Model):
+    """
+    Inverted index of the items for full-text search: one row per (term, item) with the weight of the term in the item
+    - The primary key (term, item_id) is the posting list of a term, (term, weight, item_id) the same list heaviest
+      last, so the best postings of a term are read without going through the others
+    - Kept in sync by the item write paths in the same transaction as the item rows: index_items, reindex_items,
+      remove_items. rebuild() builds it from scratch.
+    """
+    __tablename__ = 'item_terms'
+    __table_args__ = (db.Index('ix_item_terms_term_weight', 'term', 'weight', 'item_id'), {'extend_existing': True})
+
+    term = db.Column(db.String(TERM_MAX_LENGTH), primary_key=True)
+    item_id = db.Column(db.Integer, db.ForeignKey('items.id'), primary_key=True, index=True)
+    weight = db.Column(db.Integer, nullable=False)
+
+    @staticmethod
+    def _weigh_terms(title, description):
+        weights = Counter()
+        for term in tokenize(title):
+            weights[term] += TITLE_WEIGHT
+        for term in tokenize(description):
+            weights[term] += DESCRIPTION_WEIGHT
+        return weights
+
+    @classmethod
+    def index_items(cls, rows, chunk_size=500):
+        """
+        Add the terms of new items to the index, the rows are only added to the session
+        :param rows: iterable of (id, title, description) of items which are not indexed yet
+        :param chunk_size: number of index rows per INSERT statement
+        """
+        values = [{'term': term, 'item_id': _id, 'weight': weight}
+                  for _id, title, description in rows
+                  for term, weight in cls._weigh_terms(title, description).items()]
+        for start in range(0, len(values), chunk_size):
+            db.session.execute(cls.__table__.insert().values(values[start:start + chunk_size]))
+
+    @classmethod
+    def remove_items(cls, item_ids):
+        """
+        Remove items from the index, the change is only added to the session
+        :param item_ids: list of ids of items
+        """
+        if item_ids:
+            db.session.query(cls).filter(cls.item_id.in_(item_ids)).delete(synchronize_session=False)
+
+    @classmethod
+    def reindex_items(cls, item_ids):
+        """
+        Index again items whose title or description changed, reading their current values in the session
+        :param item_ids: list of ids of items
+        """
+        cls.remove_items(item_ids)
+        if item_ids:
+            cls.index_items(db.session.query(ItemModel.id, ItemModel.title, ItemModel.description)
+                            .filter(ItemModel.id.in_(item_ids)))
+
+    @classmethod
+    def rebuild(cls, chunk_size=1000):
+        """
+        Rebuild the whole index from the items, walking them by primary key with one transaction per chunk
+        - Each chunk replaces the postings of its items, so the items indexed meanwhile by the write paths (e.g
+          created while it runs) are indexed again, not twice, and searches keep finding the items not reached yet
+        - The postings left by items which don't exist anymore are removed last
+        :param chunk_size: number of items per transaction
+        :raise Exception: many exception can be raised, seek help(sqlalchemy.exc)
+        :return: number of indexed items
+        """
+        try:
+            indexed = last_id = 0
+            query = db.session.query(ItemModel.id, ItemModel.title, ItemModel.description).order_by(ItemModel.id)
+            while True:
+                rows = query.filter(ItemModel.id > last_id).limit(chunk_size).all()
+                if not rows:
+                    break
+                cls.remove_items([row.id for row in rows])
+                cls.index_items(rows)
+                db.session.commit()
+                indexed += len(rows)
+                last_id = rows[-1].id
+
+            item_exists = db.session.query(ItemModel.id).filter(ItemModel.id == cls.item_id).exists()
+            db.session.query(cls).filter(~item_exists).delete(synchronize_session=False)
+            db.session.commit()
+            return indexed
+        except Exception:
+            db.session.rollback()
+            raise
+
+    @classmethod
+    def search_query(cls, text, candidate_limit):
+        """
+        Rank the items having every term of the text by the sum of the weights of the terms
+        - The search is driven by the rarest term of the text: its candidate_limit heaviest postings are the candidates,
+          the other terms are looked up by primary key for them only. A search costs at most candidate_limit postings
+          plus their lookups, however common its terms are. When the rarest term has more postings, the items it
+          weighs the least in are left out.
+        - The rarest term is found by counting the postings of every term, up to candidate_limit + 1
+        :param text: free text
+        :param candidate_limit: number of postings of the rarest term ranked
+        :return: (query of (rank, id) rows, keys ordering them), rank is the negated score so that the best items come
+        first in ascending (rank, id) order, which lets keyset_paginate walk the results. (None, None) if the text has
+        no term.
+        """
+        terms = sorted(set(tokenize(text)))
+        if not terms:
+            return None, None
+
+        rarest = terms[0]
+        if len(terms) > 1:
+            counts = db.session.query(*[
+                db.session.query(func.count()).select_from(
+                    db.session.query(cls.item_id).filter(cls.term == term).limit(candidate_limit + 1).subquery()
+                ).as_scalar() for term in terms]).one()
+            rarest = min(zip(counts, terms))[1]
+
+        # Backward walk of (term, weight, item_id): heaviest first
+        candidates = db.session.query(cls.item_id.label('id'), cls.weight.label('weight')) \
+            .filter(cls.term == rarest).order_by(cls.weight.desc(), cls.item_id.desc()) \
+            .limit(candidate_limit).subquery()
+        others = [term for term in terms if term != rarest]
+        if others:
+            other = aliased(cls)
+            score = candidates.c.weight + func.sum(other.weight)
+            ranked = db.session.query(candidates.c.id, (-score).label('rank')) \
+                .join(other, and_(other.item_id == candidates.c.id, other.term.in_(others))) \
+                .group_by(candidates.c.id, candidates.c.weight) \
+                .having(func.count(other.term) == len(others)).subquery()
+        else:
+            ranked = db.session.query(candidates.c.id, (-candidates.c.weight).label('rank')).subquery()
+        return db.session.query(ranked.c.rank, ranked.c.id), (ranked.c.rank, ranked.c.id)
@@ -0,0 +1,85 @@
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import and_, or_
+
+from main.db import db
+from main.models.base import BaseModel
+
+
+class JobModel(BaseModel, db.Model):
+    """
+    Background job run by main.utils.jobs.job_runner, its row holds the status and progress shown by GET /jobs/<id>
+    - A worker runs the job while it holds its lease, renewed with every progress. A job whose lease expired (its
+      worker died) or still pending after a lease (its worker died before starting it) is claimed again by a worker
+    """
+    __tablename__ = 'jobs'
+
+    PENDING = 'pending'
+    RUNNING = 'running'
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
+
+    id = db.Column(db.Integer, primary_key=True)
+    type = db.Column(db.String(50), nullable=False)
+    params = db.Column(db.JSON, nullable=False)
+    status = db.Column(db.String(20), nullable=False, default=PENDING)
+    # Units of work done out of total (e.g deleted items), total is None when unknown
+    progress = db.Column(db.Integer, nullable=False, default=0)
+    total = db.Column(db.Integer)
+    error = db.Column(db.String(1000))
+    # Jobs of the same key (e.g the deletion of one category) don't run side by side
+    key = db.Column(db.String(100), index=True)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    lease_expires = db.Column(db.DateTime)
+
+    creator_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+
+    def add_progress(self, done):
+        """
+        Count units of work done, the change is only added to the session so it is committed together with the work
+        :param done: number of units
+        """
+        self.progress += done
+        self.lease_expires = self.next_lease_expiry()
+        self.save(commit=False)
+
+    @staticmethod
+    def next_lease_expiry():
+        return datetime.now() + timedelta(seconds=current_app.config['JOB_LEASE_SECONDS'])
+
+    @classmethod
+    def find_active(cls, key):
+        """
+        :param key: key of the job
+        :return: the pending or running job of this key, None if there is none
+        """
+        return cls.query.filter(cls.key == key, cls.status.in_((cls.PENDING, cls.RUNNING))).first()
+
+    @classmethod
+    def claimable_ids(cls):
+        """
+        :return: ids of the jobs to claim: pending for longer than a lease, or running with an expired lease
+        """
+        now = datetime.now()
+        lease = timedelta(seconds=current_app.config['JOB_LEASE_SECONDS'])
+        return [_id for _id, in db.session.query(cls.id).filter(or_(
+            and_(cls.status == cls.PENDING, cls.created < now - lease),
+            and_(cls.status == cls.RUNNING, or_(cls.lease_expires.is_(None), cls.lease_expires < now)),
+        )).order_by(cls.id)]
+
+    @classmethod
+    def claim(cls, _id):
+        """
+        Take the lease of a pending job, or of a running one whose lease expired, in one UPDATE so only one worker can
+        :param _id: id of the job
+        :return: True if the job is now ours to run
+        """
+        now = datetime.now()
+        claimed = cls.query.filter(cls.id == _id, or_(
+            cls.status == cls.PENDING,
+            and_(cls.status == cls.RUNNING, or_(cls.lease_expires.is_(None), cls.lease_expires < now)),
+        )).update({cls.status: cls.RUNNING, cls.lease_expires: cls.next_lease_expiry(),
+                   cls.attempts: cls.attempts + 1}, synchronize_session=False)
+        db.session.commit()
+        return claimed == 1
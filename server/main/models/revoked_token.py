@@ -0,0 +1,54 @@
+from datetime import datetime
+
+from main.db import db
+from main.models.base import BaseModel
+
+
+class RevokedTokenModel(BaseModel, db.Model):
+    """
+    Denylist of revoked JWTs by jti, a row is useless once its token has expired and is purged by purge_expired
+    """
+    __tablename__ = 'revoked_tokens'
+
+    id = db.Column(db.Integer, primary_key=True)
+    jti = db.Column(db.String(36), unique=True, nullable=False)
+    # Expiry of the token, NULL for tokens which never expire
+    expires = db.Column(db.DateTime, index=True)
+
+    @classmethod
+    def is_revoked(cls, jti):
+        """
+        :param jti: unique identifier of the token
+        :return: True if the token is revoked
+        """
+        return db.session.query(cls.query.filter_by(jti=jti).exists()).scalar()
+
+    @classmethod
+    def find_jtis_created_since(cls, since=None, session=None):
+        """
+        :param since: datetime, None for all
+        :param session: session to query, default = db.session
+        :return: jtis of the tokens revoked since then which haven't expired yet
+        """
+        session = session or db.session
+        query = session.query(cls.jti).filter(db.or_(cls.expires.is_(None), cls.expires > datetime.utcnow()))
+        if since is not None:
+            query = query.filter(cls.created >= since)
+        return [jti for jti, in query]
+
+    @classmethod
+    def purge_expired(cls, session=None):
+        """
+        Delete the rows of expired tokens
+        :param session: session to delete and commit with, default = db.session
+        :raise Exception: many exception can be raised, seek help(sqlalchemy.exc)
+        :return: number of deleted rows
+        """
+        session = session or db.session
+        try:
+            deleted = session.query(cls).filter(cls.expires <= datetime.utcnow()).delete(synchronize_session=False)
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+        return deleted
@@ -1,7 +1,6 @@
-from passlib.hash import bcrypt
-
 from main.db import db
 from main.models.base import BaseModel
+from main.utils.password_hasher import password_hasher
 
 
 class UserModel(BaseModel, db.Model):
@@ -24,6 +23,6 @@ class UserModel(BaseModel, db.Model):
         del kwargs['password']
 
         # bcrypt will automatically generate a salt if not specified (recommended)
-        self.hashed_password = bcrypt.hash(prehash_password)
+        self.hashed_password = password_hasher.hash(prehash_password)
         kwargs['hashed_password'] = self.hashed_password
         super().__init__(**kwargs)
@@ -8,5 +8,6 @@ class CategorySchema(Schema):
     title = TrimmedString(validate=validate.Length(min=4, max=100), required=True)
     description = TrimmedString(validate=validate.Length(min=4, max=1000), required=True)
     creator_id = fields.Integer(required=True)
+    item_count = fields.Integer(dump_only=True)
     created = fields.DateTime(dump_only=True)
     updated = fields.DateTime(dump_only=True)
@@ -1,3 +1,7 @@
+import base64
+import binascii
+import json
+
 from marshmallow import fields
 
 
@@ -11,3 +15,57 @@ class TrimmedString(fields.String):
         if hasattr(value, 'strip'):
             value = value.strip()
         return super()._deserialize(value, *args, **kwargs)
+
+
+class Cursor(fields.Field):
+    """
+    Marshmallow custom field: Cursor
+    Used for keyset pagination, the list of key values of the last row of a page is exposed to the client as an opaque
+    url-safe string, so clients can't (and don't need to) rely on how we order our rows
+    """
+    default_error_messages = {'invalid': 'Not a valid cursor.'}
+
+    def _serialize(self, value, attr, obj, **kwargs):
+        if value is None:
+            return None
+        raw = json.dumps(list(value), separators=(',', ':')).encode('utf-8')
+        return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+    def _deserialize(self, value, attr, data, **kwargs):
+        if not isinstance(value, str):
+            raise self.make_error('invalid')
+        try:
+            raw = base64.urlsafe_b64decode(value + '=' * (-len(value) % 4))
+            key_values = json.loads(raw.decode('utf-8'))
+        except (binascii.Error, UnicodeDecodeError, ValueError):
+            raise self.make_error('invalid')
+        # Key values are plain scalars, nested lists or objects would reach the database as expressions
+        if not isinstance(key_values, list) or not key_values or \
+                any(isinstance(value, bool) or not isinstance(value, (int, float, str)) for value in key_values):
+            raise self.make_error('invalid')
+        return key_values
+
+
+class FieldSelection(fields.Field):
+    """
+    Marshmallow custom field: Field Selection
+    Used for sparse fieldsets, a comma separated list of the fields of a schema the client wants in the response
+    (e.g ?fields=id,title), deserialized to a sorted tuple of names so equal selections share their schemas. The id is
+    always part of the selection.
+    """
+    default_error_messages = {'invalid': 'Not a valid field selection.', 'unknown': 'Unknown fields: {names}.'}
+
+    def __init__(self, schema_class, **kwargs):
+        super().__init__(**kwargs)
+        self.field_names = {name for name, field in schema_class._declared_fields.items() if not field.load_only}
+
+    def _deserialize(self, value, attr, data, **kwargs):
+        if not isinstance(value, str):
+            raise self.make_error('invalid')
+        names = {name.strip() for name in value.split(',') if name.strip()}
+        if not names:
+            raise self.make_error('invalid')
+        unknown = names - self.field_names
+        if unknown:
+            raise self.make_error('unknown', names=', '.join(sorted(unknown)))
+        return tuple(sorted(names | {'id'}))
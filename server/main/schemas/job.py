@@ -0,0 +1,12 @@
+from marshmallow import Schema, fields
+
+
+class JobSchema(Schema):
+    id = fields.Integer(dump_only=True)
+    type = fields.String(dump_only=True)
+    status = fields.String(dump_only=True)
+    progress = fields.Integer(dump_only=True)
+    total = fields.Integer(dump_only=True)
+    error = fields.String(dump_only=True)
+    created = fields.DateTime(dump_only=True)
+    updated = fields.DateTime(dump_only=True)
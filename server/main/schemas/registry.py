@@ -0,0 +1,88 @@
+import threading
+import time
+
+from main.schemas.response import create_pagination_response_schema
+from main.utils.schema_compiler import compile_schema
+
+
+def _freeze(value):
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return frozenset(value)
+    return value
+
+
+def _schema_key(schema):
+    # Instances built with the same class and options dump the same way
+    options = (schema.many, schema.only, schema.exclude, schema.load_only, schema.dump_only, schema.partial)
+    return (type(schema),) + tuple(_freeze(option) for option in options)
+
+
+class SchemaRegistry:
+    """
+    Schema Registry
+    - Response schemas are built once and shared by every request: building one costs marshmallow's field binding,
+      plus a new Schema subclass through the metaclass for the envelopes, far more than dumping a small payload
+    - Schemas are keyed by their class (the data schema for envelopes) and the options they are built with
+    - Dump functions compiled from the shared schemas are shared the same way
+    - Usage: schema_registry.get(AuthResponseSchema), schema_registry.get_pagination_response(items_schema) at import
+      of the controllers; init_app(app) logs how long building them took
+    """
+
+    def __init__(self):
+        self.build_seconds = 0.0
+        self._schemas = {}
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        """
+        Log the construction time of the schemas registered by the controllers (INFO, shown at the default LOG_LEVEL)
+        :param app: Flask app
+        """
+        app.logger.info('Built %d response schemas in %.1fms', len(self._schemas), self.build_seconds * 1000)
+
+    def _get_or_build(self, key, build):
+        schema = self._schemas.get(key)
+        if schema is None:
+            with self._lock:
+                schema = self._schemas.get(key)
+                if schema is None:
+                    start = time.perf_counter()
+                    schema = self._schemas[key] = build()
+                    self.build_seconds += time.perf_counter() - start
+        return schema
+
+    def get(self, schema_class, **options):
+        """
+        :param schema_class: marshmallow Schema subclass
+        :param options: arguments of the schema, e.g many, only, exclude
+        :return: the shared instance of schema_class built with these options
+        """
+        key = (schema_class,) + tuple((name, _freeze(value)) for name, value in sorted(options.items()))
+        return self._get_or_build(key, lambda: schema_class(**options))
+
+    def get_pagination_response(self, data_schema):
+        """
+        :param data_schema: schema instance of the items of the page
+        :return: the shared pagination response schema of data_schema
+        """
+        return self._get_or_build(('pagination',) + _schema_key(data_schema),
+                                  lambda: create_pagination_response_schema(data_schema=data_schema))
+
+    def get_dump(self, schema):
+        """
+        :param schema: schema instance, kept alive by the registry
+        :return: the shared dump function compiled from schema, see compile_schema
+        """
+        return self._get_or_build(('dump', schema), lambda: compile_schema(schema))
+
+    def stats(self):
+        """
+        :return: dict of the number of schemas built and the time it took
+        """
+        return {
+            'schemas': len(self._schemas),
+            'build_ms': self.build_seconds * 1000,
+        }
+
+
+schema_registry = SchemaRegistry()
@@ -1,10 +1,97 @@
-from marshmallow import Schema, fields, validate
+from marshmallow import Schema, fields, validate, validates_schema, ValidationError
+
+from main.schemas.category import CategorySchema
+from main.schemas.custom_fields import Cursor, TrimmedString, FieldSelection
+from main.schemas.item import ItemSchema
+from main.utils.pagination import TOTAL_MODES
+
+# Upper bound of the page size clients can ask for, applied to both offset and cursor pagination
+MAX_PAGE_SIZE = 100
+# Upper bound of the number of entities of a bulk request
+MAX_BULK_SIZE = 5000
 
 
 class BasePaginationQuerySchema(Schema):
     page = fields.Integer(missing=1, validate=validate.Range(min=1))
-    per_page = fields.Integer(missing=5, validate=validate.Range(min=1))
+    per_page = fields.Integer(missing=5, validate=validate.Range(min=1, max=MAX_PAGE_SIZE))
+    # Cursor pagination: sending `after` and/or `limit` switches the endpoint from page/per_page to keyset pagination
+    after = Cursor(missing=None)
+    limit = fields.Integer(missing=None, validate=validate.Range(min=1, max=MAX_PAGE_SIZE))
+    # How total_items is computed, None lets the app config (PAGINATION_TOTAL_MODE) decide
+    total = fields.String(missing=None, validate=validate.OneOf(TOTAL_MODES))
+
+
+class CategoryQuerySchema(Schema):
+    # Sparse fieldset, None dumps every field
+    fields = FieldSelection(CategorySchema, missing=None)
+
+
+class CategoryPaginationQuerySchema(BasePaginationQuerySchema, CategoryQuerySchema):
+    pass
+
 
+class ItemQuerySchema(Schema):
+    # Sparse fieldset, None dumps every field
+    fields = FieldSelection(ItemSchema, missing=None)
 
-class ItemPaginationQuerySchema(BasePaginationQuerySchema):
+
+class ItemPaginationQuerySchema(BasePaginationQuerySchema, ItemQuerySchema):
     category_id = fields.Integer(missing=None, validate=validate.Range(min=1))
+
+
+class ItemSearchQuerySchema(Schema):
+    q = fields.String(required=True, validate=validate.Length(min=1, max=200))
+    # Results are ranked, so they're only paginated by cursor
+    after = Cursor(missing=None)
+    limit = fields.Integer(missing=None, validate=validate.Range(min=1, max=MAX_PAGE_SIZE))
+
+
+class AutocompleteQuerySchema(Schema):
+    prefix = fields.String(required=True, validate=validate.Length(min=1, max=100))
+    type = fields.String(missing='item', validate=validate.OneOf(('item', 'category')))
+    limit = fields.Integer(missing=10, validate=validate.Range(min=1, max=MAX_PAGE_SIZE))
+
+
+class ItemExportQuerySchema(Schema):
+    format = fields.String(missing='ndjson', validate=validate.OneOf(('ndjson', 'csv')))
+    category_id = fields.Integer(missing=None, validate=validate.Range(min=1))
+
+
+class ItemImportQuerySchema(Schema):
+    format = fields.String(missing='ndjson', validate=validate.OneOf(('ndjson', 'csv')))
+    # Rows validated and committed together, IMPORT_CHUNK_SIZE when not given
+    chunk_size = fields.Integer(missing=None, validate=validate.Range(min=1, max=MAX_BULK_SIZE))
+
+
+class ItemBulkCreateSchema(Schema):
+    # Items are validated one by one by the endpoint so every item gets its own status
+    items = fields.List(fields.Dict(), required=True, validate=validate.Length(min=1, max=MAX_BULK_SIZE))
+    # atomic: nothing is created if an item can't be created, otherwise the valid items are created
+    atomic = fields.Boolean(missing=True)
+
+
+class ItemBulkSelectionSchema(Schema):
+    # Items are selected either by ids or by category, only the items of the current user are affected
+    ids = fields.List(fields.Integer(validate=validate.Range(min=1)),
+                      validate=validate.Length(min=1, max=MAX_BULK_SIZE))
+    category_id = fields.Integer(validate=validate.Range(min=1))
+
+    @validates_schema
+    def validate_selection(self, data, **kwargs):
+        if ('ids' in data) == ('category_id' in data):
+            raise ValidationError('Select the items by either ids or category_id.')
+
+
+class ItemBulkChangesSchema(Schema):
+    # Titles are unique, so they can't be bulk updated
+    description = TrimmedString(validate=validate.Length(min=4, max=1000))
+    category_id = fields.Integer(validate=validate.Range(min=1))
+
+    @validates_schema
+    def validate_not_empty(self, data, **kwargs):
+        if not data:
+            raise ValidationError('Send at least one of description, category_id.')
+
+
+class ItemBulkUpdateSchema(ItemBulkSelectionSchema):
+    changes = fields.Nested(ItemBulkChangesSchema, required=True)
@@ -1,5 +1,6 @@
 from marshmallow import Schema, fields
 
+from main.schemas.custom_fields import Cursor
 from main.schemas.user import UserSchema
 
 
@@ -7,8 +8,10 @@ def create_pagination_response_schema(data_schema, instance=True):
     class PaginationResponseSchema(Schema):
         data = fields.List(fields.Nested(data_schema), required=True, attribute='items')
         per_page = fields.Integer(required=True)
+        # page/total_items are only dumped for offset pagination, next_cursor only for cursor pagination
         page = fields.Integer(required=True)
         total_items = fields.Integer(required=True, attribute='total')
+        next_cursor = Cursor()
 
     if instance:
         return PaginationResponseSchema()
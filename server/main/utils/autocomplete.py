@@ -0,0 +1,172 @@
+import bisect
+import threading
+import time
+
+
+class PrefixIndex:
+    """
+    Sorted array of (lowercased title, id) answering prefix queries with a binary search
+    - A query costs O(log n + k), no database access
+    - Titles are kept by id too, so an entry can be replaced or removed knowing only its id
+    """
+
+    def __init__(self, rows=()):
+        """
+        :param rows: iterable of (id, title)
+        """
+        self._titles = dict(rows)
+        self._keys = sorted((title.lower(), _id) for _id, title in self._titles.items())
+
+    def __len__(self):
+        return len(self._keys)
+
+    def add(self, _id, title):
+        """
+        Add an entry, or replace the title of an existing one
+        :param _id: id of the entity
+        :param title: its title
+        """
+        self.remove(_id)
+        self._titles[_id] = title
+        bisect.insort(self._keys, (title.lower(), _id))
+
+    def remove(self, _id):
+        """
+        :param _id: id of the entity, unknown ids are ignored
+        """
+        title = self._titles.pop(_id, None)
+        if title is not None:
+            key = (title.lower(), _id)
+            index = bisect.bisect_left(self._keys, key)
+            if index < len(self._keys) and self._keys[index] == key:
+                del self._keys[index]
+
+    def complete(self, prefix, limit):
+        """
+        :param prefix: beginning of the title, case insensitive
+        :param limit: maximum number of completions
+        :return: list of {id, title} whose title starts with the prefix, in alphabetical order
+        """
+        prefix = prefix.lower()
+        completions = []
+        index = bisect.bisect_left(self._keys, (prefix,))
+        while index < len(self._keys) and len(completions) < limit:
+            title, _id = self._keys[index]
+            if not title.startswith(prefix):
+                break
+            completions.append({'id': _id, 'title': self._titles[_id]})
+            index += 1
+        return completions
+
+
+class AutocompleteIndexes:
+    """
+    Autocomplete Indexes
+    - One in-memory PrefixIndex per entity type, loaded from the database on first use
+    - The write paths update it incrementally once their transaction is committed, it is reloaded every
+      AUTOCOMPLETE_REFRESH_TTL seconds to catch up with the writes of other workers
+    - A reload is built out of the lock by one request while the others keep completing on the current index, the
+      writes made meanwhile are replayed on the new index before it is swapped in. Only the first load is waited for.
+    - Usage: autocomplete.register('item', loader); autocomplete.init_app(app)
+    """
+
+    def __init__(self):
+        self.loaders = {}
+        self.refresh_ttl = None
+        self._indexes = {}  # type -> (PrefixIndex, expiry)
+        self._lock = threading.Lock()
+        self._loading_locks = {}  # type -> Lock held by the request loading the index
+        self._missed_writes = {}  # type -> [(method, args)] made on the current index while the next one loads
+
+    def register(self, index_type, loader):
+        """
+        :param index_type: name of the index, e.g 'item'
+        :param loader: function returning an iterable of (id, title) of every entity, called in an app context
+        """
+        self.loaders[index_type] = loader
+        self._loading_locks[index_type] = threading.Lock()
+
+    def init_app(self, app):
+        """
+        Read the config and start with empty indexes
+        :param app: Flask app
+        """
+        self.refresh_ttl = app.config.get('AUTOCOMPLETE_REFRESH_TTL')
+        self.invalidate()
+
+    def _load(self, index_type):
+        loading = self._loading_locks[index_type]
+        if not loading.acquire(blocking=index_type not in self._indexes):
+            return
+        try:
+            entry = self._indexes.get(index_type)
+            if entry is not None and entry[1] > time.monotonic():  # Loaded by the request we waited for
+                return
+
+            with self._lock:
+                self._missed_writes[index_type] = []
+            expiry = time.monotonic() + self.refresh_ttl if self.refresh_ttl else float('inf')
+            index = PrefixIndex(self.loaders[index_type]())
+            with self._lock:
+                missed_writes = self._missed_writes.pop(index_type, None)
+                if missed_writes is not None:  # Not invalidated while loading
+                    for method, args in missed_writes:
+                        getattr(index, method)(*args)
+                    self._indexes[index_type] = (index, expiry)
+        finally:
+            with self._lock:
+                self._missed_writes.pop(index_type, None)
+            loading.release()
+
+    def complete(self, index_type, prefix, limit):
+        """
+        :param index_type: name of the index
+        :param prefix: beginning of the title, case insensitive
+        :param limit: maximum number of completions
+        :return: list of {id, title}
+        """
+        entry = self._indexes.get(index_type)
+        while entry is None or entry[1] <= time.monotonic():
+            self._load(index_type)
+            entry = self._indexes.get(index_type)
+            if entry is not None:  # Reloaded, or being reloaded by another request
+                break
+        with self._lock:
+            return entry[0].complete(prefix, limit)
+
+    def _write(self, index_type, method, *args):
+        with self._lock:
+            entry = self._indexes.get(index_type)
+            if entry is not None:  # Not loaded yet: the loader will read it
+                getattr(entry[0], method)(*args)
+            if index_type in self._missed_writes:
+                self._missed_writes[index_type].append((method, args))
+
+    def add(self, index_type, _id, title):
+        """
+        Add or rename an entity, call it once the write is committed
+        """
+        self._write(index_type, 'add', _id, title)
+
+    def remove(self, index_type, *ids):
+        """
+        Remove entities, call it once the delete is committed
+        """
+        for _id in ids:
+            self._write(index_type, 'remove', _id)
+
+    def invalidate(self, index_type=None):
+        """
+        Drop an index (or all of them) when the changed entities are unknown, it is loaded again on next use
+        :param index_type: name of the index, None for all
+        """
+        with self._lock:
+            if index_type is None:
+                self._indexes.clear()
+                self._missed_writes.clear()
+            else:
+                self._indexes.pop(index_type, None)
+                self._missed_writes.pop(index_type, None)
+
+
+autocomplete = AutocompleteIndexes()
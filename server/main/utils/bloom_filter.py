@@ -0,0 +1,45 @@
+import hashlib
+import math
+
+
+class BloomFilter:
+    """
+    Bloom Filter
+    - Set membership in a fixed bit array: `key in bloom` is False for sure or True with a false positive rate of
+      error_rate as long as at most capacity keys were added
+    - Keys can't be removed, build a new filter to drop some
+    """
+
+    def __init__(self, capacity, error_rate=0.001):
+        """
+        :param capacity: number of keys the filter is sized for
+        :param error_rate: false positive rate at capacity
+        """
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))  # bits
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key):
+        # Double hashing: the k positions are derived from the 2 halves of one digest
+        digest = hashlib.sha256(key.encode('utf-8')).digest()
+        first, second = int.from_bytes(digest[:8], 'big'), int.from_bytes(digest[8:16], 'big') | 1
+        return ((first + i * second) % self.size for i in range(self.hash_count))
+
+    def add(self, key):
+        """
+        :param key: string
+        :return: False if the key was (or looked) already in the filter, count only grows with new keys
+        """
+        added = False
+        for position in self._positions(key):
+            mask = 1 << (position & 7)
+            if not self._bits[position >> 3] & mask:
+                self._bits[position >> 3] |= mask
+                added = True
+        if added:
+            self.count += 1
+        return added
+
+    def __contains__(self, key):
+        return all(self._bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
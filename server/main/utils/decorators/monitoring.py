@@ -0,0 +1,24 @@
+import hmac
+
+from flask import current_app, request
+
+from main.errors import Forbidden, NotFound
+
+
+def require_monitoring_access():
+    """
+    before_request hook of the monitoring endpoints (GET /metrics, GET /stats/*), they describe the traffic and the
+    internals of the server
+    - Open to anyone with MONITORING_OPEN (development, tests)
+    - Otherwise only to requests with the header `Authorization: Bearer <MONITORING_TOKEN>`, and hidden when no token
+      is configured
+    :raise Forbidden 403: if the token is missing or wrong
+    :raise NotFound 404: if monitoring is disabled
+    """
+    if current_app.config.get('MONITORING_OPEN'):
+        return
+    token = current_app.config.get('MONITORING_TOKEN')
+    if not token:
+        raise NotFound(error_message='The requested URL was not found on the server.')
+    if not hmac.compare_digest(request.headers.get('Authorization', ''), 'Bearer ' + token):
+        raise Forbidden(error_message='A valid monitoring token is required.')
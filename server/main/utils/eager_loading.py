@@ -0,0 +1,64 @@
+from marshmallow import fields
+from sqlalchemy import inspect
+from sqlalchemy.orm import joinedload, selectinload, load_only
+
+
+def _get_nested_schema(field):
+    """
+    :param field: a marshmallow field
+    :return: the schema of a Nested field or of a List of Nested, None for other fields
+    """
+    if isinstance(field, fields.List):
+        field = field.inner
+    if isinstance(field, fields.Nested):
+        return field.schema
+    return None
+
+
+def eager_load_options(model, schema, strategy=None):
+    """
+    Build the loader options eagerly loading the relationships a schema will serialize, so dumping a list of rows
+    doesn't lazy-load the relationship of every row (N+1 queries).
+    - Only the columns dumped by the nested schema are loaded
+    - Default strategy: joined loading for many-to-one (one LEFT JOIN in the same query), select-in loading for
+      collections (one extra query per page instead of one per row)
+    - Usage: ItemModel.query.options(*eager_load_options(ItemModel, items_schema))
+    :param model: model class being queried
+    :param schema: schema instance the rows will be dumped with
+    :param strategy: joinedload or selectinload to force a strategy for every relationship
+    :return: list of loader options
+    """
+    relationships = inspect(model).relationships
+    options = []
+
+    for field_name, field in schema.dump_fields.items():
+        attribute = field.attribute or field_name
+        nested_schema = _get_nested_schema(field)
+        if nested_schema is None or attribute not in relationships:
+            continue
+
+        relationship = relationships[attribute]
+        if relationship.lazy == 'dynamic':  # Dynamic relationships are queries, they can't be eager loaded
+            continue
+
+        loader = strategy or (selectinload if relationship.uselist else joinedload)
+        column_names = [nested_field.attribute or name for name, nested_field in nested_schema.dump_fields.items()
+                        if (nested_field.attribute or name) in relationship.mapper.column_attrs]
+        options.append(loader(getattr(model, attribute)).load_only(*column_names))
+
+    return options
+
+
+def column_load_options(model, schema):
+    """
+    Build the loader options loading only the columns a schema will serialize (plus the primary key), with the
+    relationships it serializes eagerly loaded, e.g for sparse fieldsets
+    - Usage: ItemModel.query.options(*column_load_options(ItemModel, schema))
+    :param model: model class being queried
+    :param schema: schema instance the rows will be dumped with
+    :return: list of loader options
+    """
+    column_attrs = inspect(model).column_attrs
+    column_names = [field.attribute or name for name, field in schema.dump_fields.items()
+                    if (field.attribute or name) in column_attrs]
+    return [load_only(*column_names)] + eager_load_options(model, schema)
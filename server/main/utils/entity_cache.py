@@ -0,0 +1,286 @@
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session, make_transient_to_detached
+
+from main.db import db
+
+# Key of session.info where invalidations are kept until the transaction is committed
+_PENDING_KEY = 'entity_cache_pending'
+
+
+class LRUCacheBackend:
+    """
+    In-process backend: a LRU dict bounded by size, every entry expires after ttl seconds
+    - Each worker process has its own cache, so a write done by another worker is seen after at most ttl seconds
+    """
+
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._generations = {}  # Kept apart so they're never evicted
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[1] <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def get_generation(self, namespace):
+        return self._generations.get(namespace, 0)
+
+    def incr_generation(self, namespace):
+        with self._lock:
+            self._generations[namespace] = self._generations.get(namespace, 0) + 1
+
+    def size(self):
+        return len(self._entries)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._generations.clear()
+
+
+class LocalStore:
+    """
+    In-process stand-in of a shared key-value store, implementing the subset of the Redis client API used by
+    SharedStoreCacheBackend. Used for local development and tests.
+    """
+
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            if entry[1] is not None and entry[1] <= time.monotonic():
+                del self._data[key]
+                return None
+            return entry[0]
+
+    def set(self, key, value, ex=None):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + ex if ex else None)
+
+    def delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+
+    def incr(self, key):
+        with self._lock:
+            value = int(self._data.get(key, (0, None))[0]) + 1
+            self._data[key] = (str(value).encode(), None)
+            return value
+
+    def dbsize(self):
+        return len(self._data)
+
+    def flushdb(self):
+        with self._lock:
+            self._data.clear()
+
+
+class SharedStoreCacheBackend:
+    """
+    Shared backend: entries are pickled into a key-value store shared by every worker (Redis or LocalStore)
+    - Size is bounded by the store's own eviction policy (e.g Redis maxmemory-policy), entries expire after ttl seconds
+    """
+
+    def __init__(self, client, ttl, prefix='entity_cache:'):
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def get(self, key):
+        raw = self.client.get(self.prefix + key)
+        return None if raw is None else pickle.loads(raw)
+
+    def set(self, key, value):
+        self.client.set(self.prefix + key, pickle.dumps(value), ex=self.ttl)
+
+    def delete(self, key):
+        self.client.delete(self.prefix + key)
+
+    def get_generation(self, namespace):
+        raw = self.client.get(self.prefix + 'generation:' + namespace)
+        return 0 if raw is None else int(raw)
+
+    def incr_generation(self, namespace):
+        self.client.incr(self.prefix + 'generation:' + namespace)
+
+    def size(self):
+        return self.client.dbsize()
+
+    def clear(self):
+        # Only flush our own stand-in, a real shared store may hold other data
+        if isinstance(self.client, LocalStore):
+            self.client.flushdb()
+
+
+def create_store_client(url):
+    """
+    :param url: 'local://' for the in-process stand-in, a redis:// url otherwise
+    :return: a client of the shared store
+    """
+    if url is None or url.startswith('local://'):
+        return LocalStore()
+    try:
+        import redis
+    except ImportError:
+        raise RuntimeError('The shared entity cache needs the redis package: pip install redis')
+    return redis.Redis.from_url(url)
+
+
+class EntityCache:
+    """
+    Entity Cache
+    - Read-through cache of model rows by primary key used by BaseModel.find_by_id
+    - Rows are cached as dict of column values, on a hit the instance is rebuilt and attached to the session without
+      querying the database
+    - Invalidations are deferred until the transaction is committed, so a concurrent reader can't put back the old row
+      between our invalidation and our commit
+    - Usage: entity_cache.init_app(app); config ENTITY_CACHE_BACKEND = 'memory', 'shared' or None to disable
+    """
+
+    def __init__(self):
+        self.backend = None
+        self.hits = 0
+        self.misses = 0
+
+    def init_app(self, app):
+        """
+        Build the backend from the app config and start with an empty cache and counters
+        :param app: Flask app
+        """
+        backend = app.config.get('ENTITY_CACHE_BACKEND')
+        ttl = app.config.get('ENTITY_CACHE_TTL', 30)
+        if backend == 'memory':
+            self.backend = LRUCacheBackend(max_size=app.config.get('ENTITY_CACHE_MAX_SIZE', 10000), ttl=ttl)
+        elif backend == 'shared':
+            client = create_store_client(app.config.get('ENTITY_CACHE_STORE_URL'))
+            self.backend = SharedStoreCacheBackend(client, ttl=ttl)
+        elif backend is None:
+            self.backend = None
+        else:
+            raise ValueError('Unknown entity cache backend: {}'.format(backend))
+
+        if self.backend is not None:
+            self.backend.clear()
+        self.hits = self.misses = 0
+
+    def _make_key(self, model_cls, _id):
+        namespace = model_cls.__tablename__
+        return '{}:{}:{}'.format(namespace, self.backend.get_generation(namespace), _id)
+
+    def get(self, model_cls, _id):
+        """
+        :param model_cls: model class
+        :param _id: primary key
+        :return: instance attached to the current session, None on a miss
+        """
+        if self.backend is None:
+            return None
+
+        values = self.backend.get(self._make_key(model_cls, _id))
+        if values is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+
+        instance = inspect(model_cls).class_manager.new_instance()  # Skip __init__, e.g UserModel's hashing
+        for name, value in values.items():
+            setattr(instance, name, value)
+        make_transient_to_detached(instance)  # As if it had been loaded by a query
+        db.session.add(instance)
+        return instance
+
+    def set(self, instance):
+        """
+        Cache the committed state of a persistent instance
+        :param instance: the instance loaded from the database
+        """
+        if self.backend is None:
+            return
+
+        state = inspect(instance)
+        if state.modified or not state.persistent:  # Never cache uncommitted changes
+            return
+        values = {attr.key: getattr(instance, attr.key) for attr in state.mapper.column_attrs}
+        self.backend.set(self._make_key(type(instance), state.identity[0]), values)
+
+    def invalidate_on_commit(self, model_cls, _id=None):
+        """
+        Drop an entry (or every entry of a model) once the current transaction is committed
+        :param model_cls: model class
+        :param _id: primary key, None to drop every entry of the model (e.g after a bulk UPDATE/DELETE)
+        """
+        if self.backend is not None:
+            db.session.info.setdefault(_PENDING_KEY, set()).add((model_cls, _id))
+
+    def invalidate(self, model_cls, _id=None):
+        """
+        Drop an entry (or every entry of a model) at once
+        :param model_cls: model class
+        :param _id: primary key, None to drop every entry of the model
+        """
+        if self.backend is None:
+            return
+        if _id is None:
+            # Entries of older generations can't be reached anymore and will expire
+            self.backend.incr_generation(model_cls.__tablename__)
+        else:
+            self.backend.delete(self._make_key(model_cls, _id))
+
+    def stats(self):
+        """
+        :return: dict of the counters used to size the cache
+        """
+        lookups = self.hits + self.misses
+        return {
+            'backend': None if self.backend is None else type(self.backend).__name__,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': self.hits / lookups if lookups else None,
+            'size': None if self.backend is None else self.backend.size(),
+        }
+
+
+entity_cache = EntityCache()
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_committed(session):
+    for model_cls, _id in session.info.pop(_PENDING_KEY, ()):
+        entity_cache.invalidate(model_cls, _id)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_rolled_back(session):
+    # Nothing was written, the cached rows are still valid
+    session.info.pop(_PENDING_KEY, None)
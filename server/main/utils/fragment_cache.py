@@ -0,0 +1,139 @@
+import threading
+from collections import OrderedDict
+
+from flask import current_app, json, jsonify
+
+
+class RawJSON(str):
+    """
+    JSON text already encoded, written as is by make_fragment_response
+    """
+
+
+def _encode(value):
+    if isinstance(value, RawJSON):
+        return value
+    if isinstance(value, dict):
+        keys = sorted(value) if current_app.config['JSON_SORT_KEYS'] else value
+        return '{' + ','.join(_encode(str(key)) + ':' + _encode(value[key]) for key in keys) + '}'
+    if isinstance(value, (list, tuple)):
+        return '[' + ','.join(_encode(each) for each in value) + ']'
+    return json.dumps(value, separators=(',', ':'))
+
+
+def make_fragment_response(data):
+    """
+    Build the JSON response of data holding RawJSON fragments, with the same bytes jsonify(data) would produce
+    :param data: dict/list whose values may be RawJSON
+    :return: Flask response
+    """
+    if current_app.config['JSONIFY_PRETTYPRINT_REGULAR'] or current_app.debug:
+        # Fragments are compact, decode them to let jsonify indent everything
+        def decode(value):
+            if isinstance(value, RawJSON):
+                return json.loads(value)
+            if isinstance(value, dict):
+                return {key: decode(each) for key, each in value.items()}
+            if isinstance(value, (list, tuple)):
+                return [decode(each) for each in value]
+            return value
+
+        return jsonify(decode(data))
+
+    return current_app.response_class(_encode(data) + '\n', mimetype=current_app.config['JSONIFY_MIMETYPE'])
+
+
+class FragmentCache:
+    """
+    Fragment Cache
+    - LRU cache of the JSON encoding of entities, keyed by a version of the entity: its id and the updated timestamps
+      of everything in its representation (e.g the nested category), so a changed entity gets a new key and is never
+      served stale, old versions are simply evicted
+    - List responses splice the cached fragments, only the new or changed rows are loaded and serialized
+    - Usage: fragment_cache.init_app(app); config FRAGMENT_CACHE_MAX_SIZE (entries), 0 to disable
+    """
+
+    def __init__(self):
+        self.max_size = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        """
+        Read the config and start with an empty cache
+        :param app: Flask app
+        """
+        self.max_size = app.config.get('FRAGMENT_CACHE_MAX_SIZE', 10000)
+        with self._lock:
+            self._entries.clear()
+        self.hits = self.misses = 0
+
+    def _get(self, key):
+        with self._lock:
+            fragment = self._entries.get(key)
+            if fragment is not None:
+                self._entries.move_to_end(key)
+        if fragment is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return fragment
+
+    def _set(self, key, fragment):
+        if not self.max_size:
+            return
+        with self._lock:
+            self._entries[key] = fragment
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def get_fragment(self, version, dump):
+        """
+        :param version: hashable key of the version of the entity, e.g ('item', id, updated, category updated)
+        :param dump: function() serializing the entity, only called on a miss
+        :return: RawJSON of the entity
+        """
+        fragment = self._get(version)
+        if fragment is None:
+            fragment = RawJSON(_encode(dump()))
+            self._set(version, fragment)
+        return fragment
+
+    def get_fragments(self, rows, version, load, dump):
+        """
+        :param rows: lightweight rows of a page having an id, and what version needs
+        :param version: function(row) -> hashable key of the version of the row's entity
+        :param load: function(ids) -> iterable of the full entities of these ids, called once for all the misses
+        :param dump: function(entity) -> serialized entity
+        :return: list of RawJSON in the order of rows, rows deleted since they were read are left out
+        """
+        versions = [version(row) for row in rows]
+        fragments = [self._get(key) for key in versions]
+
+        missing_ids = [row.id for row, fragment in zip(rows, fragments) if fragment is None]
+        if missing_ids:
+            entities = {entity.id: entity for entity in load(missing_ids)}
+            for index, row in enumerate(rows):
+                if fragments[index] is None and row.id in entities:
+                    fragments[index] = RawJSON(_encode(dump(entities[row.id])))
+                    self._set(versions[index], fragments[index])
+
+        return [fragment for fragment in fragments if fragment is not None]
+
+    def stats(self):
+        """
+        :return: dict of the counters used to size the cache
+        """
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': self.hits / lookups if lookups else None,
+            'size': len(self._entries),
+        }
+
+
+fragment_cache = FragmentCache()
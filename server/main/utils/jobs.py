@@ -0,0 +1,141 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import has_app_context
+
+from main.db import db
+from main.models.job import JobModel
+
+
+class JobRunner:
+    """
+    Job Runner
+    - Runs long tasks (e.g cascade deletes) out of the request: the request persists a JobModel row and answers at
+      once, a pool of JOB_WORKERS threads runs the handler of the job type and records its status and progress
+    - Handlers commit their work in bounded chunks so they never hold locks for long, and must be safe to run again
+      on a job they half did
+    - A job is run under a lease of JOB_LEASE_SECONDS, renewed by job.add_progress. Every worker sweeps the jobs table
+      at start and every lease: jobs left pending or running by a dead worker are claimed and run again, at most
+      JOB_MAX_ATTEMPTS times before being marked failed
+    - Usage: @job_runner.handler('job_type') def run(job): ...; job_runner.submit('job_type', params, creator_id)
+    - JOB_WORKERS = 0 runs the job in the request before answering (e.g tests), and doesn't sweep
+    """
+
+    def __init__(self):
+        self.handlers = {}
+        self.app = None
+        self.workers = 0
+        self.lease = 60
+        self.max_attempts = 3
+        self._executor = None
+        self._stop_sweeping = threading.Event()
+
+    def init_app(self, app):
+        """
+        Read the config, start the pool and the sweeper
+        :param app: Flask app, jobs run in its app context
+        """
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+        self._stop_sweeping.set()
+        self.app = app
+        self.workers = app.config.get('JOB_WORKERS', 2)
+        self.lease = app.config.get('JOB_LEASE_SECONDS', 60)
+        self.max_attempts = app.config.get('JOB_MAX_ATTEMPTS', 3)
+        self._executor = None
+        if self.workers:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='job')
+            self._stop_sweeping = threading.Event()
+            threading.Thread(target=self._sweep, args=(self._stop_sweeping,), name='job-sweeper', daemon=True).start()
+
+    def handler(self, job_type):
+        """
+        Decorator registering the handler of a job type
+        :param job_type: name of the job type
+        :return: decorator of function(job) doing the work, reading its parameters in job.params
+        """
+        def register(func):
+            self.handlers[job_type] = func
+            return func
+
+        return register
+
+    def submit(self, job_type, params, creator_id, key=None):
+        """
+        Persist a job and schedule it
+        :param job_type: name of a registered job type
+        :param params: JSON serializable parameters of the job
+        :param creator_id: id of the user asking for the job
+        :param key: identifies what the job works on, e.g 'delete_category:1'. While a job of the same key is pending
+        or running it is returned instead of a new one, the caller should lock the row the key is about
+        :raise Exception: many exception can be raised, seek help(sqlalchemy.exc)
+        :return: the job
+        """
+        if key is not None:
+            job = JobModel.find_active(key)
+            if job is not None:
+                db.session.commit()  # Release the locks of the caller
+                return job
+
+        job = JobModel(type=job_type, params=params, creator_id=creator_id, key=key).save()
+        if self._executor is None:
+            self._run(job.id)
+        else:
+            self._executor.submit(self._run, job.id)
+        return job
+
+    def recover(self):
+        """
+        Claim and run again the jobs left behind by dead workers, in the pool or right away without one
+        :return: number of jobs scheduled
+        """
+        job_ids = JobModel.claimable_ids()
+        db.session.commit()
+        for job_id in job_ids:
+            if self._executor is None:
+                self._run(job_id)
+            else:
+                self._executor.submit(self._run, job_id)
+        return len(job_ids)
+
+    def _sweep(self, stop):
+        # The first sweep waits a lease too: the jobs of dead workers aren't claimable before, and the app is set up
+        # (e.g db.init_app after create_app) by then
+        while not stop.wait(self.lease):
+            try:
+                with self.app.app_context():
+                    recovered = self.recover()
+                if recovered:
+                    logging.warning('Recovered %d jobs left behind by other workers', recovered)
+            except Exception:
+                logging.exception('Sweeping the jobs failed')
+
+    def _run(self, job_id):
+        if not has_app_context():
+            with self.app.app_context():
+                return self._run(job_id)
+
+        # Another worker may have taken the job since it was scheduled
+        if not JobModel.claim(job_id):
+            return
+        job = JobModel.query.get(job_id)
+        if job.attempts > self.max_attempts:
+            job.status = JobModel.FAILED
+            job.error = 'Abandoned after {} attempts, the workers running it stopped.'.format(self.max_attempts)
+            job.save()
+            return
+
+        try:
+            self.handlers[job.type](job)
+            job.status = JobModel.SUCCEEDED
+            job.save()
+        except Exception as error:
+            db.session.rollback()
+            logging.exception('Job %s (%s) failed', job_id, job.type)
+            job.status = JobModel.FAILED
+            job.error = str(error)[:1000]
+            job.save()
+
+
+job_runner = JobRunner()
@@ -0,0 +1,233 @@
+import fcntl
+import glob
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+
+from main.errors import ErrorCodeEnum
+
+# Upper bounds (seconds) of the latency histogram buckets, the last bucket (+Inf) is implied
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(**labels):
+    return '{' + ','.join('{}="{}"'.format(name, _escape(value)) for name, value in labels.items()) + '}'
+
+
+def _error_name(error_code):
+    try:
+        return ErrorCodeEnum(error_code).name
+    except ValueError:
+        return 'UNKNOWN'
+
+
+def _is_running(pid):
+    try:
+        os.kill(int(pid), 0)
+    except (ValueError, ProcessLookupError):
+        return False
+    except PermissionError:  # Running as another user
+        return True
+    return True
+
+
+def _read_json(path):
+    try:
+        with open(path) as file:
+            return json.load(file)
+    except (OSError, ValueError):  # Missing, or its writer stopped while writing: its next flush replaces it
+        return None
+
+
+def _write_json(path, data):
+    # Atomic for the readers
+    with open(path + '.tmp', 'w') as file:
+        json.dump(data, file)
+    os.replace(path + '.tmp', path)
+
+
+def _sum(snapshots):
+    """
+    :param snapshots: counters of workers, see RequestMetrics._snapshot
+    :return: (requests, latencies, errors) dicts of the summed counters
+    """
+    requests, latencies, errors = {}, {}, {}
+    for snapshot in snapshots:
+        for *key, count in snapshot['requests']:
+            requests[tuple(key)] = requests.get(tuple(key), 0) + count
+        for *key, latency in snapshot['latencies']:
+            total = latencies.get(tuple(key))
+            latencies[tuple(key)] = latency if total is None else [a + b for a, b in zip(total, latency)]
+        for error_code, count in snapshot['errors']:
+            errors[error_code] = errors.get(error_code, 0) + count
+    return requests, latencies, errors
+
+
+def _to_snapshot(requests, latencies, errors):
+    return {
+        'requests': [list(key) + [count] for key, count in requests.items()],
+        'latencies': [list(key) + [list(latency)] for key, latency in latencies.items()],
+        'errors': [[error_code, count] for error_code, count in errors.items()],
+    }
+
+
+class RequestMetrics:
+    """
+    Request Metrics
+    - Counts the requests by endpoint, method and status, their latency in a histogram by endpoint and method, and the
+      error responses by error_code (ErrorCodeEnum), exposed in the Prometheus text format
+    - Recording a request is a couple of dict updates under a lock, a few microseconds
+    - Multi-process servers: with METRICS_MULTIPROCESS_DIR set, every worker writes its counters to
+      <dir>/<pid>-<start time>.json at most every METRICS_FLUSH_INTERVAL seconds and when it is scraped, and a scrape
+      sums the files of all the workers, so any worker reports the totals. A worker reusing the pid of a stopped one
+      has a file of its own. Files of stopped workers are merged into <dir>/stopped.json by the next scrape, so the
+      totals never go down. The directory is local to the server, empty it when the server restarts
+    - Usage: metrics.init_app(app), then metrics.record(...) for every request (see main.controllers.metrics)
+    """
+
+    def __init__(self):
+        self.directory = None
+        self.flush_interval = 5
+        self._lock = threading.Lock()
+        self._flushed_at = 0
+        self._pid = self._file_name = None
+        self.reset()
+
+    def init_app(self, app):
+        """
+        Read the config and reset the counters of this worker
+        :param app: Flask app
+        """
+        self.directory = app.config.get('METRICS_MULTIPROCESS_DIR')
+        self.flush_interval = app.config.get('METRICS_FLUSH_INTERVAL', 5)
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            # (blueprint, endpoint, method, status) -> count
+            self._requests = {}
+            # (blueprint, endpoint, method) -> [count of each bucket..., count of +Inf, sum of the durations]
+            self._latencies = {}
+            # error_code -> count
+            self._errors = {}
+
+    def record(self, blueprint, endpoint, method, status, seconds, error_code=None):
+        """
+        :param blueprint: name of the blueprint of the endpoint, None for the app
+        :param endpoint: name of the view, None if no route matched
+        :param method: HTTP method
+        :param status: status code of the response
+        :param seconds: time spent handling the request
+        :param error_code: error_code of an error response
+        """
+        bucket = bisect_left(LATENCY_BUCKETS, seconds)
+        key = (blueprint, endpoint, method)
+        with self._lock:
+            request_key = key + (status,)
+            self._requests[request_key] = self._requests.get(request_key, 0) + 1
+            latency = self._latencies.get(key)
+            if latency is None:
+                latency = self._latencies[key] = [0] * (len(LATENCY_BUCKETS) + 1) + [0.0]
+            latency[bucket] += 1
+            latency[-1] += seconds
+            if error_code is not None:
+                self._errors[error_code] = self._errors.get(error_code, 0) + 1
+
+        if self.directory and time.monotonic() - self._flushed_at >= self.flush_interval:
+            self.flush()
+
+    def _snapshot(self):
+        with self._lock:
+            return _to_snapshot(self._requests, self._latencies, self._errors)
+
+    def _path(self):
+        # Named when this process first flushes, after the fork of a pre-loading server
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._file_name = '{}-{}.json'.format(self._pid, time.time_ns())
+        return os.path.join(self.directory, self._file_name)
+
+    def flush(self):
+        """
+        Write the counters of this worker to METRICS_MULTIPROCESS_DIR, atomically for the readers
+        """
+        self._flushed_at = time.monotonic()
+        _write_json(self._path(), self._snapshot())
+
+    def _merge_stopped_workers(self, paths):
+        """
+        Merge the files of the stopped workers into stopped.json, under a lock so two scrapes don't merge them twice
+        :param paths: paths of the files of the workers
+        :return: paths of the files of the running workers
+        """
+        stopped = [path for path in paths if not _is_running(os.path.basename(path).split('-', 1)[0])]
+        if not stopped:
+            return paths
+
+        stopped_path = os.path.join(self.directory, 'stopped.json')
+        with open(os.path.join(self.directory, '.lock'), 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            snapshots = [_read_json(path) for path in [stopped_path] + stopped if os.path.exists(path)]
+            _write_json(stopped_path, _to_snapshot(*_sum([snapshot for snapshot in snapshots if snapshot])))
+            for path in stopped:
+                if os.path.exists(path):
+                    os.remove(path)
+        return [path for path in paths if path not in stopped]
+
+    def _collect(self):
+        if not self.directory:
+            return [self._snapshot()]
+        self.flush()
+        paths = [path for path in glob.glob(os.path.join(self.directory, '*.json'))
+                 if os.path.basename(path) != 'stopped.json']
+        paths = self._merge_stopped_workers(paths) + [os.path.join(self.directory, 'stopped.json')]
+        return [snapshot for snapshot in map(_read_json, paths) if snapshot]
+
+    def render(self):
+        """
+        :return: the counters of all the workers in the Prometheus text format
+        """
+        requests, latencies, errors = _sum(self._collect())
+
+        lines = [
+            '# HELP http_requests_total Requests handled, by endpoint, method and status.',
+            '# TYPE http_requests_total counter',
+        ]
+        for (blueprint, endpoint, method, status), count in sorted(requests.items(), key=str):
+            lines.append('http_requests_total{} {}'.format(
+                _labels(blueprint=blueprint or '', endpoint=endpoint or '', method=method, status=status), count))
+
+        lines += [
+            '# HELP http_request_duration_seconds Time spent handling requests, by endpoint and method.',
+            '# TYPE http_request_duration_seconds histogram',
+        ]
+        for (blueprint, endpoint, method), latency in sorted(latencies.items(), key=str):
+            labels = {'blueprint': blueprint or '', 'endpoint': endpoint or '', 'method': method}
+            cumulative = 0
+            for bound, count in zip(LATENCY_BUCKETS + ('+Inf',), latency[:-1]):
+                cumulative += count
+                lines.append('http_request_duration_seconds_bucket{} {}'.format(
+                    _labels(le=bound, **labels), cumulative))
+            lines.append('http_request_duration_seconds_sum{} {}'.format(_labels(**labels), latency[-1]))
+            lines.append('http_request_duration_seconds_count{} {}'.format(_labels(**labels), cumulative))
+
+        lines += [
+            '# HELP app_errors_total Error responses, by error_code.',
+            '# TYPE app_errors_total counter',
+        ]
+        for error_code, count in sorted(errors.items()):
+            lines.append('app_errors_total{} {}'.format(
+                _labels(error_code=error_code, name=_error_name(error_code)), count))
+
+        return '\n'.join(lines) + '\n'
+
+
+metrics = RequestMetrics()
@@ -0,0 +1,263 @@
+import threading
+import time
+
+from flask import current_app
+from flask_sqlalchemy import Pagination
+from sqlalchemy import Integer, Numeric, String, text, tuple_
+
+from main.db import db
+from main.errors import BadRequest
+from main.utils.response_helpers import make_etag
+
+TOTAL_NONE = 'none'
+TOTAL_APPROX = 'approx'
+TOTAL_CACHED = 'cached'
+TOTAL_EXACT = 'exact'
+TOTAL_MODES = (TOTAL_NONE, TOTAL_APPROX, TOTAL_CACHED, TOTAL_EXACT)
+
+
+class KeysetPage:
+    """
+    A page of a keyset (cursor) pagination
+    - Exposes the same attributes as flask-sqlalchemy's Pagination that the pagination response schema dumps, except
+      page/total which have no meaning here
+    """
+
+    def __init__(self, items, per_page, next_cursor):
+        """
+        Constructor
+        :param items: rows of the page
+        :param per_page: the page size that was applied
+        :param next_cursor: key values of the last row of the page, None if this is the last page
+        """
+        self.items = items
+        self.per_page = per_page
+        self.next_cursor = next_cursor
+
+
+def is_keyset_request(query_params):
+    """
+    :param query_params: query params loaded by a schema derived from BasePaginationQuerySchema
+    :return: True if client asks for cursor pagination rather than page/per_page pagination
+    """
+    return query_params.get('after') is not None or query_params.get('limit') is not None
+
+
+def get_total_mode(query_params):
+    """
+    :param query_params: query params loaded by a schema derived from BasePaginationQuerySchema
+    :return: how total_items should be computed for this request
+    """
+    return query_params.get('total') or current_app.config['PAGINATION_TOTAL_MODE']
+
+
+def _is_key_value(key, value):
+    """
+    :param key: column of the keys of a keyset pagination
+    :param value: value of the key decoded from a cursor
+    :return: True if the value has the type of the column
+    """
+    if isinstance(key.type, Integer):
+        return isinstance(value, int)
+    if isinstance(key.type, Numeric):
+        return isinstance(value, (int, float))
+    if isinstance(key.type, String):
+        return isinstance(value, str)
+    return True
+
+
+def keyset_paginate(query, keys, after=None, limit=None, default_limit=5):
+    """
+    Paginate a query by seeking past the last row of the previous page instead of using OFFSET, so every page costs an
+    index range scan of `limit` rows no matter how deep it is.
+    :param query: query to paginate, must not be ordered yet
+    :param keys: columns uniquely ordering the rows, should be backed by an index, e.g. (ItemModel.category_id,
+    ItemModel.id)
+    :param after: decoded cursor, values of `keys` for the last row of the previous page
+    :param limit: page size
+    :param default_limit: page size used when client doesn't send one
+    :raise BadRequest 400: if the cursor doesn't match the keys of this query
+    :return: KeysetPage
+    """
+    limit = limit or default_limit
+
+    if after is not None:
+        if len(after) != len(keys) or not all(_is_key_value(key, value) for key, value in zip(keys, after)):
+            raise BadRequest(error_message='This cursor is not valid for this request.')
+        if len(keys) == 1:
+            query = query.filter(keys[0] > after[0])
+        else:
+            query = query.filter(tuple_(*keys) > tuple_(*after))
+
+    # Fetch one more row to know whether there is a next page without running a COUNT(*)
+    rows = query.order_by(*keys).limit(limit + 1).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = [getattr(rows[-1], key.key) for key in keys]
+
+    return KeysetPage(items=rows, per_page=limit, next_cursor=next_cursor)
+
+
+class CountCache:
+    """
+    Count Cache
+    - Keeps the result of COUNT(*) queries for a while so list endpoints don't count the whole table on every request
+    - Entries are keyed by (table name, filters) and dropped when their table is written (see invalidate)
+    - Usage: count_cache.init_app(app), then count_cache.get(...) / count_cache.invalidate(...)
+    """
+
+    def __init__(self):
+        self.ttl = 30
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        """
+        Read settings from the app config and start with an empty cache
+        :param app: Flask app
+        """
+        self.ttl = app.config.get('PAGINATION_COUNT_CACHE_TTL', self.ttl)
+        self.clear()
+
+    def get(self, key, compute):
+        """
+        :param key: (table name, filters) the count is about
+        :param compute: function running the actual count, called on a miss
+        :return: the cached count or the freshly computed one
+        """
+        now = time.monotonic()
+        entry = self._entries.get(key)
+        if entry is not None and entry[1] > now:
+            return entry[0]
+
+        total = compute()
+        with self._lock:
+            self._entries[key] = (total, now + self.ttl)
+        return total
+
+    def invalidate(self, *table_names):
+        """
+        Drop every count made on the given tables, call it after creating/deleting rows of those tables
+        :param table_names: names of the written tables
+        """
+        with self._lock:
+            for key in [key for key in self._entries if key[0] in table_names]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+count_cache = CountCache()
+
+
+def _make_count_key(table_name, filters):
+    return table_name, tuple(sorted(filters.items()))
+
+
+def _count_from_table_statistics(table_name):
+    """
+    Read the row count estimated by the database statistics, it costs nothing but it can be off by a few percent.
+    :param table_name: name of the table
+    :return: estimated row count, None if the database doesn't provide statistics for the table
+    """
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'mysql':
+        statement = text('SELECT TABLE_ROWS FROM information_schema.TABLES '
+                         'WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table_name')
+    elif dialect == 'sqlite':
+        # sqlite_stat1 only exists once ANALYZE has been run
+        if not db.session.execute(text("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'")).scalar():
+            return None
+        statement = text('SELECT CAST(stat AS INTEGER) FROM sqlite_stat1 WHERE tbl = :table_name LIMIT 1')
+    else:
+        return None
+
+    return db.session.execute(statement, {'table_name': table_name}).scalar()
+
+
+def count_total(query, table_name, filters, mode, counter=None):
+    """
+    Count the rows of a list query the way the client asked for
+    :param query: the filtered, unpaginated query
+    :param table_name: name of the table being listed, used to key/invalidate cached counts
+    :param filters: dict of equality filters applied to the query
+    :param mode: one of TOTAL_MODES
+    :param counter: optional function reading a denormalized counter of the rows, used for approx
+    :return: the number of rows, None for TOTAL_NONE
+    """
+    if mode == TOTAL_NONE:
+        return None
+
+    def exact_count():
+        return query.order_by(None).enable_eagerloads(False).count()
+
+    if mode == TOTAL_APPROX:
+        if counter is not None:
+            return counter()
+        if not filters:
+            total = _count_from_table_statistics(table_name)
+            if total is not None:
+                return total
+    if mode == TOTAL_EXACT:
+        return exact_count()
+
+    # Cached count, also the fallback of approx when statistics can't answer (e.g filtered queries)
+    return count_cache.get(_make_count_key(table_name, filters), exact_count)
+
+
+def offset_paginate(query, table_name, page, per_page, total_mode, filters=None, counter=None, count_query=None):
+    """
+    Same as flask-sqlalchemy's paginate (with error_out=False), but lets the client decide how total is computed
+    :param query: the filtered query to paginate
+    :param table_name: name of the table being listed
+    :param page: page to get
+    :param per_page: page size
+    :param total_mode: one of TOTAL_MODES
+    :param filters: dict of equality filters applied to the query
+    :param counter: optional function reading a denormalized counter of the rows, see count_total
+    :param count_query: query to count for total when it can be simpler than query (e.g without joins)
+    :return: flask-sqlalchemy's Pagination
+    """
+    filters = filters or {}
+    items = query.limit(per_page).offset((page - 1) * per_page).all()
+
+    # A short page that isn't past the end tells us the total without counting
+    if len(items) < per_page and (items or page == 1) and total_mode != TOTAL_NONE:
+        total = (page - 1) * per_page + len(items)
+    else:
+        total = count_total(count_query or query, table_name, filters, total_mode, counter=counter)
+
+    return Pagination(query, page, per_page, total, items)
+
+
+def get_page_validators(page, variant=None):
+    """
+    Compute the validator of a page fetched by a lightweight query of ids and updated timestamps, it changes
+    whenever a row of the page, the paging or the total change.
+    Pages have no Last-Modified: the latest `updated` of their rows doesn't move when a row is deleted or leaves the
+    page, a client sending If-Modified-Since would keep a stale page.
+    :param page: Pagination or KeysetPage whose items are rows of plain values
+    :param variant: what else selects the representation of the page, e.g the sparse fieldset
+    :return: etag of the page
+    """
+    rows = [tuple(row) for row in page.items]
+    return make_etag(page.per_page, getattr(page, 'page', None), getattr(page, 'total', None),
+                     getattr(page, 'next_cursor', None), rows, variant)
+
+
+def fill_page_items(page, query, id_column):
+    """
+    Replace the lightweight rows of a page by the full rows (1 query by primary keys), keeping the page order
+    :param page: Pagination or KeysetPage whose items have an id
+    :param query: query of the full rows, with its loader options
+    :param id_column: primary key column of the queried model
+    :return: the page
+    """
+    ids = [row.id for row in page.items]
+    rows_by_id = {row.id: row for row in query.filter(id_column.in_(ids))} if ids else {}
+    # A row deleted since the first query is just left out
+    page.items = [rows_by_id[_id] for _id in ids if _id in rows_by_id]
+    return page
@@ -0,0 +1,111 @@
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+
+from passlib.hash import bcrypt
+
+from main.errors import ServiceUnavailable
+
+DEFAULT_ROUNDS = 12
+
+
+def _hash(password, rounds):
+    return bcrypt.using(rounds=rounds).hash(password)
+
+
+def _verify(password, hashed_password):
+    return bcrypt.verify(password, hashed_password)
+
+
+class PasswordHasher:
+    """
+    Password Hasher
+    - bcrypt costs ~250ms of CPU per call at 12 rounds, it runs in a process pool of PASSWORD_HASHER_WORKERS processes
+      so a burst of logins can't starve the request threads of the worker
+    - At most PASSWORD_HASHER_MAX_PENDING calls are queued or running, more are rejected at once with a 503 rather than
+      waiting behind the queue
+    - Work factor is BCRYPT_ROUNDS, hashes made with another one are upgraded at the next login (needs_rehash)
+    - Usage: password_hasher.init_app(app); PASSWORD_HASHER_WORKERS = 0 hashes in the request thread (e.g tests)
+    """
+
+    def __init__(self):
+        self.rounds = DEFAULT_ROUNDS
+        self.workers = 0
+        self.timeout = None
+        self._executor = None
+        self._slots = threading.BoundedSemaphore(16)
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        """
+        Read the config, the pool itself is started by the first call so it is created in the serving process
+        :param app: Flask app
+        """
+        self.shutdown()
+        self.rounds = app.config.get('BCRYPT_ROUNDS', DEFAULT_ROUNDS)
+        self.workers = app.config.get('PASSWORD_HASHER_WORKERS', 0)
+        self.timeout = app.config.get('PASSWORD_HASHER_TIMEOUT')
+        self._slots = threading.BoundedSemaphore(app.config.get('PASSWORD_HASHER_MAX_PENDING', 16))
+
+    def shutdown(self):
+        """
+        Stop the pool, waiting for the running calls
+        """
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
+
+    def submit(self, fn, *args):
+        """
+        Queue a call in the pool
+        :param fn: picklable function
+        :param args: its picklable arguments
+        :raise ServiceUnavailable 503: if PASSWORD_HASHER_MAX_PENDING calls are already queued or running
+        :return: Future of the result
+        """
+        if not self._slots.acquire(blocking=False):
+            raise ServiceUnavailable(error_message='Too many authentication requests, please retry later.')
+        try:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ProcessPoolExecutor(max_workers=self.workers)
+                future = self._executor.submit(fn, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        # The slot is held until the call is done, even if the request stopped waiting for it
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def _run(self, fn, *args):
+        if not self.workers:
+            return fn(*args)
+        try:
+            return self.submit(fn, *args).result(timeout=self.timeout)
+        except TimeoutError:
+            raise ServiceUnavailable(error_message='Authentication took too long, please retry later.')
+
+    def hash(self, password):
+        """
+        :param password: plain password
+        :return: bcrypt hash of the password with BCRYPT_ROUNDS rounds
+        """
+        return self._run(_hash, password, self.rounds)
+
+    def verify(self, password, hashed_password):
+        """
+        :param password: plain password
+        :param hashed_password: bcrypt hash
+        :return: True if the password matches the hash
+        """
+        return self._run(_verify, password, hashed_password)
+
+    def needs_rehash(self, hashed_password):
+        """
+        :param hashed_password: bcrypt hash
+        :return: True if the hash wasn't made with BCRYPT_ROUNDS rounds, this doesn't hash anything
+        """
+        return bcrypt.using(rounds=self.rounds).needs_update(hashed_password)
+
+
+password_hasher = PasswordHasher()
@@ -0,0 +1,144 @@
+import logging
+import threading
+import time
+
+from sqlalchemy import event, exc
+from sqlalchemy.pool import QueuePool
+
+
+class _TimedCheckout:
+    """
+    Pool mixin reporting to pool_metrics how long every checkout waited for a connection, pre-ping included
+    """
+
+    def _timed_checkout(self, checkout):
+        start = time.perf_counter()
+        try:
+            connection = checkout()
+        except exc.TimeoutError:
+            pool_metrics.record_timeout(self, time.perf_counter() - start)
+            raise
+        pool_metrics.record_checkout(self, time.perf_counter() - start)
+        return connection
+
+    def connect(self):
+        return self._timed_checkout(super().connect)
+
+    def unique_connection(self):
+        # Checkout of Engine.connect()
+        return self._timed_checkout(super().unique_connection)
+
+
+_instrumented_classes = {}
+
+
+def instrumented_pool_class(pool_class):
+    """
+    :param pool_class: SQLAlchemy pool class, e.g QueuePool
+    :return: subclass of pool_class timing its checkouts, pools recreated by engine.dispose() keep the class
+    """
+    if pool_class not in _instrumented_classes:
+        _instrumented_classes[pool_class] = type('Instrumented' + pool_class.__name__, (_TimedCheckout, pool_class), {})
+    return _instrumented_classes[pool_class]
+
+
+class PoolMetrics:
+    """
+    Pool Metrics
+    - Counters of the connection pools of this worker: checkouts and the time they waited for a connection, checkouts
+      which timed out (pool_size + max_overflow connections already checked out for pool_timeout seconds), connections
+      opened and invalidated (disconnects detected by pre-ping or by a failed statement)
+    - Checkouts waiting DB_POOL_SLOW_CHECKOUT seconds or more are logged with the state of the pool
+    - Usage: pool_metrics.init_app(app); engines are created with an instrumented_pool_class and passed to
+      pool_metrics.instrument (see main.db)
+    """
+
+    def __init__(self):
+        self.slow_checkout = 0.1
+        self._lock = threading.Lock()
+        self.reset()
+
+    def init_app(self, app):
+        """
+        Read the config and reset the counters
+        :param app: Flask app
+        """
+        self.slow_checkout = app.config.get('DB_POOL_SLOW_CHECKOUT', 0.1)
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.checkouts = 0
+            self.wait_seconds = 0.0
+            self.max_wait_seconds = 0.0
+            self.slow_checkouts = 0
+            self.timeouts = 0
+            self.connects = 0
+            self.invalidations = 0
+
+    def instrument(self, engine):
+        """
+        Count the connections opened and invalidated by the pool of an engine, listeners survive engine.dispose()
+        :param engine: SQLAlchemy engine
+        """
+        event.listen(engine, 'connect', self._on_connect)
+        event.listen(engine, 'invalidate', self._on_invalidate)
+        event.listen(engine, 'soft_invalidate', self._on_invalidate)
+
+    def _on_connect(self, dbapi_connection, connection_record):
+        with self._lock:
+            self.connects += 1
+
+    def _on_invalidate(self, dbapi_connection, connection_record, exception):
+        with self._lock:
+            self.invalidations += 1
+
+    def record_checkout(self, pool, seconds):
+        """
+        :param pool: pool the connection was checked out from
+        :param seconds: time the checkout took
+        """
+        with self._lock:
+            self.checkouts += 1
+            self.wait_seconds += seconds
+            self.max_wait_seconds = max(self.max_wait_seconds, seconds)
+            slow = seconds >= self.slow_checkout
+            if slow:
+                self.slow_checkouts += 1
+        if slow:
+            logging.warning('Waited %.3fs for a database connection: %s', seconds, pool.status())
+
+    def record_timeout(self, pool, seconds):
+        """
+        :param pool: pool the connection couldn't be checked out from
+        :param seconds: time waited before giving up
+        """
+        with self._lock:
+            self.timeouts += 1
+        logging.warning('Gave up on a database connection after %.3fs: %s', seconds, pool.status())
+
+    def stats(self, engine):
+        """
+        :param engine: SQLAlchemy engine whose pool is described
+        :return: dict of the counters, plus the live state of the pool if it is a queue
+        """
+        pool = engine.pool
+        pool_class = type(pool).__bases__[-1] if isinstance(pool, _TimedCheckout) else type(pool)
+        with self._lock:
+            stats = {
+                'pool': pool_class.__name__,
+                'checkouts': self.checkouts,
+                'wait_avg_ms': self.wait_seconds / self.checkouts * 1000 if self.checkouts else None,
+                'wait_max_ms': self.max_wait_seconds * 1000,
+                'slow_checkouts': self.slow_checkouts,
+                'timeouts': self.timeouts,
+                'connects': self.connects,
+                'invalidations': self.invalidations,
+            }
+        if isinstance(pool, QueuePool):
+            stats.update(size=pool.size(), checked_in=pool.checkedin(), checked_out=pool.checkedout(),
+                         overflow=pool.overflow())
+        return stats
+
+
+pool_metrics = PoolMetrics()
@@ -0,0 +1,113 @@
+import json
+import re
+import time
+from collections import Counter
+
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Lists of bound parameters (IN (?, ?, ?), multi-row VALUES) are one shape whatever their length
+_PARAMETER_LIST = re.compile(r'\((?:\s*(?:\?|%s|%\(\w+\)s)\s*,)+\s*(?:\?|%s|%\(\w+\)s)\s*\)')
+
+
+def statement_shape(statement):
+    """
+    :param statement: SQL statement with placeholders
+    :return: the statement with its lists of placeholders collapsed to one
+    """
+    return _PARAMETER_LIST.sub('(?)', statement)
+
+
+class QueryStats:
+    """
+    SQL statements run while handling one request
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.shapes = Counter()
+
+    def most_repeated(self):
+        """
+        :return: (shape, executions) of the statement run the most times, (None, 0) if no statement ran
+        """
+        return self.shapes.most_common(1)[0] if self.shapes else (None, 0)
+
+
+class QueryTracker:
+    """
+    Query Tracker
+    - Counts the SQL statements of every request, the time spent in the database and how many times each statement
+      shape ran: a shape run once per row of a page is an N+1 (e.g a relationship lazy-loaded by the schema)
+    - Every request is logged as a JSON line at INFO by the app logger (LOG_LEVEL), a warning is logged when a shape
+      runs QUERY_REPEAT_WARNING times or more
+    - With QUERY_STATS_HEADERS the counters are sent back as X-Query-Count, X-Query-Time-Ms and X-Query-Max-Repeat,
+      enable it outside production only
+    - Usage: query_tracker.init_app(app)
+    """
+
+    def __init__(self):
+        self._listening = False
+
+    def init_app(self, app):
+        """
+        Listen to the statements of every engine and hook the requests of the app
+        :param app: Flask app
+        """
+        if not self._listening:
+            event.listen(Engine, 'before_cursor_execute', self._before_cursor_execute)
+            event.listen(Engine, 'after_cursor_execute', self._after_cursor_execute)
+            self._listening = True
+
+        app.before_request(self._start)
+        app.after_request(self._finish)
+
+    @staticmethod
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if has_request_context() and 'query_stats' in g:
+            context._query_tracker_start = time.perf_counter()
+
+    @staticmethod
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        start = getattr(context, '_query_tracker_start', None)
+        if start is not None and has_request_context() and 'query_stats' in g:
+            stats = g.query_stats
+            stats.count += 1
+            stats.seconds += time.perf_counter() - start
+            stats.shapes[statement_shape(statement)] += 1
+
+    @staticmethod
+    def _start():
+        g.query_stats = QueryStats()
+
+    @staticmethod
+    def _finish(response):
+        stats = g.pop('query_stats', None)
+        if stats is None:
+            return response
+
+        shape, repeats = stats.most_repeated()
+        current_app.logger.info(json.dumps({
+            'event': 'request_queries',
+            'method': request.method,
+            'path': request.path,
+            'endpoint': request.endpoint,
+            'status': response.status_code,
+            'queries': stats.count,
+            'db_ms': round(stats.seconds * 1000, 3),
+            'max_repeat': repeats,
+        }))
+        if repeats >= current_app.config.get('QUERY_REPEAT_WARNING', 5):
+            current_app.logger.warning('%s %s ran the same statement %d times, N+1 query? %s',
+                            request.method, request.path, repeats, shape)
+
+        if current_app.config.get('QUERY_STATS_HEADERS'):
+            response.headers['X-Query-Count'] = str(stats.count)
+            response.headers['X-Query-Time-Ms'] = '{:.3f}'.format(stats.seconds * 1000)
+            response.headers['X-Query-Max-Repeat'] = str(repeats)
+        return response
+
+
+query_tracker = QueryTracker()
@@ -0,0 +1,118 @@
+import functools
+import itertools
+import threading
+from contextlib import contextmanager
+
+from flask import g, has_app_context, has_request_context, request
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+SELECTIONS = ('round_robin', 'least_loaded')
+
+
+class ReplicaRouter:
+    """
+    Replica Router
+    - Replicas are the binds of SQLALCHEMY_BINDS named replica_*, built from DATABASE_REPLICA_URLS
+    - Statements run inside replica_router.reading() (or a view decorated with @replica_router.read_only) go to a
+      replica picked by DATABASE_REPLICA_SELECTION: round_robin, or least_loaded (fewest reads in flight in this
+      worker); everything else, and every flush, goes to the primary
+    - Read your writes: a successful write request sets a cookie for READ_YOUR_WRITES_WINDOW seconds, the reads of a
+      client holding it go to the primary, so it never sees a replica lagging behind its own writes
+    - Rows read from a replica may lag, the misses of the entity cache are read from the primary (see
+      BaseModel.find_by_id) so a lagging row can't be cached after its invalidation
+    - Usage: replica_router.init_app(app); db.session routes through current_bind() (see main.db)
+    """
+
+    def __init__(self):
+        self.binds = []
+        self.selection = 'round_robin'
+        self.window = 5
+        self.cookie_name = 'read_primary'
+        self._lock = threading.Lock()
+        self._round_robin = itertools.cycle([])
+        self._in_flight = {}
+
+    def init_app(self, app):
+        """
+        Read the replicas from the config and hook the requests of the app to grant read your writes
+        :param app: Flask app
+        """
+        self.binds = sorted(bind for bind in app.config.get('SQLALCHEMY_BINDS') or {} if bind.startswith('replica'))
+        self.selection = app.config.get('DATABASE_REPLICA_SELECTION', 'round_robin')
+        if self.selection not in SELECTIONS:
+            raise ValueError('DATABASE_REPLICA_SELECTION must be one of ' + ', '.join(SELECTIONS))
+        self.window = app.config.get('READ_YOUR_WRITES_WINDOW', 5)
+        self.cookie_name = app.config.get('READ_YOUR_WRITES_COOKIE', 'read_primary')
+        self._round_robin = itertools.cycle(self.binds)
+        self._in_flight = {bind: 0 for bind in self.binds}
+        app.after_request(self._grant_read_your_writes)
+
+    def _grant_read_your_writes(self, response):
+        if self.binds and request.method not in SAFE_METHODS and response.status_code < 400:
+            response.set_cookie(self.cookie_name, '1', max_age=self.window, httponly=True)
+        return response
+
+    def _select(self):
+        with self._lock:
+            if self.selection == 'least_loaded':
+                # Ties go to the first replica, min() is stable
+                bind = min(self.binds, key=self._in_flight.get)
+            else:
+                bind = next(self._round_robin)
+            self._in_flight[bind] += 1
+        return bind
+
+    def _release(self, bind):
+        with self._lock:
+            self._in_flight[bind] -= 1
+
+    @contextmanager
+    def reading(self):
+        """
+        Route the statements run inside the with block to a replica, unless there is none, the client must read its
+        writes, or a replica is already in use
+        """
+        must_read_writes = has_request_context() and request.cookies.get(self.cookie_name)
+        if not self.binds or 'replica_bind' in g or must_read_writes:
+            yield
+            return
+
+        bind = self._select()
+        g.replica_bind = bind
+        try:
+            yield
+        finally:
+            g.pop('replica_bind', None)
+            self._release(bind)
+
+    @contextmanager
+    def primary(self):
+        """
+        Route the statements run inside the with block to the primary, even within a reading() block
+        """
+        bind = g.pop('replica_bind', None) if has_app_context() else None
+        try:
+            yield
+        finally:
+            if bind is not None:
+                g.replica_bind = bind
+
+    def read_only(self, func):
+        """
+        Decorator of the views which only read, they run on a replica
+        """
+        @functools.wraps(func)
+        def in_func(*args, **kwargs):
+            with self.reading():
+                return func(*args, **kwargs)
+
+        return in_func
+
+    def current_bind(self):
+        """
+        :return: bind key of the replica the statements of the current context go to, None for the primary
+        """
+        return g.get('replica_bind') if has_app_context() else None
+
+
+replica_router = ReplicaRouter()
@@ -1,2 +1,63 @@
+import hashlib
+from datetime import timezone
+
+from flask import request, make_response, Response
+
+from main.errors import StatusCodeEnum
+
+
 def create_data_response(data):
     return {'data': data}
+
+
+def make_etag(*parts):
+    """
+    Build a strong entity tag from the values the representation depends on (ids, updated timestamps, paging...)
+    :param parts: any values having a stable repr
+    :return: the entity tag, unquoted
+    """
+    return hashlib.sha1(repr(parts).encode('utf-8')).hexdigest()
+
+
+def _to_utc(moment):
+    """
+    :param moment: datetime, naive ones are local time (our timestamps are made by datetime.now)
+    :return: naive UTC datetime truncated to the second, the precision of HTTP dates
+    """
+    return moment.astimezone(timezone.utc).replace(tzinfo=None, microsecond=0)
+
+
+def is_not_modified(etag, last_modified=None):
+    """
+    Check the conditional headers of the current request, If-None-Match takes precedence over If-Modified-Since
+    :param etag: current entity tag of the resource
+    :param last_modified: current modification time of the resource, None if unknown
+    :return: True if the client already has the current representation
+    """
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    if request.if_modified_since is not None and last_modified is not None:
+        if_modified_since = request.if_modified_since
+        if if_modified_since.tzinfo is not None:
+            if_modified_since = if_modified_since.astimezone(timezone.utc).replace(tzinfo=None)
+        return _to_utc(last_modified) <= if_modified_since
+    return False
+
+
+def make_conditional_response(etag, last_modified, build_body):
+    """
+    Answer a GET with 304 Not Modified when the client's copy is still current, without serializing the body
+    :param etag: current entity tag of the resource, see make_etag
+    :param last_modified: current modification time of the resource, None if unknown (e.g empty list)
+    :param build_body: function returning the response body (anything a view can return), only called if modified
+    :return: Flask response carrying ETag and Last-Modified
+    """
+    if is_not_modified(etag, last_modified):
+        response = Response(status=StatusCodeEnum.NOT_MODIFIED)
+    else:
+        response = make_response(build_body())
+
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = _to_utc(last_modified)
+    return response
@@ -0,0 +1,83 @@
+from marshmallow import fields, missing
+from marshmallow.decorators import POST_DUMP, PRE_DUMP
+from marshmallow.utils import ensure_text_type, isoformat
+
+
+def _is_plain(field, base_class):
+    # The field formats values like base_class does, subclasses only changing deserialization (e.g TrimmedString) too
+    return isinstance(field, base_class) and type(field)._serialize is base_class._serialize
+
+
+def _compile_value(field, namespace, name):
+    """
+    :return: expression formatting `value` (never None, never missing) like field._serialize does, None if the field
+    must go through field.serialize
+    """
+    if _is_plain(field, fields.String):
+        return 'value if value.__class__ is str else ensure_text_type(value)'
+    if _is_plain(field, fields.Integer) and type(field)._format_num is fields.Number._format_num \
+            and not field.as_string:
+        return 'int(value)'
+    if _is_plain(field, fields.DateTime) \
+            and field.SERIALIZATION_FUNCS.get(field.format or field.DEFAULT_FORMAT) is isoformat:
+        return 'value.isoformat()'
+    if _is_plain(field, fields.Nested):
+        namespace[name] = compile_schema(field.schema, many=field.schema.many or field.many)
+        return name + '(value)'
+    if _is_plain(field, fields.List) and _is_plain(field.inner, fields.Nested) and not field.inner.many:
+        # Like List._serialize, a list of Nested is dumped with many=True
+        namespace[name] = compile_schema(field.inner.schema, many=True)
+        return name + '(value)'
+    return None
+
+
+def compile_schema(schema, many=None):
+    """
+    Turn a schema instance into a dump function specialized for its fields (only, exclude and load_only applied)
+    - The fields marshmallow dispatches to on every row (String, Integer, DateTime, Nested, List of Nested) are
+      inlined as plain attribute reads and conversions, any other field is called as marshmallow would
+    - The output is the same as schema.dump(obj): objects which are mappings (or have __getitem__) and schemas having
+      pre/post dump hooks or an ordered dict_class are left to schema.dump
+    :param schema: marshmallow schema instance
+    :param many: dump a collection, schema.many by default
+    :return: function(obj) -> serialized data
+    """
+    many = schema.many if many is None else many
+    if schema._has_processors(PRE_DUMP) or schema._has_processors(POST_DUMP) or schema.dict_class is not dict:
+        return lambda obj: schema.dump(obj, many=many)
+
+    namespace = {'missing': missing, 'ensure_text_type': ensure_text_type, 'schema': schema}
+    lines = [
+        'def dump_one(obj):',
+        '    if hasattr(obj.__class__, "__getitem__"):',
+        '        return schema.dump(obj, many=False)',
+        '    result = {}',
+    ]
+    for index, (attr_name, field) in enumerate(schema.dump_fields.items()):
+        key = field.data_key if field.data_key is not None else attr_name
+        attribute = field.attribute if field.attribute is not None else attr_name
+        expression = _compile_value(field, namespace, 'nested_{}'.format(index))
+        if expression is None or field.default is not missing or '.' in attribute or not field._CHECK_ATTRIBUTE:
+            namespace['field_{}'.format(index)] = field
+            lines += [
+                '    value = field_{}.serialize({!r}, obj, accessor=schema.get_attribute)'.format(index, attr_name),
+                '    if value is not missing:',
+                '        result[{!r}] = value'.format(key),
+            ]
+        else:
+            lines += [
+                '    value = getattr(obj, {!r}, missing)'.format(attribute),
+                '    if value is not missing:',
+                '        result[{!r}] = None if value is None else {}'.format(key, expression),
+            ]
+    lines.append('    return result')
+    if many:
+        lines += [
+            'def dump(objs):',
+            '    return dump_one(objs) if objs is None else [dump_one(obj) for obj in objs]',
+        ]
+    else:
+        lines.append('dump = dump_one')
+
+    exec(compile('\n'.join(lines), '<compiled {}>'.format(type(schema).__name__), 'exec'), namespace)
+    return namespace['dump']
@@ -0,0 +1,157 @@
+import threading
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy.exc import IntegrityError
+
+from main.db import db
+from main.models.revoked_token import RevokedTokenModel
+from main.utils.bloom_filter import BloomFilter
+from main.utils.replica_router import replica_router
+from main.utils.unique_constraints import is_unique_violation
+
+
+class TokenDenylist:
+    """
+    Token Denylist
+    - Revoked tokens are stored by jti in the revoked_tokens table, fronted by an in-memory Bloom filter of the
+      revoked jtis: a token which isn't in the filter (nearly every token) is accepted without querying the database,
+      the table is only read to rule out the false positives
+    - Every worker adds the jtis revoked by the others to its filter every TOKEN_DENYLIST_SYNC_INTERVAL seconds, so a
+      token revoked in another worker may be accepted for up to that long
+    - Every TOKEN_DENYLIST_REBUILD_INTERVAL seconds the filter is built again from the unexpired rows and the expired
+      rows are purged, so both stay as small as the number of live revoked tokens
+    - The refreshes run on their own session, by one request at a time while the others keep checking against the
+      current filter, which is swapped in once built
+    - Usage: token_denylist.init_app(app), then jwt.token_in_blacklist_loader(token_denylist.is_token_revoked)
+    """
+
+    def __init__(self):
+        self.sync_interval = 5
+        self.rebuild_interval = 3600
+        self.capacity = 100000
+        self.error_rate = 0.001
+        self.memory_checks = 0
+        self.database_checks = 0
+        self._bloom = None
+        self._synced_at = self._rebuilt_at = 0
+        self._watermark = None
+        # Held by the request refreshing the filter, the others don't wait for it
+        self._sync_lock = threading.Lock()
+        # Held while the filter is changed or swapped, briefly
+        self._lock = threading.Lock()
+        # jtis revoked by this worker since the last refresh, a rebuild started before them mustn't drop them
+        self._revoked_since_sync = []
+
+    def init_app(self, app):
+        """
+        Read the config and start with an empty filter, it is loaded by the first check
+        :param app: Flask app
+        """
+        self.sync_interval = app.config.get('TOKEN_DENYLIST_SYNC_INTERVAL', 5)
+        self.rebuild_interval = app.config.get('TOKEN_DENYLIST_REBUILD_INTERVAL', 3600)
+        self.capacity = app.config.get('TOKEN_DENYLIST_CAPACITY', 100000)
+        self.error_rate = app.config.get('TOKEN_DENYLIST_ERROR_RATE', 0.001)
+        self.memory_checks = self.database_checks = 0
+        self._bloom = None
+
+    def _is_stale(self, now):
+        return self._bloom is None or now - self._synced_at >= self.sync_interval \
+            or now - self._rebuilt_at >= self.rebuild_interval
+
+    def _sync(self):
+        now = time.monotonic()
+        if not self._is_stale(now):
+            return
+        # Only the first load is waited for, later one request refreshes while the others use the current filter
+        if not self._sync_lock.acquire(blocking=self._bloom is None):
+            return
+        try:
+            if self._is_stale(now):
+                self._refresh(now)
+        finally:
+            self._sync_lock.release()
+
+    def _refresh(self, now):
+        rebuild = self._bloom is None or now - self._rebuilt_at >= self.rebuild_interval
+        # Overlap the previous sync so a row committed late with an older timestamp isn't missed
+        since = None if rebuild else self._watermark - timedelta(seconds=max(self.sync_interval, 1) * 2)
+        watermark = datetime.now()
+
+        # On a session of its own, on the primary: the purge commits, it mustn't commit the work of the request
+        session = db.create_session({})()
+        try:
+            with replica_router.primary():
+                if rebuild:
+                    RevokedTokenModel.purge_expired(session)
+                jtis = RevokedTokenModel.find_jtis_created_since(since, session)
+        finally:
+            session.close()
+
+        if rebuild:
+            bloom = BloomFilter(self.capacity, self.error_rate)
+            for jti in jtis:
+                bloom.add(jti)
+        with self._lock:
+            if rebuild:
+                jtis = self._revoked_since_sync
+            else:
+                bloom = self._bloom
+                jtis += self._revoked_since_sync
+            for jti in jtis:
+                bloom.add(jti)
+            self._revoked_since_sync = []
+            self._bloom, self._watermark, self._synced_at = bloom, watermark, now
+            if rebuild:
+                self._rebuilt_at = now
+
+    def revoke(self, jti, expires):
+        """
+        Revoke a token, it is rejected at once by this worker. Revoking a revoked token does nothing
+        :param jti: unique identifier of the token
+        :param expires: UTC datetime at which the token expires, None if it never expires
+        :raise Exception: many exception can be raised, seek help(sqlalchemy.exc)
+        """
+        try:
+            RevokedTokenModel(jti=jti, expires=expires).save()
+        except IntegrityError as error:
+            # Already revoked, e.g by a logout of the same token in a worker this one hasn't synced with yet
+            if not is_unique_violation(error):
+                raise
+        self._sync()
+        with self._lock:
+            self._bloom.add(jti)
+            self._revoked_since_sync.append(jti)
+
+    def is_revoked(self, jti):
+        """
+        :param jti: unique identifier of the token
+        :return: True if the token is revoked
+        """
+        self._sync()
+        if jti not in self._bloom:
+            self.memory_checks += 1
+            return False
+        self.database_checks += 1
+        return RevokedTokenModel.is_revoked(jti)
+
+    def is_token_revoked(self, decoded_token):
+        """
+        Callback of flask_jwt_extended's token_in_blacklist_loader
+        :param decoded_token: claims of the token
+        :return: True if the token is revoked
+        """
+        return self.is_revoked(decoded_token['jti'])
+
+    def stats(self):
+        """
+        :return: dict of the counters used to size the filter
+        """
+        return {
+            'filter_entries': None if self._bloom is None else self._bloom.count,
+            'memory_checks': self.memory_checks,
+            'database_checks': self.database_checks,
+        }
+
+
+token_denylist = TokenDenylist()
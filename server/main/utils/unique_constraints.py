@@ -0,0 +1,40 @@
+from contextlib import contextmanager
+
+from sqlalchemy.exc import IntegrityError
+
+from main.db import db
+from main.errors import DuplicatedEntity
+
+MYSQL_DUPLICATE_ENTRY = 1062
+POSTGRESQL_UNIQUE_VIOLATION = '23505'
+
+
+def is_unique_violation(error):
+    """
+    :param error: IntegrityError raised by the database driver
+    :return: True if the error is a violation of a unique constraint (rather than e.g a foreign key)
+    """
+    orig = error.orig
+    if getattr(orig, 'pgcode', None) is not None:
+        return orig.pgcode == POSTGRESQL_UNIQUE_VIOLATION
+    if orig.args and orig.args[0] == MYSQL_DUPLICATE_ENTRY:
+        return True
+    return 'UNIQUE constraint failed' in str(orig)  # SQLite
+
+
+@contextmanager
+def raise_duplicated_entity(error_message):
+    """
+    Let the unique constraints of the database detect duplicates instead of looking for them before writing, which
+    costs a round trip and still races with concurrent writes
+    - Usage: with raise_duplicated_entity('Item with this title exists.'): item.save()
+    :param error_message: message of the DuplicatedEntity
+    :raise DuplicatedEntity 400: if a statement of the block violates a unique constraint, the session is rolled back
+    """
+    try:
+        yield
+    except IntegrityError as error:
+        db.session.rollback()
+        if not is_unique_violation(error):
+            raise
+        raise DuplicatedEntity(error_message=error_message)
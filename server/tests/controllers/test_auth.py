@@ -1,7 +1,14 @@
+import time
+from datetime import datetime, timedelta
+
 from flask_jwt_extended import decode_token
 
 from main.errors import ErrorCodeEnum, StatusCodeEnum
-from tests.helpers import get_user_email, assert_status_error_code
+from main.models.revoked_token import RevokedTokenModel
+from main.models.user import UserModel
+from main.utils.password_hasher import password_hasher
+from main.utils.token_denylist import token_denylist
+from tests.helpers import get_user_email, assert_status_error_code, count_queries
 
 
 #############
@@ -116,3 +123,163 @@ def test_unauth_manipulate_item(plain_client):
     response = plain_client.delete('/items/1')
 
     assert response.status_code == StatusCodeEnum.UNAUTHORIZED
+
+
+def test_login_rehash_password(login_client):
+    app = login_client.application
+    app.config['BCRYPT_ROUNDS'] = 5
+    password_hasher.init_app(app)
+
+    response = login_client.post('/auth', json={'email': 'admin@gmail.com', 'password': '123456'})
+
+    assert response.status_code == StatusCodeEnum.OK
+    with app.app_context():
+        hashed_password = UserModel.query.filter_by(email='admin@gmail.com').first().hashed_password
+    assert hashed_password.startswith('$2b$05$')
+
+    # The upgraded hash still matches the password
+    response = login_client.post('/auth', json={'email': 'admin@gmail.com', 'password': '123456'})
+    assert response.status_code == StatusCodeEnum.OK
+
+
+def test_login_worker_pool(login_client):
+    app = login_client.application
+    app.config['PASSWORD_HASHER_WORKERS'] = 1
+    app.config['PASSWORD_HASHER_MAX_PENDING'] = 1
+    password_hasher.init_app(app)
+
+    try:
+        # The only slot of the pool is taken, the login is rejected at once
+        busy = password_hasher.submit(time.sleep, 1)
+        response = login_client.post('/auth', json={'email': 'admin@gmail.com', 'password': '123456'})
+        json_data = response.get_json()
+
+        assert_status_error_code(test_status_code=response.status_code, test_error_code=json_data.get('error_code'),
+                                 goal_status_code=StatusCodeEnum.SERVICE_UNAVAILABLE,
+                                 goal_error_code=ErrorCodeEnum.SERVICE_UNAVAILABLE)
+
+        busy.result()
+        time.sleep(0.1)  # The slot is released by a callback of the pool
+        response = login_client.post('/auth', json={'email': 'admin@gmail.com', 'password': '123456'})
+        assert response.status_code == StatusCodeEnum.OK
+        response = login_client.post('/auth', json={'email': 'admin@gmail.com', 'password': '1234567'})
+        assert response.status_code == StatusCodeEnum.BAD_REQUEST
+    finally:
+        password_hasher.shutdown()
+
+
+##############
+### LOGOUT ###
+##############
+def get_jti(client):
+    with client.application.app_context():
+        return decode_token(client.environ_base['HTTP_AUTHORIZATION'].split()[1])['jti']
+
+
+def test_logout_no_exceptions(auth_client):
+    response = auth_client.post('/auth', json={'email': 'admin@gmail.com', 'password': '123456'})
+    other_token = response.get_json().get('access_token')
+
+    # Valid tokens are checked against the Bloom filter only, once it is loaded
+    auth_client.put('/items/1', json={'description': 'Logged in'})
+    with count_queries() as statements:
+        response = auth_client.put('/items/1', json={'description': 'Still logged in'})
+    assert response.status_code == StatusCodeEnum.OK
+    assert not [statement for statement in statements if 'revoked_tokens' in statement]
+
+    response = auth_client.delete('/auth')
+    assert response.status_code == StatusCodeEnum.NO_CONTENT
+
+    response = auth_client.put('/items/1', json={'description': 'Logged out'})
+    assert response.status_code == StatusCodeEnum.UNAUTHORIZED
+
+    # Other tokens of the user are still valid
+    response = auth_client.put('/items/1', json={'description': 'Other device'},
+                               headers={'Authorization': 'Bearer ' + other_token})
+    assert response.status_code == StatusCodeEnum.OK
+
+    stats = auth_client.get('/stats/denylist').get_json().get('data')
+    assert stats.get('filter_entries') == 1
+    assert stats.get('memory_checks') >= 2
+    assert stats.get('database_checks') >= 1
+
+
+def test_logout_exceptions(auth_client):
+    response = auth_client.delete('/auth', headers={'Authorization': ''})
+    assert response.status_code == StatusCodeEnum.UNAUTHORIZED
+
+    auth_client.delete('/auth')
+    response = auth_client.delete('/auth')
+    assert response.status_code == StatusCodeEnum.UNAUTHORIZED
+
+
+def test_logout_twice_in_other_workers(auth_client):
+    app = auth_client.application
+    app.config['TOKEN_DENYLIST_SYNC_INTERVAL'] = 3600
+    token_denylist.init_app(app)
+    auth_client.put('/items/1', json={'description': 'Logged in'})
+
+    # Logged out in another worker, this one doesn't know it yet
+    with app.app_context():
+        RevokedTokenModel(jti=get_jti(auth_client), expires=datetime.utcnow() + timedelta(minutes=5)).save()
+    response = auth_client.delete('/auth')
+
+    assert response.status_code == StatusCodeEnum.NO_CONTENT
+    response = auth_client.put('/items/1', json={'description': 'Logged out'})
+    assert response.status_code == StatusCodeEnum.UNAUTHORIZED
+
+
+def test_token_denylist_sync(auth_client):
+    app = auth_client.application
+    app.config['TOKEN_DENYLIST_SYNC_INTERVAL'] = 0
+    token_denylist.init_app(app)
+    auth_client.put('/items/1', json={'description': 'Logged in'})
+
+    # Revoked by another worker: seen at the next sync
+    with app.app_context():
+        RevokedTokenModel(jti=get_jti(auth_client), expires=datetime.utcnow() + timedelta(minutes=5)).save()
+    response = auth_client.put('/items/1', json={'description': 'Revoked elsewhere'})
+
+    assert response.status_code == StatusCodeEnum.UNAUTHORIZED
+
+
+def test_token_denylist_sync_doesnt_block(auth_client):
+    app = auth_client.application
+    app.config['TOKEN_DENYLIST_SYNC_INTERVAL'] = 0
+    token_denylist.init_app(app)
+    auth_client.put('/items/1', json={'description': 'Logged in'})
+    with app.app_context():
+        RevokedTokenModel(jti=get_jti(auth_client), expires=datetime.utcnow() + timedelta(minutes=5)).save()
+
+    # While another request refreshes the filter, the current one is used
+    token_denylist._sync_lock.acquire()
+    try:
+        response = auth_client.put('/items/1', json={'description': 'Refreshing elsewhere'})
+    finally:
+        token_denylist._sync_lock.release()
+    assert response.status_code == StatusCodeEnum.OK
+
+    response = auth_client.put('/items/1', json={'description': 'Revoked elsewhere'})
+    assert response.status_code == StatusCodeEnum.UNAUTHORIZED
+
+    # Syncs overlap, the jtis they add again aren't counted twice
+    auth_client.put('/items/1', json={'description': 'Revoked elsewhere'})
+    assert auth_client.get('/stats/denylist').get_json().get('data').get('filter_entries') == 1
+
+
+def test_revoke_token_commands(auth_client):
+    app = auth_client.application
+    runner = app.test_cli_runner()
+    jti = get_jti(auth_client)
+
+    result = runner.invoke(args=['revoke-token', jti])
+    assert 'Revoked token {}.'.format(jti) in result.output
+    result = runner.invoke(args=['revoke-token', jti])
+    assert 'Token {} is already revoked.'.format(jti) in result.output
+    response = auth_client.put('/items/1', json={'description': 'Revoked'})
+    assert response.status_code == StatusCodeEnum.UNAUTHORIZED
+
+    with app.app_context():
+        RevokedTokenModel(jti='expired', expires=datetime.utcnow() - timedelta(minutes=1)).save()
+    result = runner.invoke(args=['purge-revoked-tokens'])
+    assert 'Purged 1 expired tokens.' in result.output
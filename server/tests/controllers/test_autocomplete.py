@@ -0,0 +1,46 @@
+from main.errors import StatusCodeEnum, ErrorCodeEnum
+from tests.helpers import count_queries, assert_status_error_code
+
+
+def get_completions(client, query):
+    response = client.get('/autocomplete' + query)
+    assert response.status_code == StatusCodeEnum.OK
+    return [completion.get('title') for completion in response.get_json().get('data')]
+
+
+def test_autocomplete_no_exceptions(auth_client):
+    # The index is loaded on first use, then queries don't touch the database
+    assert get_completions(auth_client, '?prefix=mine') == ['Minecraft Dirt Block', 'Minecraft Sword']
+    assert get_completions(auth_client, '?prefix=sea&type=category') == ['Seafood']
+    with count_queries() as statements:
+        assert get_completions(auth_client, '?prefix=MINECRAFT S') == ['Minecraft Sword']
+        assert get_completions(auth_client, '?prefix=minecraft&limit=1') == ['Minecraft Dirt Block']
+        assert get_completions(auth_client, '?prefix=m&type=category') == ['Minecraft']
+        assert get_completions(auth_client, '?prefix=zzz') == []
+    assert not statements
+
+    # Writes update the index
+    auth_client.post('/items', json={'title': 'Minecraft Bow', 'description': 'Shooty', 'category_id': 1})
+    auth_client.put('/items/1', json={'title': 'Diamond Sword'})
+    auth_client.delete('/items/2')
+    auth_client.post('/items/bulk', json={'items': [{'title': 'Minecraft Axe', 'description': 'Choppy',
+                                                     'category_id': 1}]})
+    assert get_completions(auth_client, '?prefix=minecraft') == ['Minecraft Axe', 'Minecraft Bow']
+    assert get_completions(auth_client, '?prefix=d') == ['Diamond Sword']
+
+    auth_client.put('/categories/1', json={'title': 'Mojang'})
+    assert get_completions(auth_client, '?prefix=m&type=category') == ['Mojang']
+
+    auth_client.delete('/categories/1')
+    assert get_completions(auth_client, '?prefix=m&type=category') == []
+    assert get_completions(auth_client, '?prefix=minecraft') == []
+
+
+def test_autocomplete_exceptions(auth_client):
+    for query in ['', '?prefix=', '?prefix=a&type=user', '?prefix=a&limit=0']:
+        response = auth_client.get('/autocomplete' + query)
+        json_data = response.get_json()
+
+        assert_status_error_code(test_status_code=response.status_code, test_error_code=json_data.get('error_code'),
+                                 goal_status_code=StatusCodeEnum.BAD_REQUEST,
+                                 goal_error_code=ErrorCodeEnum.VALIDATION_ERROR)
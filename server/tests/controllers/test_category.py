@@ -1,6 +1,6 @@
 from main.errors import StatusCodeEnum, ErrorCodeEnum
 from tests.helpers import assert_status_error_code, assert_pagination_response, \
-    get_items_by_category_id, get_category_by_id
+    get_items_by_category_id, get_category_by_id, count_queries
 
 
 ###############
@@ -45,6 +45,81 @@ def test_get_categories_exceptions(auth_client):
                              goal_error_code=ErrorCodeEnum.VALIDATION_ERROR)
 
 
+def test_get_categories_sparse_fields(auth_client):
+    with count_queries() as statements:
+        response = auth_client.get('/categories?fields=title&total=none')
+
+    assert response.status_code == StatusCodeEnum.OK
+    assert all(sorted(category) == ['id', 'title'] for category in response.get_json().get('data'))
+    assert not any('description' in statement for statement in statements)
+
+    response = auth_client.get('/categories/1?fields=item_count')
+
+    assert response.status_code == StatusCodeEnum.OK
+    assert sorted(response.get_json().get('data')) == ['id', 'item_count']
+
+    for url in ('/categories?fields=items', '/categories/1?fields='):
+        response = auth_client.get(url)
+        json_data = response.get_json()
+
+        assert_status_error_code(test_status_code=response.status_code, test_error_code=json_data.get('error_code'),
+                                 goal_status_code=StatusCodeEnum.BAD_REQUEST,
+                                 goal_error_code=ErrorCodeEnum.VALIDATION_ERROR)
+
+
+def test_get_categories_cursor_no_exceptions(auth_client):
+    response = auth_client.get('/categories?limit=1')
+    json_data = response.get_json()
+    next_cursor = json_data.get('next_cursor')
+
+    assert response.status_code == StatusCodeEnum.OK
+    assert [category.get('id') for category in json_data.get('data')] == [1]
+    assert next_cursor
+
+    response = auth_client.get('/categories?limit=1&after=' + next_cursor)
+    json_data = response.get_json()
+
+    assert response.status_code == StatusCodeEnum.OK
+    assert [category.get('id') for category in json_data.get('data')] == [2]
+    assert json_data.get('next_cursor') is None
+
+
+def test_get_categories_item_count(auth_client):
+    def get_item_counts():
+        data = auth_client.get('/categories').get_json().get('data')
+        return {category.get('id'): category.get('item_count') for category in data}
+
+    assert get_item_counts() == {1: 3, 2: 0}
+
+    # Create
+    item_id = auth_client.post('/items', json={
+        'title': 'Pickaxe', 'description': 'Diggy', 'category_id': 1
+    }).get_json().get('data').get('id')
+    assert get_item_counts() == {1: 4, 2: 0}
+
+    # Move
+    auth_client.put('/items/' + str(item_id), json={'category_id': 2})
+    assert get_item_counts() == {1: 3, 2: 1}
+
+    # Delete
+    auth_client.delete('/items/' + str(item_id))
+    assert get_item_counts() == {1: 3, 2: 0}
+
+
+def test_reconcile_item_counts_command(auth_client):
+    app = auth_client.application
+    with app.app_context():
+        category = get_category_by_id(1)
+        category.item_count = 42
+        category.save()
+
+    result = app.test_cli_runner().invoke(args=['reconcile-item-counts'])
+
+    assert 'Repaired the item count of 1 categories.' in result.output
+    with app.app_context():
+        assert get_category_by_id(1).item_count == 3
+
+
 ###############
 ### GET ONE ###
 ###############
@@ -71,6 +146,28 @@ def test_get_category_exceptions(auth_client):
                              goal_error_code=ErrorCodeEnum.NORMAL_NOT_FOUND)
 
 
+def test_get_category_conditional(auth_client):
+    response = auth_client.get('/categories/1')
+    etag = response.headers.get('ETag')
+
+    response = auth_client.get('/categories/1', headers={'If-None-Match': etag})
+
+    assert response.status_code == StatusCodeEnum.NOT_MODIFIED
+    assert not response.data
+
+    # Adding an item changes the category's item_count, so its representation
+    auth_client.post('/items', json={'title': 'Pickaxe', 'description': 'Diggy', 'category_id': 1})
+    response = auth_client.get('/categories/1', headers={'If-None-Match': etag})
+
+    assert response.status_code == StatusCodeEnum.OK
+    assert response.get_json().get('data').get('item_count') == 4
+
+    response = auth_client.get('/categories')
+    response = auth_client.get('/categories', headers={'If-None-Match': response.headers.get('ETag')})
+
+    assert response.status_code == StatusCodeEnum.NOT_MODIFIED
+
+
 ##############
 ### CREATE ###
 ##############
@@ -292,12 +389,23 @@ def test_update_category_exceptions(auth_client):
 ### DELETE ###
 ##############
 def test_delete_category_no_exceptions(auth_client):
+    # Items are deleted by chunks
+    auth_client.application.config['BULK_WRITE_CHUNK_SIZE'] = 2
     category_id = 1
     response = auth_client.delete('/categories/' + str(category_id))
+    data = response.get_json().get('data')
 
+    assert response.status_code == StatusCodeEnum.ACCEPTED
+    assert response.headers['Location'].endswith('/jobs/' + str(data.get('id')))
+
+    # Jobs run in the request when testing
+    response = auth_client.get(response.headers['Location'])
+    data = response.get_json().get('data')
     items = get_items_by_category_id(category_id)
 
-    assert response.status_code == StatusCodeEnum.NO_CONTENT
+    assert data.get('type') == 'delete_category'
+    assert data.get('status') == 'succeeded'
+    assert data.get('progress') == data.get('total') == 3
     assert len(items) == 0
     assert get_category_by_id(category_id) is None
 
@@ -1,6 +1,21 @@
+import json
+import threading
+from datetime import datetime, timedelta
+
+from werkzeug.http import http_date
+
+from main.db import db
 from main.errors import StatusCodeEnum, ErrorCodeEnum
+from main.models.item import ItemModel
+from main.models.item_term import ItemTermModel
+from main.schemas.custom_fields import Cursor
 from tests.helpers import assert_pagination_response, assert_status_error_code, \
-    assert_item_create_update_no_exceptions, get_item_by_id
+    assert_item_create_update_no_exceptions, get_item_by_id, create_items, count_queries, \
+    get_category_by_id
+
+
+def encode_cursor(key_values):
+    return Cursor()._serialize(key_values, None, None)
 
 
 ###############
@@ -45,6 +60,282 @@ def test_get_items_exceptions(auth_client):
                              goal_error_code=ErrorCodeEnum.VALIDATION_ERROR)
 
 
+def test_get_items_total_modes(auth_client):
+    # per_page=1 so the total can't be deduced from a short page
+    for total in ('exact', 'cached', 'approx'):
+        response = auth_client.get('/items?per_page=1&total=' + total)
+
+        assert response.status_code == StatusCodeEnum.OK
+        assert response.get_json().get('total_items') == 3
+
+    response = auth_client.get('/items?per_page=1&total=none')
+
+    assert response.status_code == StatusCodeEnum.OK
+    assert response.get_json().get('total_items') is None
+
+    # Cached counts are dropped when an item is created
+    auth_client.post('/items', json={'title': 'Pickaxe', 'description': 'Diggy', 'category_id': 1})
+    response = auth_client.get('/items?per_page=1&total=cached')
+
+    assert response.get_json().get('total_items') == 4
+
+    response = auth_client.get('/items?total=all')
+    json_data = response.get_json()
+
+    assert_status_error_code(test_status_code=response.status_code, test_error_code=json_data.get('error_code'),
+                             goal_status_code=StatusCodeEnum.BAD_REQUEST,
+                             goal_error_code=ErrorCodeEnum.VALIDATION_ERROR)
+
+
+def test_get_items_query_count(auth_client):
+    with auth_client.application.app_context():
+        create_items([{'title': 'Block ' + str(i), 'description': 'Blocky', 'category_id': 1 + i % 2, 'creator_id': 1}
+                      for i in range(30)])
+
+    # Nested categories are loaded with the items, so the page size doesn't change the number of queries
+    query_counts = []
+    for per_page in (1, 10, 30):
+        with count_queries() as statements:
+            response = auth_client.get('/items?total=exact&per_page=' + str(per_page))
+
+        assert response.status_code == StatusCodeEnum.OK
+        assert all(item.get('category') for item in response.get_json().get('data'))
+        query_counts.append(len(statements))
+
+    assert len(set(query_counts)) == 1
+
+
+def test_get_items_sparse_fields(auth_client):
+    with count_queries() as statements:
+        response = auth_client.get('/items?fields=title&per_page=2&total=none')
+
+    assert response.status_code == StatusCodeEnum.OK
+    assert [sorted(item) for item in response.get_json().get('data')] == [['id', 'title'], ['id', 'title']]
+    # Neither the category join nor the unselected columns are queried
+    assert not any('categories' in statement or 'description' in statement for statement in statements)
+
+    response = auth_client.get('/items?fields=category,title&limit=1')
+    item = response.get_json().get('data')[0]
+
+    assert sorted(item) == ['category', 'id', 'title']
+    assert item.get('category').get('title')
+
+    # The ETag of a sparse page isn't the one of the full page
+    etag = auth_client.get('/items?fields=title').headers['ETag']
+    response = auth_client.get('/items', headers={'If-None-Match': etag})
+
+    assert response.status_code == StatusCodeEnum.OK
+    assert 'description' in response.get_json().get('data')[0]
+
+
+def test_get_items_sparse_fields_exceptions(auth_client):
+    for fields in ('secret', 'title,category_id', ','):
+        response = auth_client.get('/items?fields=' + fields)
+        json_data = response.get_json()
+
+        assert_status_error_code(test_status_code=response.status_code, test_error_code=json_data.get('error_code'),
+                                 goal_status_code=StatusCodeEnum.BAD_REQUEST,
+                                 goal_error_code=ErrorCodeEnum.VALIDATION_ERROR)
+
+
+def test_get_items_cursor_no_exceptions(auth_client):
+    # Walk all items 2 by 2 following next_cursor
+    response = auth_client.get('/items?limit=2')
+    json_data = response.get_json()
+    first_page = json_data.get('data')
+    next_cursor = json_data.get('next_cursor')
+
+    assert response.status_code == StatusCodeEnum.OK
+    assert [item.get('id') for item in first_page] == [1, 2]
+    assert json_data.get('per_page') == 2
+    assert 'page' not in json_data and 'total_items' not in json_data
+    assert next_cursor
+
+    response = auth_client.get('/items?limit=2&after=' + next_cursor)
+    json_data = response.get_json()
+
+    assert response.status_code == StatusCodeEnum.OK
+    assert [item.get('id') for item in json_data.get('data')] == [3]
+    assert json_data.get('next_cursor') is None
+
+    # Walk items of a category
+    response = auth_client.get('/items?limit=1&category_id=1')
+    next_cursor = response.get_json().get('next_cursor')
+    response = auth_client.get('/items?limit=1&category_id=1&after=' + next_cursor)
+
+    assert response.status_code == StatusCodeEnum.OK
+    assert [item.get('id') for item in response.get_json().get('data')] == [2]
+
+
+def test_get_items_cursor_exceptions(auth_client):
+    # Garbage cursor
+    response = auth_client.get('/items?after=garbage')
+    json_data = response.get_json()
+
+    assert_status_error_code(test_status_code=response.status_code, test_error_code=json_data.get('error_code'),
+                             goal_status_code=StatusCodeEnum.BAD_REQUEST,
+                             goal_error_code=ErrorCodeEnum.VALIDATION_ERROR)
+
+    # Cursors whose values aren't scalars
+    for key_values in ([[1, 2]], [None], [{'a': 1}], [{'a': 1}, 2], [True]):
+        for url in ('/items?after=', '/items/search?q=minecraft&after='):
+            response = auth_client.get(url + encode_cursor(key_values))
+            json_data = response.get_json()
+
+            assert_status_error_code(test_status_code=response.status_code,
+                                     test_error_code=json_data.get('error_code'),
+                                     goal_status_code=StatusCodeEnum.BAD_REQUEST,
+                                     goal_error_code=ErrorCodeEnum.VALIDATION_ERROR)
+
+    # Cursors whose values don't have the type of the keys
+    for url in ('/items?after=' + encode_cursor(['1']), '/items?category_id=1&after=' + encode_cursor([1, 'a']),
+                '/items/search?q=minecraft&after=' + encode_cursor([1.5, 'a'])):
+        response = auth_client.get(url)
+        json_data = response.get_json()
+
+        assert_status_error_code(test_status_code=response.status_code, test_error_code=json_data.get('error_code'),
+                                 goal_status_code=StatusCodeEnum.BAD_REQUEST,
+                                 goal_error_code=ErrorCodeEnum.BAD_REQUEST)
+
+    # Cursor of a category-filtered request used without category_id
+    response = auth_client.get('/items?limit=1&category_id=1')
+    next_cursor = response.get_json().get('next_cursor')
+    response = auth_client.get('/items?after=' + next_cursor)
+    json_data = response.get_json()
+
+    assert_status_error_code(test_status_code=response.status_code, test_error_code=json_data.get('error_code'),
+                             goal_status_code=StatusCodeEnum.BAD_REQUEST,
+                             goal_error_code=ErrorCodeEnum.BAD_REQUEST)
+
+    # Page size is over the limit
+    for query in ('limit=1000', 'per_page=1000'):
+        response = auth_client.get('/items?' + query)
+        json_data = response.get_json()
+
+        assert_status_error_code(test_status_code=response.status_code, test_error_code=json_data.get('error_code'),
+                                 goal_status_code=StatusCodeEnum.BAD_REQUEST,
+                                 goal_error_code=ErrorCodeEnum.VALIDATION_ERROR)
+
+
+def test_search_items_no_exceptions(auth_client):
+    # 'minecraft' is once in the title of 2 items, ties are ordered by id
+    response = auth_client.get('/items/search?q=MINECRAFT&limit=1')
+    json_data = response.get_json()
+
+    assert response.status_code == StatusCodeEnum.OK
+    assert [item.get('title') for item in json_data.get('data')] == ['Minecraft Sword']
+    assert json_data.get('data')[0].get('category').get('id') == 1
+
+    response = auth_client.get('/items/search?q=minecraft&limit=1&after=' + json_data.get('next_cursor'))
+    json_data = response.get_json()
+
+    assert [item.get('title') for item in json_data.get('data')] == ['Minecraft Dirt Block']
+    assert json_data.get('next_cursor') is None
+
+    # Every word must match, words of the title rank higher than words of the description
+    auth_client.post('/items', json={'title': 'Dull Crab', 'description': 'A minecraft crab', 'category_id': 1})
+    response = auth_client.get('/items/search?q=crab')
+    assert [item.get('title') for item in response.get_json().get('data')] == ['Dull Crab', 'Crab']
+    response = auth_client.get('/items/search?q=minecraft dull')
+    assert [item.get('title') for item in response.get_json().get('data')] == ['Minecraft Dirt Block', 'Dull Crab']
+
+    # The index follows updates and deletes
+    auth_client.put('/items/1', json={'description': 'Made of diamond'})
+    assert len(auth_client.get('/items/search?q=diamond').get_json().get('data')) == 1
+    auth_client.delete('/items/1')
+    assert auth_client.get('/items/search?q=diamond').get_json().get('data') == []
+    auth_client.delete('/categories/1')
+    assert auth_client.get('/items/search?q=crab').get_json().get('data') == []
+
+    response = auth_client.get('/items/search?q=...')
+    assert response.status_code == StatusCodeEnum.OK
+    assert response.get_json().get('data') == []
+
+
+def test_search_items_candidate_limit(auth_client):
+    auth_client.post('/items', json={'title': 'Dull Crab', 'description': 'A minecraft crab', 'category_id': 1})
+    auth_client.application.config['SEARCH_CANDIDATE_LIMIT'] = 1
+
+    # Only the heaviest posting of the rarest term is ranked
+    response = auth_client.get('/items/search?q=minecraft')
+    assert [item.get('title') for item in response.get_json().get('data')] == ['Minecraft Dirt Block']
+    response = auth_client.get('/items/search?q=minecraft crab')
+    assert [item.get('title') for item in response.get_json().get('data')] == ['Dull Crab']
+
+
+def test_search_items_exceptions(auth_client):
+    for query in ['', '?q=', '?q=crab&limit=0', '?q=crab&after=abc']:
+        response = auth_client.get('/items/search' + query)
+        json_data = response.get_json()
+
+        assert_status_error_code(test_status_code=response.status_code, test_error_code=json_data.get('error_code'),
+                                 goal_status_code=StatusCodeEnum.BAD_REQUEST,
+                                 goal_error_code=ErrorCodeEnum.VALIDATION_ERROR)
+
+
+def test_rebuild_search_index_command(auth_client):
+    app = auth_client.application
+    with app.app_context():
+        ItemTermModel.query.delete()
+        db.session.commit()
+
+    result = app.test_cli_runner().invoke(args=['rebuild-search-index', '--chunk-size', '2'])
+
+    assert 'Indexed 3 items.' in result.output
+    assert len(auth_client.get('/items/search?q=minecraft').get_json().get('data')) == 2
+
+
+def test_rebuild_search_index_with_concurrent_create(auth_client, monkeypatch):
+    index_items = ItemTermModel.index_items.__func__
+
+    def index_items_and_create(cls, rows, chunk_size=500):
+        # An item is created and indexes itself through the write path after the rebuild started, before its chunk
+        if not ItemModel.query.filter_by(title='Minecraft Bow').count():
+            item = ItemModel(title='Minecraft Bow', description='Shoots arrows', category_id=1, creator_id=1)
+            db.session.add(item)
+            db.session.flush()
+            index_items(cls, [(item.id, item.title, item.description)])
+        index_items(cls, rows, chunk_size)
+
+    with auth_client.application.app_context():
+        # Postings of an item which doesn't exist anymore
+        db.session.execute(ItemTermModel.__table__.insert().values(term='ghost', item_id=100, weight=1))
+        db.session.commit()
+        monkeypatch.setattr(ItemTermModel, 'index_items', classmethod(index_items_and_create))
+
+        assert ItemTermModel.rebuild(chunk_size=1) == 4
+        assert ItemTermModel.query.filter_by(term='ghost').count() == 0
+
+    assert len(auth_client.get('/items/search?q=minecraft').get_json().get('data')) == 3
+
+
+def test_export_items_no_exceptions(auth_client):
+    auth_client.application.config['EXPORT_BATCH_SIZE'] = 2
+
+    response = auth_client.get('/items/export')
+    lines = response.get_data(as_text=True).splitlines()
+
+    assert response.status_code == StatusCodeEnum.OK
+    assert response.mimetype == 'application/x-ndjson'
+    assert [json.loads(line).get('title') for line in lines] == ['Minecraft Sword', 'Minecraft Dirt Block', 'Crab']
+
+    response = auth_client.get('/items/export?format=csv&category_id=2')
+    lines = response.get_data(as_text=True).splitlines()
+
+    assert response.status_code == StatusCodeEnum.OK
+    assert response.mimetype == 'text/csv'
+    assert lines == ['id,title,description,category_id,creator_id,created,updated']
+
+
+def test_export_items_exceptions(auth_client):
+    response = auth_client.get('/items/export?format=xml')
+    json_data = response.get_json()
+
+    assert_status_error_code(test_status_code=response.status_code, test_error_code=json_data.get('error_code'),
+                             goal_status_code=StatusCodeEnum.BAD_REQUEST,
+                             goal_error_code=ErrorCodeEnum.VALIDATION_ERROR)
+
+
 ###############
 ### GET ONE ###
 ###############
@@ -60,6 +351,17 @@ def test_get_item_no_exceptions(auth_client):
     assert data.get('id') == item_id
 
 
+def test_get_item_sparse_fields(auth_client):
+    response = auth_client.get('/items/1?fields=description')
+
+    assert response.status_code == StatusCodeEnum.OK
+    assert sorted(response.get_json().get('data')) == ['description', 'id']
+
+    response = auth_client.get('/items/1?fields=nothing')
+
+    assert response.status_code == StatusCodeEnum.BAD_REQUEST
+
+
 def test_get_item_exceptions(auth_client):
     # Get a item with an invalid id
     item_id = 100
@@ -71,6 +373,96 @@ def test_get_item_exceptions(auth_client):
                              goal_error_code=ErrorCodeEnum.NORMAL_NOT_FOUND)
 
 
+def test_get_item_conditional(auth_client):
+    # Without the nested category, whose title changes have no timestamp, the item also has a Last-Modified
+    response = auth_client.get('/items/1?fields=title,description')
+    etag = response.headers.get('ETag')
+    last_modified = response.headers.get('Last-Modified')
+
+    assert response.status_code == StatusCodeEnum.OK
+    assert etag and last_modified
+    assert auth_client.get('/items/1').headers.get('Last-Modified') is None
+
+    # Client's copy is current
+    for headers in ({'If-None-Match': etag}, {'If-Modified-Since': last_modified}):
+        response = auth_client.get('/items/1?fields=title,description', headers=headers)
+
+        assert response.status_code == StatusCodeEnum.NOT_MODIFIED
+        assert not response.data
+        assert response.headers.get('ETag') == etag
+
+    # Client's copy is stale
+    auth_client.put('/items/1', json={'description': 'Sharper'})
+    response = auth_client.get('/items/1?fields=title,description', headers={'If-None-Match': etag})
+
+    assert response.status_code == StatusCodeEnum.OK
+    assert response.headers.get('ETag') != etag
+    assert response.get_json().get('data').get('description') == 'Sharper'
+
+
+def test_get_item_conditional_nested_category(auth_client):
+    etag = auth_client.get('/items/1').headers.get('ETag')
+    page_etag = auth_client.get('/items?category_id=1').headers.get('ETag')
+
+    # A write of a sibling item moves the item counter of the category, not the item nor the category it shows
+    auth_client.put('/items/2', json={'description': 'Less dull'})
+    response = auth_client.get('/items/1', headers={'If-None-Match': etag})
+
+    assert response.status_code == StatusCodeEnum.NOT_MODIFIED
+    assert response.headers.get('ETag') == etag
+
+    auth_client.post('/items', json={'title': 'Minecraft Bow', 'description': 'Shoots arrows', 'category_id': 1})
+    assert auth_client.get('/items/1', headers={'If-None-Match': etag}).status_code == StatusCodeEnum.NOT_MODIFIED
+    # The page has a new item, it changes
+    assert auth_client.get('/items?category_id=1', headers={'If-None-Match': page_etag}).status_code == \
+        StatusCodeEnum.OK
+
+    # The title of the category is nested in the item
+    auth_client.put('/categories/1', json={'title': 'Weapons'})
+    response = auth_client.get('/items/1', headers={'If-None-Match': etag})
+
+    assert response.status_code == StatusCodeEnum.OK
+    assert response.get_json().get('data').get('category').get('title') == 'Weapons'
+
+
+def test_get_items_conditional(auth_client):
+    for url in ('/items?per_page=2', '/items?limit=2', '/items?category_id=1'):
+        response = auth_client.get(url)
+        etag = response.headers.get('ETag')
+
+        assert response.status_code == StatusCodeEnum.OK
+        assert etag
+
+        # Not modified pages are answered from the ids/timestamps query only
+        with count_queries() as statements:
+            response = auth_client.get(url, headers={'If-None-Match': etag})
+
+        assert response.status_code == StatusCodeEnum.NOT_MODIFIED
+        assert len(statements) == 1
+
+    # Modified page
+    response = auth_client.get('/items?per_page=2')
+    etag = response.headers.get('ETag')
+    auth_client.put('/items/2', json={'description': 'Less dull'})
+    response = auth_client.get('/items?per_page=2', headers={'If-None-Match': etag})
+
+    assert response.status_code == StatusCodeEnum.OK
+    assert response.get_json().get('data')[1].get('description') == 'Less dull'
+
+
+def test_get_items_conditional_after_delete(auth_client):
+    url = '/items?fields=id,title'
+    response = auth_client.get(url)
+
+    # The latest `updated` of a page doesn't change when one of its rows is deleted, only the ETag validates pages
+    assert response.headers.get('Last-Modified') is None
+    auth_client.delete('/items/1')
+    response = auth_client.get(url, headers={'If-Modified-Since': http_date(datetime.utcnow() + timedelta(days=1))})
+
+    assert response.status_code == StatusCodeEnum.OK
+    assert 1 not in [item.get('id') for item in response.get_json().get('data')]
+
+
 ##############
 ### CREATE ###
 ##############
@@ -185,6 +577,151 @@ def test_create_item_exceptions(auth_client):
                              goal_error_code=ErrorCodeEnum.VALIDATION_ERROR)
 
 
+def test_create_item_concurrent_duplicates(auth_client):
+    # Every request races for the same title, the unique constraint lets exactly one of them win
+    app = auth_client.application
+    headers = {'Authorization': auth_client.environ_base['HTTP_AUTHORIZATION']}
+    item = {'title': 'Contended Item', 'description': 'Raced', 'category_id': 1}
+    barrier = threading.Barrier(8)
+    responses = []
+
+    def create(path, body):
+        client = app.test_client()
+        barrier.wait()
+        responses.append(client.post(path, json=body, headers=headers))
+
+    threads = [threading.Thread(target=create, args=('/items', item)) for _ in range(4)] + \
+              [threading.Thread(target=create, args=('/items/bulk', {'items': [item]})) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(response.status_code for response in responses) == [StatusCodeEnum.OK] + \
+        [StatusCodeEnum.BAD_REQUEST] * 7
+    for response in responses:
+        if response.status_code == StatusCodeEnum.BAD_REQUEST:
+            assert response.get_json().get('error_code') in (ErrorCodeEnum.DUPLICATED_ENTITY, ErrorCodeEnum.BAD_REQUEST)
+    with app.app_context():
+        assert get_category_by_id(1).item_count == 4
+
+
+def test_create_items_bulk_no_exceptions(auth_client):
+    items = [{'title': 'Block ' + str(i), 'description': 'Blocky', 'category_id': 1 + i % 2} for i in range(1200)]
+    response = auth_client.post('/items/bulk', json={'items': items})
+    data = response.get_json().get('data')
+
+    assert response.status_code == StatusCodeEnum.OK
+    assert len(data) == 1200
+    assert all(result.get('status') == 'created' for result in data)
+    assert get_item_by_id(data[42].get('id')).title == 'Block 42'
+    assert get_category_by_id(1).item_count == 3 + 600
+
+    # Partial success
+    response = auth_client.post('/items/bulk', json={'atomic': False, 'items': [
+        {'title': 'Pickaxe', 'description': 'Diggy', 'category_id': 1},
+        {'title': 'Crab', 'description': 'Crabby...', 'category_id': 1},
+        {'title': 'Cra', 'description': 'Crabby...', 'category_id': 1},
+        {'title': 'Lobster', 'description': 'Clawy', 'category_id': 100},
+        {'title': 'Pickaxe', 'description': 'Diggy again', 'category_id': 1},
+    ]})
+    data = response.get_json().get('data')
+
+    assert response.status_code == StatusCodeEnum.OK
+    assert [result.get('status') for result in data] == ['created', 'failed', 'failed', 'failed', 'failed']
+    assert [result.get('error_code') for result in data[1:]] == [
+        ErrorCodeEnum.DUPLICATED_ENTITY, ErrorCodeEnum.VALIDATION_ERROR, ErrorCodeEnum.NORMAL_NOT_FOUND,
+        ErrorCodeEnum.DUPLICATED_ENTITY]
+
+
+def test_create_items_bulk_exceptions(auth_client):
+    # Atomic: nothing is created if an item fails
+    response = auth_client.post('/items/bulk', json={'items': [
+        {'title': 'Pickaxe', 'description': 'Diggy', 'category_id': 1},
+        {'title': 'Crab', 'description': 'Crabby...', 'category_id': 1},
+    ]})
+    json_data = response.get_json()
+
+    assert_status_error_code(test_status_code=response.status_code, test_error_code=json_data.get('error_code'),
+                             goal_status_code=StatusCodeEnum.BAD_REQUEST,
+                             goal_error_code=ErrorCodeEnum.BAD_REQUEST)
+    assert [result.get('index') for result in json_data.get('error_message')] == [1]
+    assert get_category_by_id(1).item_count == 3
+
+    # Empty list
+    response = auth_client.post('/items/bulk', json={'items': []})
+    json_data = response.get_json()
+
+    assert_status_error_code(test_status_code=response.status_code, test_error_code=json_data.get('error_code'),
+                             goal_status_code=StatusCodeEnum.BAD_REQUEST,
+                             goal_error_code=ErrorCodeEnum.VALIDATION_ERROR)
+
+    # Not login
+    response = auth_client.post('/items/bulk', json={'items': [{}]}, headers={'Authorization': ''})
+
+    assert response.status_code == StatusCodeEnum.UNAUTHORIZED
+
+
+def test_import_items_no_exceptions(auth_client):
+    lines = [
+        json.dumps({'title': 'Imported 1', 'description': 'Imported', 'category_id': 1}),
+        json.dumps({'title': 'Crab', 'description': 'Duplicated', 'category_id': 1}),
+        '',
+        '{"title": "Broken"',
+        json.dumps({'title': 'Imported 2', 'description': 'Imported', 'category_id': 100}),
+        json.dumps({'title': 'Imported 3', 'description': 'Imported', 'category_id': 2}),
+        json.dumps({'title': 'Imported 1', 'description': 'Duplicated in the body', 'category_id': 2}),
+    ]
+    response = auth_client.post('/items/import?chunk_size=2', data='\n'.join(lines))
+    data = response.get_json().get('data')
+
+    assert response.status_code == StatusCodeEnum.OK
+    assert data.get('inserted') == 2
+    assert data.get('skipped_duplicate') == [2, 7]
+    assert data.get('invalid_count') == 2
+    assert [(invalid.get('line'), invalid.get('error_code')) for invalid in data.get('invalid')] == [
+        (4, ErrorCodeEnum.VALIDATION_ERROR), (5, ErrorCodeEnum.NORMAL_NOT_FOUND)]
+    assert auth_client.get('/items').get_json().get('total_items') == 5
+    assert get_category_by_id(2).item_count == 1
+
+    body = 'title,description,category_id\nImported 4,Imported,2\nImported 5,Imported\nImported 6,Imported,2,extra\n'
+    response = auth_client.post('/items/import?format=csv', data=body)
+    data = response.get_json().get('data')
+
+    assert response.status_code == StatusCodeEnum.OK
+    assert data.get('inserted') == 1
+    assert [invalid.get('line') for invalid in data.get('invalid')] == [3, 4]
+
+
+def test_import_items_report_limit(auth_client):
+    auth_client.application.config['IMPORT_REPORT_LIMIT'] = 3
+    # Invalid rows of the chunks are found after the broken lines which follow them
+    lines = ['{"title": "Broken"' if i % 2 else json.dumps({'title': 'Crab', 'description': 'Duplicated'})
+             for i in range(20)]
+    lines += [json.dumps({'title': 'Crab', 'description': 'Duplicated', 'category_id': 1})] * 5
+    response = auth_client.post('/items/import?chunk_size=4', data='\n'.join(lines))
+    data = response.get_json().get('data')
+
+    assert response.status_code == StatusCodeEnum.OK
+    assert data.get('invalid_count') == 20
+    assert [invalid.get('line') for invalid in data.get('invalid')] == [1, 2, 3]
+    assert data.get('skipped_duplicate_count') == 5
+    assert data.get('skipped_duplicate') == [21, 22, 23]
+
+
+def test_import_items_exceptions(auth_client):
+    response = auth_client.post('/items/import?chunk_size=0', data='')
+    json_data = response.get_json()
+
+    assert_status_error_code(test_status_code=response.status_code, test_error_code=json_data.get('error_code'),
+                             goal_status_code=StatusCodeEnum.BAD_REQUEST,
+                             goal_error_code=ErrorCodeEnum.VALIDATION_ERROR)
+
+    response = auth_client.post('/items/import', data='', headers={'Authorization': ''})
+
+    assert response.status_code == StatusCodeEnum.UNAUTHORIZED
+
+
 ##############
 ### UPDATE ###
 ##############
@@ -251,7 +788,7 @@ def test_update_item_no_exceptions(auth_client):
 def test_update_item_exceptions(auth_client):
     # Duplicate
     item_id = 1
-    title = 'Minecraft Sword'
+    title = 'Minecraft Dirt Block'
 
     response = auth_client.put('/items/' + str(item_id), json={
         'title': title
@@ -330,6 +867,64 @@ def test_update_item_exceptions(auth_client):
                              goal_error_code=ErrorCodeEnum.VALIDATION_ERROR)
 
 
+def test_update_items_bulk_no_exceptions(auth_client):
+    # Items 1, 2 belong to the client, 3 to the other user
+    response = auth_client.patch('/items/bulk', json={'ids': [1, 2, 3], 'changes': {'category_id': 2}})
+
+    assert response.status_code == StatusCodeEnum.OK
+    assert response.get_json().get('data').get('affected_rows') == 2
+    assert get_item_by_id(1).category_id == 2
+    assert get_item_by_id(3).category_id == 1
+    assert get_category_by_id(1).item_count == 1
+    assert get_category_by_id(2).item_count == 2
+
+    response = auth_client.patch('/items/bulk', json={'category_id': 2, 'changes': {'description': 'Moved'}})
+
+    assert response.get_json().get('data').get('affected_rows') == 2
+    assert auth_client.get('/items/2').get_json().get('data').get('description') == 'Moved'
+
+
+def test_update_items_bulk_exceptions(auth_client):
+    # Selection by both ids and category_id
+    response = auth_client.patch('/items/bulk', json={'ids': [1], 'category_id': 1, 'changes': {'category_id': 2}})
+    json_data = response.get_json()
+
+    assert_status_error_code(test_status_code=response.status_code, test_error_code=json_data.get('error_code'),
+                             goal_status_code=StatusCodeEnum.BAD_REQUEST,
+                             goal_error_code=ErrorCodeEnum.VALIDATION_ERROR)
+
+    # Titles can't be bulk updated
+    response = auth_client.patch('/items/bulk', json={'ids': [1], 'changes': {'title': 'Same title'}})
+    json_data = response.get_json()
+
+    assert_status_error_code(test_status_code=response.status_code, test_error_code=json_data.get('error_code'),
+                             goal_status_code=StatusCodeEnum.BAD_REQUEST,
+                             goal_error_code=ErrorCodeEnum.VALIDATION_ERROR)
+
+    # Not existed category
+    response = auth_client.patch('/items/bulk', json={'ids': [1], 'changes': {'category_id': 100}})
+    json_data = response.get_json()
+
+    assert_status_error_code(test_status_code=response.status_code, test_error_code=json_data.get('error_code'),
+                             goal_status_code=StatusCodeEnum.NOT_FOUND,
+                             goal_error_code=ErrorCodeEnum.NORMAL_NOT_FOUND)
+
+
+def test_delete_items_bulk_no_exceptions(auth_client):
+    auth_client.application.config['BULK_WRITE_CHUNK_SIZE'] = 1
+    response = auth_client.delete('/items/bulk', json={'category_id': 1})
+
+    assert response.status_code == StatusCodeEnum.OK
+    assert response.get_json().get('data').get('affected_rows') == 2
+    assert get_item_by_id(1) is None and get_item_by_id(2) is None
+    assert get_item_by_id(3) is not None
+    assert get_category_by_id(1).item_count == 1
+
+    response = auth_client.delete('/items/bulk', json={'ids': [3]})
+
+    assert response.get_json().get('data').get('affected_rows') == 0
+
+
 ##############
 ### DELETE ###
 ##############
@@ -361,3 +956,26 @@ def test_delete_item_exceptions(auth_client):
     assert_status_error_code(test_status_code=response.status_code, test_error_code=json_data.get('error_code'),
                              goal_status_code=StatusCodeEnum.FORBIDDEN,
                              goal_error_code=ErrorCodeEnum.NORMAL_FORBIDDEN)
+
+
+def test_write_paths_ignore_stale_cache(auth_client):
+    # Cache the rows, then change them behind the cache as another worker would
+    auth_client.get('/items/1')
+    auth_client.get('/categories/2')
+    with auth_client.application.app_context():
+        db.session.execute('DELETE FROM item_terms WHERE item_id = 1')
+        db.session.execute('DELETE FROM items WHERE id = 1')
+        db.session.execute('UPDATE categories SET item_count = item_count - 1 WHERE id = 1')
+        db.session.execute('DELETE FROM categories WHERE id = 2')
+        db.session.commit()
+
+    for response in (auth_client.delete('/items/1'), auth_client.put('/items/1', json={'title': 'Stale'}),
+                     auth_client.post('/items', json={'title': 'Orphan', 'description': 'Orphan',
+                                                      'category_id': 2})):
+        assert_status_error_code(test_status_code=response.status_code,
+                                 test_error_code=response.get_json().get('error_code'),
+                                 goal_status_code=StatusCodeEnum.NOT_FOUND,
+                                 goal_error_code=ErrorCodeEnum.NORMAL_NOT_FOUND)
+
+    # The counter of the category still matches its items
+    assert get_category_by_id(1).item_count == 2
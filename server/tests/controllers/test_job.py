@@ -0,0 +1,128 @@
+import time
+from datetime import datetime, timedelta
+
+from flask_jwt_extended import create_access_token
+
+from main.errors import StatusCodeEnum, ErrorCodeEnum
+from main.models.job import JobModel
+from main.utils.jobs import job_runner
+from tests.helpers import assert_status_error_code
+
+
+def test_get_job_no_exceptions(auth_client):
+    response = auth_client.delete('/categories/1')
+    job_id = response.get_json().get('data').get('id')
+
+    response = auth_client.get('/jobs/' + str(job_id))
+    data = response.get_json().get('data')
+
+    assert response.status_code == StatusCodeEnum.OK
+    assert data.get('id') == job_id
+    assert data.get('status') == 'succeeded'
+    assert data.get('error') is None
+
+
+def test_job_workers(auth_client):
+    app = auth_client.application
+    app.config['JOB_WORKERS'] = 1
+    job_runner.init_app(app)
+
+    try:
+        response = auth_client.delete('/categories/1')
+        assert response.status_code == StatusCodeEnum.ACCEPTED
+
+        for _ in range(100):
+            data = auth_client.get(response.headers['Location']).get_json().get('data')
+            if data.get('status') == 'succeeded':
+                break
+            time.sleep(0.05)
+        assert data.get('status') == 'succeeded'
+        assert auth_client.get('/categories/1').status_code == StatusCodeEnum.NOT_FOUND
+    finally:
+        app.config['JOB_WORKERS'] = 0
+        job_runner.init_app(app)
+
+
+def test_failed_job(auth_client):
+    @job_runner.handler('test_failure')
+    def run_failure(job):
+        raise ValueError('Broken job')
+
+    try:
+        with auth_client.application.app_context():
+            job = job_runner.submit('test_failure', {}, creator_id=1)
+            job_id = job.id
+    finally:
+        job_runner.handlers.pop('test_failure')
+
+    data = auth_client.get('/jobs/' + str(job_id)).get_json().get('data')
+
+    assert data.get('status') == 'failed'
+    assert data.get('error') == 'Broken job'
+
+
+def test_recover_jobs(auth_client):
+    app = auth_client.application
+    with app.app_context():
+        # Left behind by workers which died: before starting, and halfway with an expired lease
+        stale = datetime.now() - timedelta(seconds=app.config['JOB_LEASE_SECONDS'] + 1)
+        pending = JobModel(type='delete_category', params={'category_id': 1}, creator_id=1, key='delete_category:1',
+                           created=stale).save()
+        running = JobModel(type='delete_category', params={'category_id': 2}, creator_id=1, key='delete_category:2',
+                           status=JobModel.RUNNING, attempts=1, lease_expires=stale).save()
+        # Held by a live worker
+        leased = JobModel(type='delete_category', params={'category_id': 2}, creator_id=1, status=JobModel.RUNNING,
+                          attempts=1, lease_expires=datetime.now() + timedelta(minutes=1)).save()
+        # Taken over too many times
+        abandoned = JobModel(type='delete_category', params={'category_id': 2}, creator_id=1, status=JobModel.RUNNING,
+                             attempts=app.config['JOB_MAX_ATTEMPTS'], lease_expires=stale).save()
+        job_ids = [pending.id, running.id, leased.id, abandoned.id]
+
+        assert job_runner.recover() == 3
+        # Nothing is left to claim
+        assert job_runner.recover() == 0
+
+    statuses = [auth_client.get('/jobs/' + str(job_id)).get_json().get('data').get('status') for job_id in job_ids]
+
+    assert statuses == ['succeeded', 'succeeded', 'running', 'failed']
+    assert auth_client.get('/categories/1').status_code == StatusCodeEnum.NOT_FOUND
+    assert auth_client.get('/categories/2').status_code == StatusCodeEnum.NOT_FOUND
+
+
+def test_delete_category_deduplicated(auth_client):
+    with auth_client.application.app_context():
+        job_id = JobModel(type='delete_category', params={'category_id': 1}, creator_id=1,
+                          key='delete_category:1').save().id
+
+    response = auth_client.delete('/categories/1')
+
+    assert response.status_code == StatusCodeEnum.ACCEPTED
+    assert response.get_json().get('data').get('id') == job_id
+    assert response.get_json().get('data').get('status') == 'pending'
+
+
+def test_get_job_exceptions(auth_client):
+    # Not existed job
+    response = auth_client.get('/jobs/100')
+    json_data = response.get_json()
+
+    assert_status_error_code(test_status_code=response.status_code, test_error_code=json_data.get('error_code'),
+                             goal_status_code=StatusCodeEnum.NOT_FOUND,
+                             goal_error_code=ErrorCodeEnum.NORMAL_NOT_FOUND)
+
+    # Other user's job
+    response = auth_client.delete('/categories/1')
+    job_id = response.get_json().get('data').get('id')
+    with auth_client.application.app_context():
+        other_token = create_access_token(identity=2)
+
+    response = auth_client.get('/jobs/' + str(job_id), headers={'Authorization': 'Bearer ' + other_token})
+    json_data = response.get_json()
+
+    assert_status_error_code(test_status_code=response.status_code, test_error_code=json_data.get('error_code'),
+                             goal_status_code=StatusCodeEnum.FORBIDDEN,
+                             goal_error_code=ErrorCodeEnum.NORMAL_FORBIDDEN)
+
+    response = auth_client.get('/jobs/' + str(job_id), headers={'Authorization': ''})
+
+    assert response.status_code == StatusCodeEnum.UNAUTHORIZED
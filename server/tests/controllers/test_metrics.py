@@ -0,0 +1,87 @@
+import json
+import os
+import subprocess
+
+from main.errors import StatusCodeEnum, ErrorCodeEnum
+from main.utils.metrics import metrics
+from tests.helpers import assert_status_error_code
+
+
+def get_metric(text, metric_name, **labels):
+    for line in text.splitlines():
+        if line.startswith(metric_name + '{') and \
+                all('{}="{}"'.format(key, value) in line for key, value in labels.items()):
+            return float(line.rsplit(' ', 1)[1])
+    return None
+
+
+def test_metrics_no_exceptions(auth_client):
+    auth_client.get('/items')
+    auth_client.get('/items')
+    auth_client.get('/items/100')
+    auth_client.get('/items?page=x')
+    response = auth_client.get('/metrics')
+    text = response.get_data(as_text=True)
+
+    assert response.status_code == StatusCodeEnum.OK
+    assert response.mimetype == 'text/plain'
+    assert get_metric(text, 'http_requests_total', endpoint='item.get_items', method='GET', status=200) == 2
+    assert get_metric(text, 'http_requests_total', endpoint='item.get_items', status=400) == 1
+    assert get_metric(text, 'http_requests_total', blueprint='item', endpoint='item.get_item', status=404) == 1
+    assert get_metric(text, 'http_request_duration_seconds_count', endpoint='item.get_items') == 3
+    assert get_metric(text, 'http_request_duration_seconds_bucket', endpoint='item.get_items', le='+Inf') == 3
+    assert get_metric(text, 'app_errors_total', error_code=ErrorCodeEnum.VALIDATION_ERROR,
+                      name='VALIDATION_ERROR') == 1
+    assert get_metric(text, 'app_errors_total', name='NORMAL_NOT_FOUND') == 1
+
+
+def test_metrics_multiple_processes(auth_client, tmpdir):
+    app = auth_client.application
+    app.config['METRICS_MULTIPROCESS_DIR'] = str(tmpdir)
+    metrics.init_app(app)
+
+    # Counters flushed by another worker, which is still running, and by a stopped one
+    stopped_worker = subprocess.Popen(['true'])
+    stopped_worker.wait()
+    for pid in (os.getppid(), stopped_worker.pid):
+        auth_client.get('/items')
+        metrics.flush()
+        os.rename(metrics._path(), os.path.join(str(tmpdir), '{}-0.json'.format(pid)))
+        metrics.reset()
+        with open(os.path.join(str(tmpdir), '{}-0.json'.format(pid))) as file:
+            assert json.load(file).get('requests')
+
+    auth_client.get('/items')
+    for _ in range(2):
+        text = auth_client.get('/metrics').get_data(as_text=True)
+
+        assert get_metric(text, 'http_requests_total', endpoint='item.get_items', status=200) == 3
+        assert get_metric(text, 'http_request_duration_seconds_count', endpoint='item.get_items') == 3
+
+    # The file of the stopped worker was merged, once
+    assert sorted(os.listdir(str(tmpdir))) == sorted(['.lock', 'stopped.json', '{}-0.json'.format(os.getppid()),
+                                                      os.path.basename(metrics._path())])
+
+
+def test_monitoring_access(auth_client):
+    app = auth_client.application
+    app.config['MONITORING_OPEN'] = False
+
+    # Hidden without a token
+    for url in ('/metrics', '/stats/cache'):
+        response = auth_client.get(url)
+        assert response.status_code == StatusCodeEnum.NOT_FOUND
+
+    app.config['MONITORING_TOKEN'] = 'secret'
+    for url in ('/metrics', '/stats/cache'):
+        response = auth_client.get(url)
+        assert_status_error_code(test_status_code=response.status_code,
+                                 test_error_code=response.get_json().get('error_code'),
+                                 goal_status_code=StatusCodeEnum.FORBIDDEN,
+                                 goal_error_code=ErrorCodeEnum.NORMAL_FORBIDDEN)
+
+        response = auth_client.get(url, headers={'Authorization': 'Bearer secret'})
+        assert response.status_code == StatusCodeEnum.OK
+
+    # The API itself isn't gated
+    assert auth_client.get('/items').status_code == StatusCodeEnum.OK
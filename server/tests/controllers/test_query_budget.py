@@ -0,0 +1,58 @@
+import json
+import logging
+
+import main.controllers.item
+from main.errors import StatusCodeEnum
+from tests.helpers import assert_query_budget, create_items
+
+
+def create_page_of_items(client):
+    with client.application.app_context():
+        create_items([{'title': 'Block ' + str(i), 'description': 'Blocky', 'category_id': 1 + i % 2, 'creator_id': 1}
+                      for i in range(60)])
+
+
+def test_query_budgets(auth_client):
+    create_page_of_items(auth_client)
+
+    # Endpoint -> budget of statements, whatever the size of the page
+    budgets = {
+        '/items?per_page=50&total=exact': 3,  # versions of the page, count, full rows
+        '/items?per_page=50&category_id=1&total=exact': 3,
+        '/items?limit=50': 2,
+        '/items?fields=title&limit=50': 2,
+        '/items/search?q=block&limit=50': 2,
+        '/items/1': 2,
+        '/categories?per_page=50&total=exact': 3,
+        '/categories/1': 1,
+        '/autocomplete?prefix=block': 1,
+    }
+    for url, budget in budgets.items():
+        response = auth_client.get(url)
+
+        assert response.status_code == StatusCodeEnum.OK, url
+        assert_query_budget(response, budget)
+        assert float(response.headers['X-Query-Time-Ms']) >= 0
+
+
+def test_query_budget_catches_lazy_loads(auth_client, monkeypatch, caplog):
+    create_page_of_items(auth_client)
+    # Regression: the nested category isn't eager loaded anymore
+    monkeypatch.setattr(main.controllers.item, 'items_load_options', [])
+    monkeypatch.setitem(auth_client.application.config, 'QUERY_REPEAT_WARNING', 2)
+    response = auth_client.get('/items?per_page=50')
+
+    assert response.status_code == StatusCodeEnum.OK
+    assert int(response.headers['X-Query-Max-Repeat']) > 1
+    assert 'N+1 query?' in caplog.text
+
+
+def test_queries_logged(auth_client, caplog):
+    # The tests log warnings only, INFO is the default level
+    caplog.set_level(logging.INFO, logger=auth_client.application.logger.name)
+    auth_client.get('/items/1')
+
+    lines = [json.loads(record.getMessage()) for record in caplog.records if record.levelno == logging.INFO]
+    assert lines[-1]['event'] == 'request_queries'
+    assert lines[-1]['path'] == '/items/1'
+    assert lines[-1]['queries'] == 2
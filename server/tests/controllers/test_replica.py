@@ -0,0 +1,124 @@
+import shutil
+import sqlite3
+from datetime import datetime
+
+import pytest
+from dotenv import load_dotenv
+from flask_jwt_extended import create_access_token
+
+from main.app import create_app
+from main.db import db
+from main.errors import StatusCodeEnum
+from main.utils.replica_router import replica_router
+from tests.helpers import create_test_db
+
+REPLICAS = ('replica_0', 'replica_1')
+
+
+@pytest.fixture
+def replica_client(tmp_path):
+    """
+    This fixture provide an authorized client whose app has a primary and two replicas, SQLite files copied from the
+    primary once it is seeded, a snapshot no later write reaches
+    :return:
+    """
+    load_dotenv()
+
+    app = create_app('testing')
+    app.config.update(SQLALCHEMY_DATABASE_URI='sqlite:///' + str(tmp_path / 'primary.db'),
+                      SQLALCHEMY_BINDS={bind: 'sqlite:///' + str(tmp_path / (bind + '.db')) for bind in REPLICAS})
+    replica_router.init_app(app)
+
+    with app.test_client() as client:
+        with app.app_context():
+            db.init_app(app)
+
+            db.create_all()
+            user_id = create_test_db()
+            access_token = create_access_token(identity=user_id)
+            client.environ_base['HTTP_AUTHORIZATION'] = 'Bearer ' + access_token
+
+        for bind in REPLICAS:
+            shutil.copyfile(str(tmp_path / 'primary.db'), str(tmp_path / (bind + '.db')))
+        client.database_dir = tmp_path
+
+        yield client
+
+    replica_router.binds = []
+
+
+def set_item_title(client, database, title):
+    # The version of the item changes with its title, as it would on a real write
+    connection = sqlite3.connect(str(client.database_dir / (database + '.db')))
+    with connection:
+        connection.execute('UPDATE items SET title = ?, updated = ? WHERE id = 1', (title, str(datetime.now())))
+    connection.close()
+
+
+def get_item_title(client):
+    # Read in a list, the item views read the misses of the entity cache from the primary
+    response = client.get('/items?fields=title')
+    assert response.status_code == StatusCodeEnum.OK
+    return next(item.get('title') for item in response.get_json().get('data') if item.get('id') == 1)
+
+
+def test_reads_round_robin_on_replicas(replica_client):
+    for bind in REPLICAS:
+        set_item_title(replica_client, bind, 'Title of ' + bind)
+
+    assert [get_item_title(replica_client) for _ in range(4)] == ['Title of replica_0', 'Title of replica_1'] * 2
+
+
+def test_writes_go_to_primary_and_are_read_back(replica_client):
+    response = replica_client.put('/items/1', json={'title': 'Diamond Sword'})
+
+    assert response.status_code == StatusCodeEnum.OK
+    assert 'read_primary=1' in response.headers.get('Set-Cookie')
+    assert 'Max-Age=5' in response.headers.get('Set-Cookie')
+
+    # Other clients read the replicas, lagging behind
+    replica_client.cookie_jar.clear()
+    assert get_item_title(replica_client) != 'Diamond Sword'
+
+    # Within the window the writer reads the primary
+    replica_client.set_cookie('localhost', 'read_primary', '1')
+    assert get_item_title(replica_client) == 'Diamond Sword'
+
+
+def test_failed_writes_keep_reading_replicas(replica_client):
+    response = replica_client.post('/items', json={'title': 'Missing description'})
+
+    assert response.status_code == StatusCodeEnum.BAD_REQUEST
+    assert response.headers.get('Set-Cookie') is None
+
+
+def test_login_reads_users_from_replica(replica_client):
+    response = replica_client.post('/users', json={'email': 'new@gmail.com', 'password': '123456'})
+    assert response.status_code == StatusCodeEnum.OK
+
+    # Written on the primary, read back during the window
+    response = replica_client.post('/auth', json={'email': 'new@gmail.com', 'password': '123456'})
+    assert response.status_code == StatusCodeEnum.OK
+
+    # The replicas don't have the user yet
+    replica_client.cookie_jar.clear()
+    response = replica_client.post('/auth', json={'email': 'new@gmail.com', 'password': '123456'})
+    assert response.status_code == StatusCodeEnum.BAD_REQUEST
+
+
+def test_entity_cache_with_replicas(replica_client):
+    for bind in REPLICAS:
+        set_item_title(replica_client, bind, 'Title of ' + bind)
+
+    # The misses (item and its category) are read from the primary and cached, then served from the cache
+    assert [replica_client.get('/items/1').get_json().get('data').get('title') for _ in range(3)] == \
+        ['Minecraft Sword'] * 3
+    stats = replica_client.get('/stats/cache').get_json().get('data')
+    assert stats.get('misses') == 2
+    assert stats.get('hits') == 4
+
+    # The lagging replicas can't put the old row back after the invalidation
+    replica_client.put('/items/1', json={'title': 'Diamond Sword'})
+    replica_client.cookie_jar.clear()
+    for _ in range(3):
+        assert replica_client.get('/items/1').get_json().get('data').get('title') == 'Diamond Sword'
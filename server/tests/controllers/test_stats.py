@@ -0,0 +1,121 @@
+from main.errors import StatusCodeEnum, ErrorCodeEnum
+from main.utils.entity_cache import entity_cache
+from main.utils.fragment_cache import fragment_cache
+from tests.helpers import count_queries, assert_status_error_code
+
+
+def get_cache_stats(client):
+    response = client.get('/stats/cache')
+    assert response.status_code == StatusCodeEnum.OK
+    return response.get_json().get('data')
+
+
+def assert_entity_cache_no_exceptions(client):
+    # Miss then hit
+    client.get('/items/1')
+    with count_queries() as statements:
+        response = client.get('/items/1')
+
+    assert response.status_code == StatusCodeEnum.OK
+    assert not statements
+    stats = get_cache_stats(client)
+    assert stats.get('hits') >= 1
+    assert stats.get('misses') >= 1
+
+    # Updated rows are dropped from the cache
+    client.put('/items/1', json={'title': 'Diamond Sword'})
+    response = client.get('/items/1')
+
+    assert response.get_json().get('data').get('title') == 'Diamond Sword'
+
+    # Items of a deleted category are dropped from the cache
+    client.delete('/categories/1')
+    response = client.get('/items/1')
+    json_data = response.get_json()
+
+    assert_status_error_code(test_status_code=response.status_code, test_error_code=json_data.get('error_code'),
+                             goal_status_code=StatusCodeEnum.NOT_FOUND,
+                             goal_error_code=ErrorCodeEnum.NORMAL_NOT_FOUND)
+
+
+def test_entity_cache_memory_backend(auth_client):
+    assert get_cache_stats(auth_client).get('backend') == 'LRUCacheBackend'
+    assert_entity_cache_no_exceptions(auth_client)
+
+
+def test_entity_cache_shared_backend(auth_client):
+    app = auth_client.application
+    app.config['ENTITY_CACHE_BACKEND'] = 'shared'
+    app.config['ENTITY_CACHE_STORE_URL'] = 'local://'
+    entity_cache.init_app(app)
+
+    assert get_cache_stats(auth_client).get('backend') == 'SharedStoreCacheBackend'
+    assert_entity_cache_no_exceptions(auth_client)
+
+
+def get_uncached(client, url):
+    max_size = fragment_cache.max_size
+    fragment_cache.max_size = 0
+    fragment_cache._entries.clear()
+    try:
+        return client.get(url).data
+    finally:
+        fragment_cache.max_size = max_size
+
+
+def test_fragment_cache(auth_client):
+    urls = ['/items', '/items?per_page=3&page=2', '/items?limit=3', '/items/1', '/categories', '/categories/1']
+    expected = {url: get_uncached(auth_client, url) for url in urls}
+
+    # Cold then warm, the spliced bodies are the bytes jsonify would produce
+    for _ in range(2):
+        for url in urls:
+            assert auth_client.get(url).data == expected[url]
+
+    # Warm pages only read the versions of their rows
+    with count_queries() as statements:
+        auth_client.get('/items?per_page=3&page=2')
+    assert not any('items.title' in statement for statement in statements)
+    stats = auth_client.get('/stats/fragments').get_json().get('data')
+    assert stats.get('hits') > 0
+    assert stats.get('size') > 0
+
+    # An updated row gets a new version, as do the items nesting an updated category
+    auth_client.put('/items/1', json={'title': 'Diamond Sword'})
+    auth_client.put('/categories/2', json={'title': 'Renamed category'})
+    for url in urls:
+        response = auth_client.get(url)
+        assert response.data == get_uncached(auth_client, url)
+    assert 'Diamond Sword' in auth_client.get('/items').get_data(as_text=True)
+
+    # Other encodings are honored too, fragments are encoded with the config of the app they are cached for
+    auth_client.application.config['JSON_SORT_KEYS'] = False
+    fragment_cache.init_app(auth_client.application)
+    assert auth_client.get('/items').data == get_uncached(auth_client, '/items')
+    auth_client.application.config['JSONIFY_PRETTYPRINT_REGULAR'] = True
+    assert auth_client.get('/items').data == get_uncached(auth_client, '/items')
+
+
+def test_fragment_cache_sibling_writes(auth_client):
+    auth_client.get('/items?category_id=1')
+    auth_client.get('/items/1')
+
+    # Writes of other items of the category move its item counter, not what its items nest
+    auth_client.put('/items/2', json={'description': 'Less dull'})
+    auth_client.post('/items', json={'title': 'Minecraft Bow', 'description': 'Shoots arrows', 'category_id': 1})
+    misses = fragment_cache.misses
+    auth_client.get('/items?category_id=1')
+    auth_client.get('/items/1')
+
+    # Only the new and the updated items are serialized again
+    assert fragment_cache.misses - misses == 2
+
+
+def test_pool_stats(auth_client):
+    auth_client.get('/items')
+    response = auth_client.get('/stats/pool')
+    stats = response.get_json().get('data')
+
+    assert response.status_code == StatusCodeEnum.OK
+    assert stats.get('checkouts') >= 1
+    assert stats.get('timeouts') == 0
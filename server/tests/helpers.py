@@ -1,7 +1,13 @@
+from contextlib import contextmanager
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
 from main.db import db
 from main.errors import StatusCodeEnum
 from main.models.category import CategoryModel
 from main.models.item import ItemModel
+from main.models.item_term import ItemTermModel
 from main.models.user import UserModel
 
 
@@ -62,7 +68,9 @@ def create_items(items):
     """
     item_objs = [ItemModel(**item) for item in items]
     db.session.bulk_save_objects(item_objs)
-    db.session.commit()
+    # bulk_save_objects skips the controllers so the item counters of categories and the search index must be repaired
+    CategoryModel.reconcile_item_counts()
+    ItemTermModel.rebuild()
 
 
 def create_test_db():
@@ -148,3 +156,34 @@ def assert_pagination_response(test_status_code, test_data, test_total_items, te
     assert test_total_items == goal_total_items
     assert test_page == goal_page
     assert test_per_page == goal_per_page
+
+
+@contextmanager
+def count_queries():
+    """
+    Count the SQL statements run by the code inside the with block
+    - Usage: with count_queries() as statements: ...; assert len(statements) == 2
+    :return: list of the executed statements
+    """
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(Engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(Engine, 'before_cursor_execute', before_cursor_execute)
+
+
+def assert_query_budget(response, max_queries, max_repeat=1):
+    """
+    Assert the SQL statements run by the request of a response, as counted by the query tracker of the app (X-Query-*
+    headers of the testing config)
+    :param response: test client response
+    :param max_queries: budget of statements of the request
+    :param max_repeat: times a statement may run, more is an N+1 (e.g a relationship lazy-loaded for every row)
+    """
+    assert int(response.headers['X-Query-Count']) <= max_queries, 'Over the query budget'
+    assert int(response.headers['X-Query-Max-Repeat']) <= max_repeat, 'Same statement run for every row, N+1?'
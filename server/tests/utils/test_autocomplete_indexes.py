@@ -0,0 +1,47 @@
+import threading
+import time
+
+from flask import Flask
+
+from main.utils.autocomplete import AutocompleteIndexes
+
+
+def get_titles(indexes, prefix):
+    return [completion.get('title') for completion in indexes.complete('item', prefix, 10)]
+
+
+def test_reload_out_of_lock():
+    rows = [(1, 'Apple')]
+    loading, finish_loading = threading.Event(), threading.Event()
+
+    def loader():
+        snapshot = list(rows)
+        if len(rows) > 1:  # The reload is slow
+            loading.set()
+            finish_loading.wait(5)
+        return snapshot
+
+    app = Flask(__name__)
+    app.config['AUTOCOMPLETE_REFRESH_TTL'] = 0.05
+    indexes = AutocompleteIndexes()
+    indexes.register('item', loader)
+    indexes.init_app(app)
+
+    assert get_titles(indexes, 'a') == ['Apple']
+    rows.append((2, 'Apricot'))
+    indexes.refresh_ttl = 60
+    time.sleep(0.06)
+
+    reload = threading.Thread(target=get_titles, args=(indexes, 'a'))
+    reload.start()
+    try:
+        assert loading.wait(5)
+        # Completions and writes don't wait for the reload, they use the current index
+        indexes.add('item', 3, 'Avocado')
+        assert get_titles(indexes, 'a') == ['Apple', 'Avocado']
+    finally:
+        finish_loading.set()
+        reload.join(5)
+
+    # The write made while loading is replayed on the new index
+    assert get_titles(indexes, 'a') == ['Apple', 'Apricot', 'Avocado']
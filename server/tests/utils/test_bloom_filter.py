@@ -0,0 +1,12 @@
+from main.utils.bloom_filter import BloomFilter
+
+
+def test_bloom_filter():
+    bloom = BloomFilter(capacity=100, error_rate=0.01)
+
+    assert bloom.add('a')
+    assert not bloom.add('a')
+    assert bloom.add('b')
+    assert 'a' in bloom and 'b' in bloom
+    assert 'c' not in bloom
+    assert bloom.count == 2
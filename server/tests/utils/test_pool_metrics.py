@@ -0,0 +1,36 @@
+import pytest
+from sqlalchemy import create_engine, exc
+from sqlalchemy.pool import QueuePool
+
+from main.utils.pool_metrics import instrumented_pool_class, pool_metrics
+
+
+def test_pool_metrics():
+    engine = create_engine('sqlite://', poolclass=instrumented_pool_class(QueuePool), pool_size=1, max_overflow=0,
+                           pool_timeout=0.05)
+    pool_metrics.instrument(engine)
+    pool_metrics.reset()
+    pool_metrics.slow_checkout = 0.01
+
+    connection = engine.connect()
+    stats = pool_metrics.stats(engine)
+
+    assert stats.get('pool') == 'QueuePool'
+    assert stats.get('checkouts') == 1
+    assert stats.get('checked_out') == 1
+    assert stats.get('connects') == 1
+
+    # The only connection is taken, the checkout waits pool_timeout then gives up
+    with pytest.raises(exc.TimeoutError):
+        engine.connect()
+    assert pool_metrics.stats(engine).get('timeouts') == 1
+
+    connection.invalidate()
+    connection.close()
+    engine.connect().close()
+    stats = pool_metrics.stats(engine)
+
+    assert stats.get('invalidations') == 1
+    assert stats.get('connects') == 2
+    assert stats.get('checked_out') == 0
+    assert stats.get('checkouts') == 2
@@ -0,0 +1,9 @@
+from main.utils.query_tracker import statement_shape
+
+
+def test_statement_shape():
+    assert statement_shape('SELECT * FROM items WHERE items.id IN (?, ?, ?)') == \
+        statement_shape('SELECT * FROM items WHERE items.id IN (?)') == 'SELECT * FROM items WHERE items.id IN (?)'
+    assert statement_shape('INSERT INTO t (a, b) VALUES (%s, %s), (%(a)s, %(b)s)') == \
+        'INSERT INTO t (a, b) VALUES (?), (?)'
+    assert statement_shape('SELECT count(*) FROM items') == 'SELECT count(*) FROM items'
@@ -0,0 +1,65 @@
+import pytest
+from flask import Flask
+
+from main.utils.replica_router import ReplicaRouter
+
+
+def create_router(**config):
+    app = Flask(__name__)
+    app.config.update(config)
+    router = ReplicaRouter()
+    router.init_app(app)
+    return app, router
+
+
+def test_round_robin():
+    app, router = create_router(SQLALCHEMY_BINDS={'replica_1': 'sqlite://', 'replica_0': 'sqlite://',
+                                                  'reporting': 'sqlite://'})
+
+    assert router.binds == ['replica_0', 'replica_1']
+    assert [router._select() for _ in range(3)] == ['replica_0', 'replica_1', 'replica_0']
+
+
+def test_least_loaded():
+    app, router = create_router(SQLALCHEMY_BINDS={'replica_0': 'sqlite://', 'replica_1': 'sqlite://'},
+                                DATABASE_REPLICA_SELECTION='least_loaded')
+
+    assert router._select() == 'replica_0'
+    assert router._select() == 'replica_1'
+    router._release('replica_0')
+    assert router._select() == 'replica_0'
+    assert router._select() == 'replica_0'
+
+
+def test_invalid_selection():
+    with pytest.raises(ValueError):
+        create_router(DATABASE_REPLICA_SELECTION='random')
+
+
+def test_reading():
+    app, router = create_router(SQLALCHEMY_BINDS={'replica_0': 'sqlite://'})
+
+    with app.test_request_context():
+        assert router.current_bind() is None
+        with router.reading():
+            assert router.current_bind() == 'replica_0'
+            # Nested blocks keep the replica
+            with router.reading():
+                assert router.current_bind() == 'replica_0'
+            assert router.current_bind() == 'replica_0'
+            with router.primary():
+                assert router.current_bind() is None
+            assert router.current_bind() == 'replica_0'
+        assert router.current_bind() is None
+    assert router._in_flight == {'replica_0': 0}
+
+    # A client in its read your writes window reads the primary
+    with app.test_request_context(headers={'Cookie': 'read_primary=1'}):
+        with router.reading():
+            assert router.current_bind() is None
+
+    # No replica
+    app, router = create_router()
+    with app.test_request_context():
+        with router.reading():
+            assert router.current_bind() is None
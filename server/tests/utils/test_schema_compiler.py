@@ -0,0 +1,83 @@
+import json
+from datetime import datetime
+
+from marshmallow import Schema, fields, post_dump
+
+from main.models.category import CategoryModel
+from main.models.item import ItemModel
+from main.schemas.category import CategorySchema
+from main.schemas.item import ItemSchema
+from main.schemas.response import create_pagination_response_schema, AuthResponseSchema
+from main.utils.pagination import KeysetPage
+from main.utils.schema_compiler import compile_schema
+
+
+def assert_same_dump(schema, obj):
+    expected = schema.dump(obj)
+    result = compile_schema(schema)(obj)
+
+    assert result == expected
+    assert json.dumps(result) == json.dumps(expected)  # Same keys in the same order, same types
+
+
+def make_item(_id, category=None, **kwargs):
+    now = datetime(2019, 10, 1, 12, 30, 15, 123456)
+    values = dict(id=_id, title='Item {}'.format(_id), description='Description', category_id=1, creator_id=1,
+                  created=now, updated=now, category=category)
+    values.update(kwargs)
+    return ItemModel(**values)
+
+
+def test_compile_schema_same_output():
+    category = CategoryModel(id=1, title='Category', description='Stuffs', creator_id=1, item_count=2,
+                             created=datetime(2019, 10, 1), updated=None)
+    items = [make_item(1, category), make_item(2, None, description=None), make_item(3, category, created=None)]
+
+    assert_same_dump(ItemSchema(), items[0])
+    assert_same_dump(ItemSchema(many=True), items)
+    assert_same_dump(ItemSchema(only=('id', 'category')), items[0])
+    assert_same_dump(ItemSchema(exclude=('creator_id', 'created')), items[2])
+    assert_same_dump(CategorySchema(), category)
+    assert_same_dump(CategorySchema(many=True), [category, category])
+    assert_same_dump(CategorySchema(), CategoryModel(id=2))  # Unset attributes are None
+
+    # Pagination responses, offset and cursor pages
+    page_schema = create_pagination_response_schema(data_schema=ItemSchema(many=True))
+    assert_same_dump(page_schema, KeysetPage(items=items, per_page=3, next_cursor=[1, 3]))
+    assert_same_dump(page_schema, KeysetPage(items=[], per_page=3, next_cursor=None))
+
+    # Mappings are left to marshmallow
+    user = {'id': 1, 'email': 'admin@gmail.com', 'created': datetime(2019, 10, 1)}
+    assert_same_dump(AuthResponseSchema(), {'access_token': 'token', 'user': user})
+    assert_same_dump(ItemSchema(), {'id': '1', 'title': b'Bytes'})
+
+
+def test_compile_schema_fallbacks():
+    class DecoratedSchema(Schema):
+        id = fields.Integer()
+        name = fields.String(attribute='title', data_key='label')
+        total = fields.Integer(default=0)
+        flag = fields.Boolean()
+        price = fields.Float()
+        stamp = fields.DateTime(format='%Y')
+        method = fields.Method('get_method')
+
+        def get_method(self, obj):
+            return obj.id * 2
+
+    class PostDumpSchema(DecoratedSchema):
+        @post_dump
+        def add_extra(self, data, **kwargs):
+            data['extra'] = True
+            return data
+
+    class Row:
+        id = 2
+        title = 'Row'
+        flag = 1
+        price = 1
+        stamp = datetime(2019, 1, 1)
+
+    assert_same_dump(DecoratedSchema(), Row())
+    assert_same_dump(DecoratedSchema(many=True), [Row(), Row()])
+    assert_same_dump(PostDumpSchema(), Row())
@@ -0,0 +1,42 @@
+import logging
+
+from flask import Flask
+
+from main.schemas.item import ItemSchema
+from main.schemas.registry import SchemaRegistry
+from main.schemas.response import AuthResponseSchema
+
+
+def test_schemas_are_shared_by_options():
+    registry = SchemaRegistry()
+
+    assert registry.get(AuthResponseSchema) is registry.get(AuthResponseSchema)
+    assert registry.get(ItemSchema, many=True) is not registry.get(ItemSchema)
+    assert registry.get(ItemSchema, exclude=['creator_id', 'id']) is \
+        registry.get(ItemSchema, exclude=['id', 'creator_id'])
+    assert registry.stats().get('schemas') == 4
+
+
+def test_pagination_responses_are_shared_by_data_schema():
+    registry = SchemaRegistry()
+    page_schema = registry.get_pagination_response(ItemSchema(many=True))
+
+    # Another instance built the same way dumps the same way
+    assert registry.get_pagination_response(ItemSchema(many=True)) is page_schema
+    assert registry.get_pagination_response(ItemSchema(many=True, only=['id'])) is not page_schema
+    assert page_schema.fields['data'].inner.schema.many is True
+    assert registry.stats().get('build_ms') > 0
+
+
+def test_build_time_logged_at_boot(caplog):
+    registry = SchemaRegistry()
+    registry.get(AuthResponseSchema)
+    app = Flask(__name__)
+    registry.init_app(app)
+
+    # Not a warning
+    assert 'Built 1 response schemas in' not in caplog.text
+    caplog.set_level(logging.INFO, logger=app.logger.name)
+    registry.init_app(app)
+
+    assert 'Built 1 response schemas in' in caplog.text